@@ -0,0 +1,122 @@
+"""
+Measures how long it takes to import jupysql (what %load_ext sql pays). IPython and
+SQLAlchemy are imported first (they're required and a notebook has already imported
+IPython), so the time reported is jupysql's own overhead, relative to importing them.
+Exits with an error if the overhead is higher than the threshold or if it loads any
+of the optional dependencies that should only be imported when they're used.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --threshold 0.8 --repeat 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# these are imported on first use (plotting, data frames, widgets, etc.)
+LAZY_MODULES = [
+    "matplotlib",
+    "numpy",
+    "pandas",
+    "polars",
+    "pyarrow",
+    "sqlglot",
+    "jinja2",
+    "ipywidgets",
+    "pgspecial",
+    "sqlalchemy.ext.asyncio",
+]
+
+SCRIPT = f"""
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import IPython, sqlalchemy
+baseline = time.perf_counter() - start
+
+start = time.perf_counter()
+import sql
+elapsed = time.perf_counter() - start
+
+loaded = [name for name in {LAZY_MODULES!r} if name in sys.modules]
+print(json.dumps({{"baseline": baseline, "elapsed": elapsed, "loaded": loaded}}))
+"""
+
+
+def measure():
+    """Imports IPython and sqlalchemy and then sql in a new interpreter, returns the
+    seconds each import took and the lazy modules that were loaded"""
+    env = {
+        **os.environ,
+        "PLOOMBER_STATS_ENABLED": "false",
+        "PLOOMBER_VERSION_CHECK_DISABLED": "true",
+    }
+    out = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    ).stdout
+    result = json.loads(out.splitlines()[-1])
+    return result["baseline"], result["elapsed"], result["loaded"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.0,
+        help=(
+            "Maximum time (median) importing sql can take, relative to importing "
+            "IPython and sqlalchemy (e.g., 0.5 means 50%% of it)"
+        ),
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Number of times to import sql"
+    )
+    args = parser.parse_args()
+
+    baselines, timings, loaded = [], [], set()
+
+    for _ in range(args.repeat):
+        baseline, elapsed, loaded_ = measure()
+        baselines.append(baseline)
+        timings.append(elapsed)
+        loaded.update(loaded_)
+
+    baseline, median = statistics.median(baselines), statistics.median(timings)
+    ratio = median / baseline
+    print(
+        f"import IPython, sqlalchemy: {baseline:.3f}s (median of {args.repeat}, "
+        f"min: {min(baselines):.3f}s, max: {max(baselines):.3f}s)"
+    )
+    print(
+        f"import sql: {median:.3f}s (median of {args.repeat}, "
+        f"min: {min(timings):.3f}s, max: {max(timings):.3f}s), "
+        f"{ratio:.2f}x the baseline"
+    )
+
+    failed = False
+
+    if loaded:
+        print(f"Modules that should be imported lazily: {', '.join(sorted(loaded))}")
+        failed = True
+
+    if ratio > args.threshold:
+        print(
+            f"The import took longer than the threshold "
+            f"({args.threshold:.2f}x the baseline)"
+        )
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
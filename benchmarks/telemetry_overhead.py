@@ -0,0 +1,94 @@
+"""
+Measures the time telemetry adds to each %sql call. Runs the same loop of small
+queries with telemetry disabled and enabled (events are queued but not sent), and
+the overhead of calling a decorated function in both cases.
+
+    python benchmarks/telemetry_overhead.py
+    python benchmarks/telemetry_overhead.py --queries 5000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+CALLS = 100_000
+
+
+def child(n_queries):
+    from IPython import InteractiveShell
+
+    from sql.magic import SqlMagic
+    from sql.telemetry import telemetry
+
+    # measure queueing the events, not sending them
+    telemetry.log_api = lambda **kwargs: None
+
+    def function():
+        pass
+
+    decorated = telemetry.log_call("function")(function)
+
+    magic = SqlMagic(InteractiveShell())
+    magic.displaycon = False
+    magic.execute("sqlite://")
+
+    query = timeit.timeit(lambda: magic.execute("SELECT 1"), number=n_queries)
+    plain = timeit.timeit(function, number=CALLS)
+    wrapped = timeit.timeit(decorated, number=CALLS)
+    telemetry.flush()
+
+    print(
+        json.dumps(
+            {
+                "enabled": telemetry.enabled,
+                "query": query / n_queries,
+                "overhead": (wrapped - plain) / CALLS,
+            }
+        )
+    )
+
+
+def measure(enabled, n_queries):
+    env = {
+        **os.environ,
+        "PLOOMBER_STATS_ENABLED": str(enabled).lower(),
+        "PLOOMBER_VERSION_CHECK_DISABLED": "true",
+    }
+    # check_telemetry_enabled() ignores PLOOMBER_STATS_ENABLED in CI
+    env.pop("CI", None)
+    env.pop("READTHEDOCS", None)
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", "--queries", str(n_queries)],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    ).stdout
+    # connections print a message when closed at exit
+    return json.loads(next(line for line in out.splitlines() if line.startswith("{")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--queries", type=int, default=2000, help="Number of %%sql calls to time"
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.queries)
+
+    for enabled in (False, True):
+        result = measure(enabled, args.queries)
+        label = "enabled" if result["enabled"] else "disabled"
+        print(
+            f"telemetry {label}: {result['query'] * 1e6:.1f} us per %sql call, "
+            f"{max(result['overhead'], 0) * 1e9:.0f} ns added by the decorator"
+        )
+
+
+if __name__ == "__main__":
+    main()
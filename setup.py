@@ -36,12 +36,15 @@ DEV = [
     "pandas",
     "polars==0.17.2",  # 04/18/23 this breaks our CI
     "pyarrow",
+    "zstandard",
     "invoke",
     "pkgmt",
     "twine",
     # tests
     "duckdb<0.8.0",
     "duckdb-engine",
+    # for sql.aexecute tests
+    "aiosqlite",
     "pyodbc",
     # sql.plot module tests
     "matplotlib",
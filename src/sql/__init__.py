@@ -1,5 +1,6 @@
 from .magic import RenderMagic, SqlMagic, load_ipython_extension
 from .connection import PLOOMBER_DOCS_LINK_STR
+from .aio import aexecute
 
 __version__ = "0.8.1dev"
 
@@ -9,4 +10,5 @@ __all__ = [
     "SqlMagic",
     "load_ipython_extension",
     "PLOOMBER_DOCS_LINK_STR",
+    "aexecute",
 ]
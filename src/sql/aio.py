@@ -0,0 +1,147 @@
+"""
+Run queries with async drivers (e.g., ``sqlite+aiosqlite``, ``postgresql+asyncpg``)
+from a coroutine: ``await sql.aexecute(query, conn=alias)``. Each query uses its
+own connection from the pool, so independent queries can run concurrently (e.g.,
+with ``asyncio.gather``)
+"""
+import asyncio
+from copy import copy
+
+from IPython import get_ipython
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
+
+from sql import exceptions
+from sql.connection import AsyncConnection, Connection
+from sql.run import run, ResultSet
+from sql.telemetry import telemetry
+
+
+def _get_connection(conn):
+    if conn is None:
+        if Connection.current is None:
+            raise Connection._error_no_connection()
+
+        conn = Connection.current
+    elif not isinstance(conn, Connection):
+        if conn not in Connection.connections:
+            raise exceptions.UsageError(
+                f"{conn!r} is not a valid connection, expected one of: "
+                f"{', '.join(repr(key) for key in Connection.connections)}"
+            )
+
+        conn = Connection.connections[conn]
+
+    if not isinstance(conn, AsyncConnection):
+        raise exceptions.UsageError(
+            f"Cannot run the query with aexecute since {conn.url} doesn't use an "
+            "async driver (e.g., sqlite+aiosqlite, postgresql+asyncpg). "
+            "Use %sql instead"
+        )
+
+    return conn
+
+
+def _get_config():
+    """Returns the SqlMagic instance registered in the IPython session"""
+    shell = get_ipython()
+    config = None
+
+    if shell is not None:
+        config = shell.magics_manager.registry.get("SqlMagic")
+
+    if config is None:
+        raise exceptions.RuntimeError(
+            "Cannot find the SQL magic configuration, load the extension with "
+            "%load_ext sql or pass the config argument"
+        )
+
+    return config
+
+
+def _is_single_connection(conn):
+    """
+    Checks if the engine's pool always returns the same DBAPI connection (e.g.,
+    in-memory SQLite), so queries cannot run concurrently
+    """
+    return isinstance(conn.engine.pool, (SingletonThreadPool, StaticPool))
+
+
+def _run(session, conn, sql, config):
+    """
+    Runs the query with a connection from the pool, this runs in a greenlet (see
+    AsyncConnection.run_sync) so the async driver can be used from sync code
+    """
+    conn = copy(conn)
+    conn.session = session
+
+    try:
+        result = run(conn, sql, config)
+
+        # fetch the rows before the connection goes back to the pool
+        if isinstance(result, ResultSet):
+            result.fetchall()
+    finally:
+        # the copy isn't used again, don't keep its results alive
+        ResultSet.LAST_BY_CONNECTION.pop(conn, None)
+
+    return result
+
+
+async def _aexecute(conn, sql, config):
+    async with conn.async_engine.connect() as connection:
+        return await connection.run_sync(_run, conn, sql, config)
+
+
+async def _wait_for(coroutine, timeout):
+    try:
+        return await asyncio.wait_for(coroutine, timeout=timeout or None)
+    except asyncio.TimeoutError as e:
+        raise exceptions.TimeoutError(
+            f"The query was cancelled since it ran for more than {timeout} seconds"
+        ) from e
+
+
+@telemetry.log_call("aexecute")
+async def aexecute(sql, conn=None, config=None, timeout=None):
+    """Run a SQL query with an async driver, returns the same results as ``%sql``
+    (a ResultSet or a data frame, depending on the configuration)
+
+    Parameters
+    ----------
+    sql : str
+        SQL query to execute
+
+    conn : str or sql.connection.Connection, default None
+        The connection (or its alias) to use, defaults to the current connection
+
+    config
+        Configuration object, defaults to the SqlMagic instance in the current
+        IPython session
+
+    timeout : float, default None
+        Maximum number of seconds the query can run for, defaults to
+        ``config.statement_timeout``
+
+    Examples
+    --------
+    >>> import asyncio
+    >>> import sql
+    >>> counts = await asyncio.gather(
+    ...     sql.aexecute("SELECT COUNT(*) FROM orders", conn="db"),
+    ...     sql.aexecute("SELECT COUNT(*) FROM customers", conn="db"),
+    ... )  # doctest: +SKIP
+    """
+    conn = _get_connection(conn)
+    config = config or _get_config()
+
+    if timeout is None:
+        timeout = config.statement_timeout
+
+    if not _is_single_connection(conn):
+        return await _wait_for(_aexecute(conn, sql, config), timeout)
+
+    if conn._async_lock is None:
+        conn._async_lock = asyncio.Lock()
+
+    async with conn._async_lock:
+        return await _wait_for(_aexecute(conn, sql, config), timeout)
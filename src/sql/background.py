@@ -0,0 +1,212 @@
+"""
+Run queries in a background thread (``%%sql --background``), so the kernel can keep
+running other cells while a long query executes
+"""
+import html
+import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+from IPython.display import display, HTML
+from sqlalchemy.pool import SingletonThreadPool
+
+from sql import exceptions
+
+from sql.run import run, ResultSet
+from sql.telemetry import telemetry
+
+# queries on the same connection run one at a time (see Connection._lock), so this
+# is the number of connections that can run queries concurrently
+_MAX_WORKERS = 4
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=_MAX_WORKERS, thread_name_prefix="jupysql-background"
+        )
+
+    return _executor
+
+
+class BackgroundQuery:
+    """
+    Handle to a query running in a background thread. It shows the status of the
+    query when displayed (and updates it once the query finishes)
+    """
+
+    def __init__(self, conn, sql, config, timeout=None):
+        self.sql = sql
+        self._conn = conn
+        self._config = config
+        self._timeout = timeout
+        self._cancel_requested = False
+        self._started_at = None
+        self._finished_at = None
+        self._display_handles = []
+        self._future = _get_executor().submit(self._run)
+        self._future.add_done_callback(self._on_done)
+
+    def _run(self):
+        try:
+            with self._conn._lock:
+                self._started_at = time.monotonic()
+
+                # cancelled while waiting for the connection
+                if self._cancel_requested:
+                    raise exceptions.RuntimeError("The query was cancelled")
+
+                result = run(self._conn, self.sql, self._config, timeout=self._timeout)
+
+                # fetch the rows while holding the lock, so the main thread
+                # doesn't use the connection concurrently
+                if isinstance(result, ResultSet):
+                    result.fetchall()
+
+            return result
+        except Exception as e:
+            if self._cancel_requested:
+                raise exceptions.RuntimeError("The query was cancelled") from e
+
+            raise
+        finally:
+            self._finished_at = time.monotonic()
+
+    def _on_done(self, future):
+        for handle in self._display_handles:
+            handle.update(HTML(self._repr_html_()))
+
+    @property
+    def status(self):
+        """One of: pending, running, finished, failed or cancelled"""
+        if self._future.cancelled():
+            return "cancelled"
+
+        if self._future.done():
+            if not self._future.exception():
+                return "finished"
+
+            return "cancelled" if self._cancel_requested else "failed"
+
+        return "running" if self._future.running() else "pending"
+
+    @property
+    def elapsed(self):
+        """Number of seconds the query has been running for"""
+        if self._started_at is None:
+            return 0.0
+
+        return (self._finished_at or time.monotonic()) - self._started_at
+
+    def done(self):
+        """Returns True if the query finished, failed or was cancelled"""
+        return self._future.done()
+
+    def result(self, timeout=None):
+        """
+        Waits for the query to finish (up to ``timeout`` seconds) and returns its
+        results. Raises the query's exception if it failed
+        """
+        return self._future.result(timeout=timeout)
+
+    def exception(self, timeout=None):
+        """Returns the query's exception (or None if it didn't fail)"""
+        try:
+            return self._future.exception(timeout=timeout)
+        except CancelledError:
+            return None
+
+    def cancel(self):
+        """
+        Cancels the query, returns True if it was cancelled. Running queries are
+        interrupted using the driver's native mechanism (returns False if the
+        driver doesn't support it), queries waiting for the connection are
+        cancelled once they get it
+        """
+        if self._future.cancel():
+            return True
+
+        if self._future.done():
+            return False
+
+        self._cancel_requested = True
+
+        # waiting for another query to release the connection, it's cancelled once
+        # it gets it (interrupting now would interrupt the other query)
+        if self._started_at is None:
+            return True
+
+        self._cancel_requested = self._conn.interrupt()
+        return self._cancel_requested
+
+    def _summary(self):
+        summary = f"{self.status} ({self.elapsed:.1f}s)"
+
+        if self.status == "failed":
+            summary = f"{summary}: {self._future.exception()}"
+
+        return summary
+
+    def __repr__(self):
+        return f"<BackgroundQuery {self._summary()}>"
+
+    def _repr_html_(self):
+        if self.status == "finished":
+            result = self.result()
+            result_html = getattr(result, "_repr_html_", lambda: None)()
+
+            if result_html is not None:
+                return result_html
+
+        return f"<code>BackgroundQuery</code>: {html.escape(self._summary())}"
+
+    def _ipython_display_(self):
+        handle = display(HTML(self._repr_html_()), display_id=True)
+
+        if handle is not None:
+            self._display_handles.append(handle)
+
+            # the query might've finished before we added the handle
+            if self.done():
+                handle.update(HTML(self._repr_html_()))
+
+
+def _is_thread_bound(conn):
+    """
+    Checks if the connection can only be used from the thread that created it
+    (e.g., in-memory SQLite)
+    """
+    pool = getattr(getattr(conn, "engine", None), "pool", None)
+    return isinstance(pool, SingletonThreadPool)
+
+
+@telemetry.log_call("run-in-background")
+def run_in_background(conn, sql, config, timeout=None):
+    """Runs a SQL query in a background thread, returns a BackgroundQuery
+
+    Parameters
+    ----------
+    conn : sql.connection.Connection
+        The connection to use
+
+    sql : str
+        SQL query to execute
+
+    config
+        Configuration object (e.g., SqlMagic)
+
+    timeout : float, default None
+        Maximum number of seconds each statement can run for, defaults to
+        ``config.statement_timeout``
+    """
+    if _is_thread_bound(conn):
+        raise exceptions.UsageError(
+            "Cannot run queries in the background with this connection since it "
+            f"can only be used from the thread that created it ({conn.url}). "
+            "Use a database stored in a file instead"
+        )
+
+    return BackgroundQuery(conn, sql, config, timeout=timeout)
@@ -0,0 +1,491 @@
+"""
+Columnar storage for the rows fetched by a ResultSet. Rows are transposed into
+columns as they're fetched, columns holding only integers or floats are stored in
+typed arrays (a few bytes per value instead of a Python object per value). If a
+memory limit is set, chunks over the limit are spilled to temporary Arrow IPC files
+and read back (memory-mapped) when needed
+"""
+import logging
+import os
+import sys
+import tempfile
+import weakref
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice
+
+# maximum number of values to look at when estimating the size of a column of objects
+_SIZE_SAMPLE = 100
+
+
+@lru_cache(maxsize=None)
+def _row_type(fields):
+    """
+    Returns a named tuple type to return rows with, so the values can be accessed
+    by name like SQLAlchemy's rows (``row.name`` and ``row._mapping["name"]``)
+    """
+    base = namedtuple("Row", fields, rename=True)
+
+    class Row(base):
+        __slots__ = ()
+
+        @property
+        def _mapping(self):
+            return dict(zip(fields, self))
+
+    return Row
+
+
+def _to_column(values):
+    """Store a sequence of values in the most compact column type"""
+    types = {type(value) for value in values}
+    has_nulls = type(None) in types
+    types.discard(type(None))
+
+    if types == {int}:
+        typecode, fill = "q", 0
+    elif types == {float}:
+        typecode, fill = "d", 0.0
+    else:
+        return ObjectColumn(values)
+
+    if has_nulls:
+        mask = bytearray(value is None for value in values)
+        filled = [fill if value is None else value for value in values]
+    else:
+        mask = None
+        filled = values
+
+    try:
+        return TypedColumn(array(typecode, filled), mask)
+    # integers that don't fit in 64 bits
+    except OverflowError:
+        return ObjectColumn(values)
+
+
+class ObjectColumn:
+    """A column of arbitrary Python objects (e.g., strings, dates, mixed types)"""
+
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def to_list(self, start=None, stop=None):
+        return self.values[start:stop]
+
+    def to_arrow(self, start=None, stop=None):
+        import pyarrow as pa
+
+        return pa.array(self.to_list(start, stop))
+
+    def get(self, idx):
+        return self.values[idx]
+
+    @property
+    def nbytes(self):
+        """Estimated size (the list plus a sample of the objects)"""
+        n = len(self.values)
+
+        if not n:
+            return sys.getsizeof(self.values)
+
+        sample = self.values[:: max(n // _SIZE_SAMPLE, 1)][:_SIZE_SAMPLE]
+        average = sum(sys.getsizeof(value) for value in sample) / len(sample)
+        return sys.getsizeof(self.values) + int(average * n)
+
+
+class TypedColumn:
+    """
+    A column of integers or floats stored in an ``array.array``, NULLs are
+    tracked with a byte mask (only allocated if there are NULLs)
+    """
+
+    __slots__ = ("values", "mask")
+
+    def __init__(self, values, mask=None):
+        self.values = values
+        self.mask = mask
+
+    def __len__(self):
+        return len(self.values)
+
+    def to_list(self, start=None, stop=None):
+        values = self.values[start:stop].tolist()
+
+        if self.mask is None:
+            return values
+
+        return [None if m else v for v, m in zip(values, self.mask[start:stop])]
+
+    def to_arrow(self, start=None, stop=None):
+        import pyarrow as pa
+
+        return pa.array(self.to_list(start, stop))
+
+    def get(self, idx):
+        if self.mask is not None and self.mask[idx]:
+            return None
+
+        return self.values[idx]
+
+    @property
+    def nbytes(self):
+        mask_nbytes = 0 if self.mask is None else len(self.mask)
+        return self.values.itemsize * len(self.values) + mask_nbytes
+
+
+class ArrowColumn:
+    """A column read (memory-mapped) from a spilled chunk"""
+
+    __slots__ = ("values",)
+
+    # the data lives in the memory-mapped file
+    nbytes = 0
+
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def to_list(self, start=None, stop=None):
+        return self.values[start:stop].to_pylist()
+
+    def to_arrow(self, start=None, stop=None):
+        return self.values[start:stop]
+
+    def get(self, idx):
+        return self.values[idx].as_py()
+
+
+class Chunk:
+    """A batch of fetched rows, stored as one column object per field"""
+
+    __slots__ = ("columns", "size", "nbytes")
+
+    def __init__(self, rows):
+        self.columns = [_to_column(values) for values in zip(*rows)]
+        self.size = len(rows)
+        self.nbytes = sum(column.nbytes for column in self.columns)
+
+    def row(self, idx):
+        return tuple(column.get(idx) for column in self.columns)
+
+    def rows(self, start=None, stop=None):
+        # rows without columns (zip would return nothing)
+        if not self.columns:
+            return iter([()] * len(range(self.size)[start:stop]))
+
+        return zip(*(column.to_list(start, stop) for column in self.columns))
+
+
+class ArrowChunk(Chunk):
+    """A batch of rows fetched straight into Arrow arrays (one per field)"""
+
+    __slots__ = ()
+
+    def __init__(self, arrays):
+        self.columns = [ArrowColumn(values) for values in arrays]
+        self.size = len(arrays[0])
+        self.nbytes = sum(values.nbytes for values in arrays)
+
+
+class SpilledChunk(Chunk):
+    """
+    A chunk stored in an Arrow IPC file. The file is memory-mapped on first access,
+    so the data is paged in by the OS as needed instead of living in the heap
+    """
+
+    __slots__ = ("path", "_table", "_finalizer", "__weakref__")
+
+    def __init__(self, chunk, directory=None):
+        import pyarrow as pa
+
+        table = pa.table(
+            {str(idx): column.to_arrow() for idx, column in enumerate(chunk.columns)}
+        )
+
+        fd, self.path = tempfile.mkstemp(
+            prefix="jupysql-", suffix=".arrow", dir=directory
+        )
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+
+        try:
+            with pa.OSFile(self.path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        except BaseException:
+            self.close()
+            raise
+
+        self.size = chunk.size
+        self.nbytes = 0
+        self._table = None
+
+    @property
+    def columns(self):
+        if self._table is None:
+            import pyarrow as pa
+
+            source = pa.memory_map(self.path, "r")
+            self._table = pa.ipc.open_file(source).read_all()
+
+        # the table has a single batch, so each column has a single chunk
+        return [ArrowColumn(column.chunk(0)) for column in self._table.columns]
+
+    def close(self):
+        """Deletes the file"""
+        self._table = None
+        self._finalizer()
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ColumnarBuffer:
+    """
+    Stores rows in chunks of typed columns. It behaves like a read-only list of
+    tuples (supports ``len()``, iteration, indexing, slicing and comparison with a
+    list) and can return whole columns without transposing the rows
+
+    Examples
+    --------
+    >>> from sql.buffer import ColumnarBuffer
+    >>> buffer = ColumnarBuffer()
+    >>> buffer.extend([(1, "a"), (2, "b")])
+    >>> buffer.extend([(3, None)])
+    >>> buffer[0]
+    (1, 'a')
+    >>> buffer[1:]
+    [(2, 'b'), (3, None)]
+    >>> buffer.columns()
+    [array('q', [1, 2, 3]), ['a', 'b', None]]
+
+    Parameters
+    ----------
+    memory_limit : int, default None
+        Maximum (estimated) number of bytes to keep in memory. Once exceeded,
+        chunks are spilled to disk (requires pyarrow). None or 0 means no limit
+
+    spill_directory : str, default None
+        Directory to store the spilled chunks, defaults to the system's temporary
+        directory
+
+    fields : list, default None
+        The column names, if passed, rows are returned as named tuples
+    """
+
+    def __init__(self, memory_limit=None, spill_directory=None, fields=None):
+        self.memory_limit = memory_limit or None
+        self.spill_directory = spill_directory
+        self.fields = fields
+        self._chunks = []
+        # the row index where each chunk starts, used to find a row's chunk
+        self._offsets = []
+        self._n_rows = 0
+        # chunks that can't be represented in Arrow (e.g., mixed types)
+        self._not_spillable = set()
+
+    @property
+    def fields(self):
+        return self._fields
+
+    @fields.setter
+    def fields(self, fields):
+        self._fields = tuple(fields) if fields else None
+        self._row_type = None if self._fields is None else _row_type(self._fields)
+
+    def _named(self, rows):
+        if self._row_type is None:
+            return rows
+
+        return map(self._row_type._make, rows)
+
+    @property
+    def nbytes(self):
+        """Estimated number of bytes kept in memory"""
+        return sum(chunk.nbytes for chunk in self._chunks)
+
+    @property
+    def n_spilled(self):
+        """Number of chunks spilled to disk"""
+        return sum(isinstance(chunk, SpilledChunk) for chunk in self._chunks)
+
+    def extend(self, rows):
+        """Add a batch of rows to the buffer"""
+        rows = list(rows)
+
+        if not rows:
+            return
+
+        self._offsets.append(self._n_rows)
+        self._chunks.append(Chunk(rows))
+        self._n_rows += len(rows)
+
+        if self.memory_limit and self.nbytes > self.memory_limit:
+            self._spill()
+
+    def extend_arrow(self, arrays):
+        """Add a batch of rows as Arrow arrays (one per field), the arrays are
+        stored as-is"""
+        if not arrays or not len(arrays[0]):
+            return
+
+        self._offsets.append(self._n_rows)
+        self._chunks.append(ArrowChunk(arrays))
+        self._n_rows += len(arrays[0])
+
+        if self.memory_limit and self.nbytes > self.memory_limit:
+            self._spill()
+
+    def _spill(self):
+        """Spill chunks to disk (oldest first) until we're under the memory limit"""
+        import pyarrow as pa
+
+        nbytes = self.nbytes
+
+        for idx, chunk in enumerate(self._chunks):
+            if nbytes <= self.memory_limit:
+                break
+
+            if isinstance(chunk, SpilledChunk) or id(chunk) in self._not_spillable:
+                continue
+
+            try:
+                self._chunks[idx] = SpilledChunk(chunk, directory=self.spill_directory)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                logging.debug(f"Could not spill chunk to disk: {e}")
+                self._not_spillable.add(id(chunk))
+                continue
+
+            nbytes -= chunk.nbytes
+
+    def clear(self):
+        """Removes all the rows (and deletes the spilled files)"""
+        for chunk in self._chunks:
+            if isinstance(chunk, SpilledChunk):
+                chunk.close()
+
+        self._chunks = []
+        self._offsets = []
+        self._n_rows = 0
+        self._not_spillable = set()
+
+    def __len__(self):
+        return self._n_rows
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from self._named(chunk.rows())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._n_rows)
+
+            if step != 1:
+                return list(self)[key]
+
+            return list(islice(self._iter_from(start), max(stop - start, 0)))
+
+        if not isinstance(key, int):
+            raise TypeError(
+                f"indices must be integers or slices, not {type(key).__name__}"
+            )
+
+        if key < 0:
+            key += self._n_rows
+
+        if not 0 <= key < self._n_rows:
+            raise IndexError("row index out of range")
+
+        idx = bisect_right(self._offsets, key) - 1
+        row = self._chunks[idx].row(key - self._offsets[idx])
+        return row if self._row_type is None else self._row_type._make(row)
+
+    def __eq__(self, other):
+        if isinstance(other, (ColumnarBuffer, list, tuple)):
+            return list(self) == list(other)
+
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{type(self).__name__}({list(self)!r})"
+
+    def _iter_from(self, start):
+        """Iterate over the rows, starting at the given position"""
+        if start >= self._n_rows:
+            return
+
+        idx = bisect_right(self._offsets, start) - 1
+        yield from self._named(self._chunks[idx].rows(start - self._offsets[idx]))
+
+        for chunk in self._chunks[idx + 1 :]:
+            yield from self._named(chunk.rows())
+
+    def column(self, idx):
+        """Returns all the values in a column (a list or array)"""
+        columns = [chunk.columns[idx] for chunk in self._chunks]
+
+        # if all the chunks have the same type and no NULLs, we can concatenate the
+        # arrays directly
+        typecodes = {
+            column.values.typecode
+            if isinstance(column, TypedColumn) and column.mask is None
+            else None
+            for column in columns
+        }
+
+        if len(typecodes) == 1 and None not in typecodes:
+            values = array(typecodes.pop())
+
+            for column in columns:
+                values.extend(column.values)
+
+            return values
+
+        values = []
+
+        for column in columns:
+            values.extend(column.to_list())
+
+        return values
+
+    def columns(self):
+        """Returns all the columns"""
+        if not self._chunks:
+            return []
+
+        return [self.column(idx) for idx in range(len(self._chunks[0].columns))]
+
+    def iter_column_batches(self, size):
+        """
+        Yields the data in batches of at most ``size`` rows, each batch is a list
+        with the values of each column
+        """
+        for chunk in self._chunks:
+            columns = chunk.columns
+
+            for start in range(0, chunk.size, size):
+                yield [column.to_list(start, start + size) for column in columns]
+
+    def iter_arrow_batches(self, size):
+        """
+        Like ``iter_column_batches`` but each column is a pyarrow.Array (spilled
+        chunks are sliced without copying)
+        """
+        for chunk in self._chunks:
+            columns = chunk.columns
+
+            for start in range(0, chunk.size, size):
+                yield [column.to_arrow(start, start + size) for column in columns]
@@ -0,0 +1,179 @@
+"""
+In-memory cache of query results (used with ``%%sql --cache``). Results are keyed
+by connection and normalized SQL, and the cache for a connection is invalidated
+whenever a statement that is not a SELECT runs on it
+"""
+import time
+from collections import OrderedDict
+
+from sql.buffer import ColumnarBuffer
+
+
+def normalize_statement(statement, dialect=None):
+    """
+    Normalize a SQL statement with sqlglot, so queries that only differ in
+    formatting (whitespace, keyword case, etc.) share the same cache entry
+
+    Examples
+    --------
+    >>> from sql.cache import normalize_statement
+    >>> normalize_statement("select  *\\nFROM   numbers")
+    'SELECT * FROM numbers'
+    """
+    import sqlglot
+
+    try:
+        expressions = sqlglot.parse(statement, read=dialect)
+    except sqlglot.errors.SqlglotError:
+        expressions = None
+
+    if expressions and all(expressions):
+        return ";\n".join(expression.sql(dialect=dialect) for expression in expressions)
+
+    return " ".join(statement.split())
+
+
+def connection_key(conn):
+    """Identifies a connection in the cache"""
+    return (conn.url, conn.alias)
+
+
+def cache_key(conn, statement, config):
+    """Cache key for a statement executed with the given connection"""
+    return (
+        connection_key(conn),
+        normalize_statement(str(statement), conn._get_curr_sqlglot_dialect()),
+        # autolimit determines how many rows are fetched
+        config.autolimit,
+    )
+
+
+class CachedResult:
+    """The rows and column names of a cached result"""
+
+    __slots__ = ("keys", "rows", "created_at")
+
+    def __init__(self, keys, rows):
+        self.keys = list(keys)
+        self.rows = ColumnarBuffer()
+        self.rows.extend(rows)
+        self.created_at = time.monotonic()
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes
+
+    def cursor(self):
+        """Returns a cursor-like object that fetches the cached rows"""
+        return CachedCursor(self.keys, self.rows)
+
+
+class CachedCursor:
+    """
+    Implements the subset of the SQLAlchemy result API that ResultSet uses, returning
+    the rows of a cached result
+    """
+
+    rowcount = -1
+
+    def __init__(self, keys, rows):
+        self._keys = keys
+        self._rows = rows
+        self._position = 0
+
+    def keys(self):
+        return self._keys
+
+    def fetchmany(self, size):
+        rows = self._rows[self._position : self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._position :]
+        self._position = len(self._rows)
+        return rows
+
+    def close(self):
+        pass
+
+
+class QueryCache:
+    """
+    LRU cache of query results. Entries older than ``ttl`` seconds are discarded
+    when looked up, and the least recently used entries are evicted to keep the
+    cache under ``max_bytes``
+
+    Examples
+    --------
+    >>> from sql.cache import QueryCache
+    >>> cache = QueryCache()
+    >>> cache.put(("sqlite://", "SELECT 1"), keys=["1"], rows=[(1,)], max_bytes=1024)
+    >>> cache.get(("sqlite://", "SELECT 1")).keys
+    ['1']
+    >>> cache.invalidate("sqlite://")
+    >>> cache.get(("sqlite://", "SELECT 1")) is None
+    True
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def nbytes(self):
+        """Estimated number of bytes used by the cached results"""
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def get(self, key, ttl=None):
+        """
+        Returns the cached result for the key (or None if there isn't one or it's
+        older than ``ttl`` seconds)
+        """
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        if ttl and time.monotonic() - entry.created_at > ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, keys, rows, max_bytes=None):
+        """
+        Cache a result, evicting the least recently used ones if the cache uses
+        more than ``max_bytes`` (results larger than ``max_bytes`` are not cached)
+        """
+        entry = CachedResult(keys, rows)
+        self._entries.pop(key, None)
+
+        if max_bytes and entry.nbytes > max_bytes:
+            return
+
+        self._entries[key] = entry
+
+        if max_bytes:
+            nbytes = self.nbytes
+
+            while nbytes > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                nbytes -= evicted.nbytes
+
+    def invalidate(self, connection_key):
+        """Remove the cached results for a connection"""
+        for key in [key for key in self._entries if key[0] == connection_key]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
+query_cache = QueryCache()
@@ -0,0 +1,60 @@
+from sql.connection import Connection
+from sql.cmd.cmd_utils import CmdParser
+from sql.display import Table, Message
+
+# maximum number of characters of the query to display
+_MAX_QUERY_LENGTH = 50
+
+
+def _format_query(statement):
+    # the statement might be a sqlalchemy.text object
+    query = " ".join(str(statement if statement is not None else "").split())
+
+    if len(query) > _MAX_QUERY_LENGTH:
+        query = query[: _MAX_QUERY_LENGTH - 3] + "..."
+
+    return query
+
+
+def _format_bytes(nbytes):
+    for unit in ("B", "KB", "MB"):
+        if nbytes < 1024:
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+
+        nbytes /= 1024
+
+    return f"{nbytes:.1f} GB"
+
+
+def results(others):
+    """
+    Implementation of `%sqlcmd results`
+
+    Lists the result sets retained by each connection (the most recently used
+    first), with the number of rows they store and their (estimated) size
+
+    Parameters
+    ----------
+    others : str,
+            A string containing the command line arguments.
+    """
+    parser = CmdParser()
+    parser.parse_args(others)
+
+    rows = []
+
+    for connection in Connection._get_connections():
+        for result_set in reversed(list(connection["connection"]._result_sets)):
+            rows.append(
+                [
+                    connection["key"],
+                    _format_query(result_set.statement),
+                    len(result_set._results),
+                    _format_bytes(result_set.nbytes),
+                ]
+            )
+
+    if not rows:
+        return Message("No result sets stored")
+
+    return Table(["Connection", "Query", "Rows", "Size"], rows)
@@ -1,7 +1,6 @@
 from sql import exceptions
 import sql.connection
 from sqlalchemy import text
-from sqlglot import select, condition
 from prettytable import PrettyTable
 from sql.cmd.cmd_utils import CmdParser
 
@@ -23,6 +22,8 @@ def return_test_results(args, conn, query):
 
 
 def run_each_individually(args, conn):
+    from sqlglot import select, condition
+
     base_query = select("*").from_(args.table)
 
     storage = {}
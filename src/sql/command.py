@@ -1,5 +1,6 @@
+from functools import lru_cache
+
 from IPython.core.magic_arguments import parse_argstring
-from jinja2 import Template
 
 from sqlalchemy.engine import Engine
 
@@ -7,6 +8,24 @@ from sql import parse
 from sql.store import store
 from sql.connection import Connection
 
+# number of queries in the cache of compiled templates
+_TEMPLATE_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=_TEMPLATE_CACHE_SIZE)
+def _compile_template(source):
+    """Returns the compiled template and the names of the variables it uses"""
+    from jinja2 import Template, meta
+
+    template = Template(source)
+    names = meta.find_undeclared_variables(template.environment.parse(source))
+    return template, frozenset(names)
+
+
+def _is_template(source):
+    """Checks if the query uses any jinja syntax (variables, blocks, comments)"""
+    return "{{" in source or "{%" in source or "{#" in source
+
 
 class SQLPlotCommand:
     def __init__(self, magic, line) -> None:
@@ -103,7 +122,19 @@ class SQLCommand:
         return self.parsed["return_result_var"]
 
     def _var_expand(self, sql, user_ns, magic):
-        return Template(sql).render(user_ns)
+        if not _is_template(sql):
+            # return the same as jinja, which normalizes line breaks and removes the
+            # trailing one
+            sql = sql.replace("\r\n", "\n").replace("\r", "\n")
+            return sql[:-1] if sql.endswith("\n") else sql
+
+        template, names = _compile_template(sql)
+
+        # Template.render copies the variables, so only pass the ones it uses
+        # instead of the whole namespace
+        return template.render(
+            **{name: user_ns[name] for name in names if name in user_ns}
+        )
 
     def __repr__(self) -> str:
         return (
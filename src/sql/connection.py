@@ -1,13 +1,19 @@
+import asyncio
 import os
+import sys
+import threading
+from collections import OrderedDict
+from copy import copy
+from functools import lru_cache, wraps
 from difflib import get_close_matches
 import atexit
 
 import sqlalchemy
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import NoSuchModuleError, OperationalError
+from sqlalchemy.pool import QueuePool, SingletonThreadPool
 from IPython.core.error import UsageError
 import difflib
-import sqlglot
 
 from sql.store import store
 from sql.telemetry import telemetry
@@ -50,6 +56,16 @@ MISSING_PACKAGE_LIST_EXCEPT_MATCHERS = {
     "pymssql": "pymssql",
 }
 
+# create_engine arguments that can be passed in --connection_arguments (or in
+# SqlMagic.pool_options) to configure the connection pool
+POOL_OPTIONS = (
+    "pool_size",
+    "max_overflow",
+    "pool_timeout",
+    "pool_recycle",
+    "pool_pre_ping",
+)
+
 DIALECT_NAME_SQLALCHEMY_TO_SQLGLOT_MAPPING = {"postgresql": "postgres", "mssql": "tsql"}
 
 # All the DBs and their respective documentation links
@@ -147,6 +163,87 @@ def is_pep249_compliant(conn):
     return True
 
 
+def _memoize_per_session(method):
+    """
+    Caches the value returned by a Connection method that takes no arguments
+    (e.g., the dialect information), values are computed again if the connection's
+    session changes. Lists and dictionaries are copied, so callers can modify them
+    """
+
+    @wraps(method)
+    def wrapper(self):
+        session = getattr(self, "session", None)
+
+        if (
+            "_memoized" not in self.__dict__
+            or self.__dict__["_memoized_session"] is not session
+        ):
+            self._memoized = {}
+            self._memoized_session = session
+
+        name = method.__name__
+
+        if name not in self._memoized:
+            self._memoized[name] = method(self)
+
+        value = self._memoized[name]
+        return copy(value) if isinstance(value, (list, dict)) else value
+
+    return wrapper
+
+
+class ResultSetRegistry:
+    """
+    Keeps track of the result sets created with a connection, in least recently
+    used order. ``evict`` closes the least recently used ones (closing their cursor
+    and dropping their rows) to keep the registry within a number of result sets
+    and an (estimated) number of bytes
+    """
+
+    def __init__(self):
+        self._result_sets = OrderedDict()
+
+    def __len__(self):
+        return len(self._result_sets)
+
+    def __iter__(self):
+        return iter(list(self._result_sets.values()))
+
+    @property
+    def nbytes(self):
+        """Estimated number of bytes used by the rows of the stored result sets"""
+        return sum(result_set.nbytes for result_set in self)
+
+    def add(self, result_set):
+        """Add a result set (as the most recently used one)"""
+        self._result_sets[id(result_set)] = result_set
+
+    def remove(self, result_set):
+        """Remove a result set (if it's in the registry)"""
+        self._result_sets.pop(id(result_set), None)
+
+    def touch(self, result_set):
+        """Mark a result set as the most recently used one"""
+        if id(result_set) in self._result_sets:
+            self._result_sets.move_to_end(id(result_set))
+
+    def evict(self, max_size=None, max_bytes=None):
+        """
+        Close the least recently used result sets until there are at most
+        ``max_size`` of them and they use at most ``max_bytes``. The most recently
+        used result set is never evicted. None or 0 means no limit
+        """
+        nbytes = self.nbytes if max_bytes else 0
+
+        while len(self._result_sets) > 1 and (
+            (max_size and len(self._result_sets) > max_size)
+            or (max_bytes and nbytes > max_bytes)
+        ):
+            _, result_set = self._result_sets.popitem(last=False)
+            nbytes -= result_set.nbytes
+            result_set.close()
+
+
 class Connection:
     """Manages connections to databases
 
@@ -186,6 +283,11 @@ class Connection:
     # all connections
     connections = {}
 
+    # engines created by from_connect_str, connections with the same connection
+    # string, connect_args, creator and pool options share the engine (and its
+    # connection pool)
+    _engines = {}
+
     def __init__(self, engine, alias=None):
         self.alias = alias
         self.engine = engine
@@ -208,7 +310,10 @@ class Connection:
         self.connections[alias or self.url] = self
         self.connect_args = None
 
-        self._result_sets = []
+        self._result_sets = ResultSetRegistry()
+        # held while running a query, so queries running in the background (see
+        # sql.background) don't use the connection at the same time
+        self._lock = threading.RLock()
 
         Connection.current = self
 
@@ -317,23 +422,54 @@ class Connection:
 
     @classmethod
     def from_connect_str(
-        cls, connect_str=None, connect_args=None, creator=None, alias=None
+        cls,
+        connect_str=None,
+        connect_args=None,
+        creator=None,
+        alias=None,
+        pool_options=None,
     ):
-        """Creates a new connection from a connection string"""
-        connect_args = connect_args or {}
+        """Creates a new connection from a connection string
+
+        The engine is shared with existing connections created with the same
+        arguments (except the alias). ``pool_options`` (and the keys in
+        ``connect_args`` listed in ``POOL_OPTIONS``) are passed to
+        ``sqlalchemy.create_engine`` to configure the connection pool
+        """
+        connect_args, pool_options = _split_pool_options(connect_args, pool_options)
+        key = _engine_key(connect_str, connect_args, creator, pool_options)
+        engine = cls._engines.get(key)
+
+        if engine is None:
+            engine = cls._create_engine(
+                connect_str, connect_args, creator, pool_options
+            )
+
+            # thread-bound pools (e.g., in-memory SQLite) return the same DBAPI
+            # connection, so sharing them would also share the database. Engines
+            # with async drivers can only be disposed from a coroutine
+            if not (
+                isinstance(engine.pool, SingletonThreadPool) or engine.dialect.is_async
+            ):
+                cls._engines[key] = engine
+
+        if engine.dialect.is_async:
+            connection = AsyncConnection(engine, alias=alias)
+        else:
+            connection = cls(engine, alias=alias)
+        connection.connect_args = connect_args
+
+        return connection
+
+    @classmethod
+    def _create_engine(cls, connect_str, connect_args, creator, pool_options):
+        kwargs = dict(connect_args=connect_args, **pool_options)
+
+        if creator:
+            kwargs["creator"] = creator
 
         try:
-            if creator:
-                engine = sqlalchemy.create_engine(
-                    connect_str,
-                    connect_args=connect_args,
-                    creator=creator,
-                )
-            else:
-                engine = sqlalchemy.create_engine(
-                    connect_str,
-                    connect_args=connect_args,
-                )
+            return sqlalchemy.create_engine(connect_str, **kwargs)
         except (ModuleNotFoundError, NoSuchModuleError) as e:
             suggestion_str = get_missing_package_suggestion_str(e)
             raise exceptions.MissingPackageError(
@@ -348,13 +484,16 @@ class Connection:
         except Exception as e:
             raise cls._error_invalid_connection_info(e, connect_str) from e
 
-        connection = cls(engine, alias=alias)
-        connection.connect_args = connect_args
-
-        return connection
-
     @classmethod
-    def set(cls, descriptor, displaycon, connect_args=None, creator=None, alias=None):
+    def set(
+        cls,
+        descriptor,
+        displaycon,
+        connect_args=None,
+        creator=None,
+        alias=None,
+        pool_options=None,
+    ):
         """
         Set the current database connection. This method is called from the magic to
         determine which connection to use (either use an existing one or open a new one)
@@ -365,6 +504,10 @@ class Connection:
             is_dbapi_connection_ = Connection.is_dbapi_connection(descriptor)
             if isinstance(descriptor, Connection):
                 cls.current = descriptor
+            elif _is_async_engine(descriptor):
+                cls.current = AsyncConnection(descriptor.sync_engine, alias=alias)
+            elif isinstance(descriptor, Engine) and descriptor.dialect.is_async:
+                cls.current = AsyncConnection(descriptor, alias=alias)
             elif isinstance(descriptor, Engine):
                 cls.current = Connection(descriptor, alias=alias)
             elif is_dbapi_connection_:
@@ -391,6 +534,7 @@ class Connection:
                         connect_args=connect_args,
                         creator=creator,
                         alias=alias,
+                        pool_options=pool_options,
                     )
 
         else:
@@ -403,6 +547,7 @@ class Connection:
                     connect_args=connect_args,
                     creator=creator,
                     alias=alias,
+                    pool_options=pool_options,
                 )
             else:
                 raise cls._error_no_connection()
@@ -431,6 +576,7 @@ class Connection:
                     "key": key,
                     "url": conn.url,
                     "alias": conn.alias,
+                    "pool": conn._pool_stats(),
                     "connection": conn,
                 }
             )
@@ -458,7 +604,7 @@ class Connection:
             return d
 
         return display.ConnectionsTable(
-            headers=["current", "url", "alias"],
+            headers=["current", "url", "alias", "pool"],
             rows_maps=[map_values(c) for c in connections],
         )
 
@@ -493,6 +639,55 @@ class Connection:
             rs._sqlaproxy.close()
 
         self.session.close()
+        self._release_engine()
+
+    def _release_engine(self):
+        """
+        Disposes the engine (closing the connections in its pool) if it was created
+        by from_connect_str and no other connection uses it
+        """
+        engine = getattr(self, "engine", None)
+        keys = [key for key, value in self._engines.items() if value is engine]
+
+        if not keys:
+            return
+
+        in_use = any(
+            conn is not self and getattr(conn, "engine", None) is engine
+            for conn in self.connections.values()
+        )
+
+        if not in_use:
+            for key in keys:
+                del self._engines[key]
+
+            engine.dispose()
+
+    def _pool_stats(self):
+        """Returns a summary of the engine's connection pool"""
+        engine = getattr(self, "engine", None)
+        pool = getattr(engine, "pool", None)
+
+        if pool is None:
+            return ""
+
+        stats = type(pool).__name__
+
+        if isinstance(pool, QueuePool):
+            stats = (
+                f"{stats}: {pool.checkedout()} checked out, {pool.checkedin()} idle "
+                f"(size: {pool.size()}, overflow: {max(pool.overflow(), 0)})"
+            )
+
+        shared_by = sum(
+            getattr(conn, "engine", None) is engine
+            for conn in self.connections.values()
+        )
+
+        if shared_by > 1:
+            stats = f"{stats}, shared by {shared_by} connections"
+
+        return stats
 
     @classmethod
     def close_all(cls, verbose=False):
@@ -506,6 +701,11 @@ class Connection:
 
         cls.connections = {}
 
+        for engine in cls._engines.values():
+            engine.dispose()
+
+        cls._engines = {}
+
     def is_dbapi_connection(conn=None) -> bool:
         """
         Checks if given connection is custom
@@ -530,6 +730,7 @@ class Connection:
 
         return is_dbapi_connection_
 
+    @_memoize_per_session
     def _get_curr_sqlalchemy_connection_info(self):
         """Get the dialect, driver, and database server version info of current
         connected dialect
@@ -556,6 +757,7 @@ class Connection:
         }
 
     # TODO: we have self.dialect and we also have this, which is confusing, see #732
+    @_memoize_per_session
     def _get_curr_sqlglot_dialect(self):
         """Get the dialect name in sqlglot package scope
 
@@ -573,6 +775,7 @@ class Connection:
             connection_info["dialect"], connection_info["dialect"]
         )
 
+    @_memoize_per_session
     def is_use_backtick_template(self):
         """Get if the dialect support backtick (`) syntax as identifier
 
@@ -581,6 +784,8 @@ class Connection:
         bool
             Indicate if the dialect can use backtick identifier in the SQL clause
         """
+        import sqlglot
+
         cur_dialect = self._get_curr_sqlglot_dialect()
         if not cur_dialect:
             return False
@@ -591,12 +796,15 @@ class Connection:
         except (ValueError, AttributeError, TypeError):
             return False
 
+    @_memoize_per_session
     def get_curr_identifiers(self) -> list:
         """
         Returns list of identifiers for current connection
 
         Default identifiers are : ["", '"']
         """
+        import sqlglot
+
         identifiers = ["", '"']
         try:
             connection_info = self._get_curr_sqlalchemy_connection_info()
@@ -630,11 +838,14 @@ class Connection:
             SQL clause that's compatible to current connected dialect
         """
         write_dialect = self._get_curr_sqlglot_dialect()
-        try:
-            query = sqlglot.parse_one(query).sql(dialect=write_dialect)
-        finally:
+
+        # queries are written in sqlglot's default dialect, there's nothing to
+        # translate if we don't know the connection's dialect
+        if write_dialect is None:
             return query
 
+        return _transpile(query, write_dialect)
+
     def _prepare_query(self, query, with_=None) -> str:
         """
         Returns a textual representation of a query based
@@ -665,19 +876,131 @@ class Connection:
         Executes SQL query on a given connection
         """
         query = self._prepare_query(query, with_)
-        return self.session.execute(query)
+
+        # wait for the queries running in the background on this connection
+        with self._lock:
+            return self.session.execute(query)
+
+    def _get_dbapi_connection(self):
+        """Returns the DBAPI connection used by the session"""
+        connection = self.session.connection
+        # SQLAlchemy wraps it in a proxy from the connection pool
+        return getattr(connection, "dbapi_connection", connection)
+
+    def _get_interrupt(self):
+        """
+        Returns the function that interrupts the running statement (or None if
+        the driver doesn't support it)
+        """
+        return _find_interrupt(self._get_dbapi_connection())
+
+    def interrupt(self):
+        """
+        Interrupts the statement running on this connection using the driver's
+        native mechanism (e.g., DuckDB and SQLite's ``interrupt()``, psycopg's
+        ``cancel()``). Returns False if the driver doesn't support it
+        """
+        interrupt = self._get_interrupt()
+
+        if interrupt is None:
+            return False
+
+        interrupt()
+        return True
 
 
 atexit.register(Connection.close_all, verbose=True)
 
 
+# number of (query, dialect) pairs in the cache of transpiled queries
+_TRANSPILE_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=_TRANSPILE_CACHE_SIZE)
+def _transpile(query, dialect):
+    """
+    Translates a query to the dialect with sqlglot (returns the query unchanged if
+    sqlglot cannot parse it). Results are cached since internal queries (e.g.,
+    plotting, the table explorer) are the same for every call
+    """
+    import sqlglot
+
+    try:
+        return sqlglot.parse_one(query).sql(dialect=dialect)
+    except Exception:
+        return query
+
+
+def transpile_cache_info():
+    """
+    Returns the hits, misses, maximum size and current size of the cache of
+    transpiled queries
+    """
+    return _transpile.cache_info()
+
+
+def _split_pool_options(connect_args, pool_options):
+    """
+    Moves the pool options in connect_args (passed in --connection_arguments) to
+    pool_options, which take precedence
+    """
+    connect_args = dict(connect_args or {})
+    pool_options = dict(pool_options or {})
+
+    for name in POOL_OPTIONS:
+        if name in connect_args:
+            pool_options[name] = connect_args.pop(name)
+
+    return connect_args, pool_options
+
+
+def _engine_key(connect_str, connect_args, creator, pool_options):
+    # connect_args values might not be hashable (e.g., nested dictionaries)
+    return (
+        connect_str,
+        repr(sorted(connect_args.items())),
+        creator,
+        repr(sorted(pool_options.items())),
+    )
+
+
+def _find_interrupt(dbapi_object):
+    """Finds the method to interrupt the statement running on a DBAPI object"""
+    # duckdb and sqlite3 have interrupt(), psycopg2 and psycopg have cancel()
+    for name in ("interrupt", "cancel"):
+        method = getattr(dbapi_object, name, None)
+
+        if callable(method):
+            return method
+
+    return None
+
+
 class DBAPISession:
     """
     A session object for generic DBAPI connections
+
+    Each statement that returns rows gets its own cursor (so the results of
+    previous statements can still be fetched). Cursors are released once their
+    results are fetched (see ResultSet): the last released cursor is kept open and
+    reused for the next statement, the rest are closed. Reusing a cursor also
+    keeps temporary tables visible since, in native duckdb connections, they're
+    only visible to the cursor that created them
     """
 
     def __init__(self, connection, engine):
         self.engine = engine
+        # the cursor running the last statement (used to interrupt it)
+        self.cursor = None
+        # idle cursor used for the next statement
+        self._primary_cursor = None
+        # cursors whose results haven't been released (by id, since cursors might
+        # not be hashable)
+        self._open_cursors = {}
+        # number of statements executed, each cursor is tagged with the number of
+        # the last statement executed on it (see execution_id)
+        self._n_executed = 0
+        self._last_executed = {}
         self.dialect = dict(
             {
                 "name": connection.dialect,
@@ -686,14 +1009,100 @@ class DBAPISession:
             }
         )
 
-    # TODO: this will fail when using a duck native connection and a tmp
-    # table since the table will only be visible to the cursor
-    def execute(self, query):
-        cur = self.engine.cursor()
-        cur.execute(query)
+    @property
+    def n_open_cursors(self):
+        """Number of open cursors (including the idle one)"""
+        return len(self._open_cursors) + (self._primary_cursor is not None)
+
+    def execute(self, query, parameters=None):
+        cur = self._primary_cursor or self.engine.cursor()
+        self._primary_cursor = None
+        self._open_cursors[id(cur)] = cur
+        self._n_executed += 1
+        self._last_executed[id(cur)] = self._n_executed
+        # keep a reference so the statement can be interrupted (duckdb runs it
+        # in the cursor, not in the connection)
+        self.cursor = cur
+
+        try:
+            if parameters is None:
+                cur.execute(query)
+            else:
+                cur.execute(query, parameters)
+        except BaseException:
+            self.release_cursor(cur)
+            raise
+
+        # the statement didn't return rows (e.g., CREATE TABLE in sqlite3)
+        if cur.description is None:
+            self.release_cursor(cur)
+
         return cur
 
+    def execution_id(self, cursor):
+        """
+        Returns an ID of the last statement executed on the cursor (None if the
+        cursor wasn't created by this session)
+        """
+        return self._last_executed.get(id(cursor))
+
+    def is_idle(self, cursor, execution_id):
+        """
+        Checks if the cursor was released and the statement with ``execution_id``
+        (see execution_id) is the last one executed on it (so it still has its
+        results)
+        """
+        return (
+            cursor is self._primary_cursor and self.execution_id(cursor) == execution_id
+        )
+
+    def release_cursor(self, cursor, reuse=True):
+        """
+        Releases a cursor returned by execute once its results are no longer
+        needed. It's kept open to run the next statement if ``reuse`` is True and
+        there isn't an idle cursor, otherwise it's closed. Returns False if the
+        cursor wasn't created by this session (or it was already closed)
+        """
+        if cursor is self._primary_cursor:
+            return True
+
+        if self._open_cursors.pop(id(cursor), None) is None:
+            return False
+
+        if reuse and self._primary_cursor is None:
+            self._primary_cursor = cursor
+        else:
+            self._last_executed.pop(id(cursor), None)
+            _close_cursor(cursor)
+
+        return True
+
     def close(self):
+        """Closes all the cursors (but not the DBAPI connection)"""
+        cursors = list(self._open_cursors.values())
+
+        if self._primary_cursor is not None:
+            cursors.append(self._primary_cursor)
+
+        for cursor in cursors:
+            _close_cursor(cursor)
+
+        self._open_cursors = {}
+        self._last_executed = {}
+        self._primary_cursor = None
+        self.cursor = None
+
+
+def _close_cursor(cursor):
+    close = getattr(cursor, "close", None)
+
+    if close is None:
+        return
+
+    try:
+        close()
+    # the connection might be closed already
+    except Exception:
         pass
 
 
@@ -703,11 +1112,9 @@ class DBAPIConnection(Connection):
     """
 
     @telemetry.log_call("DBAPIConnection", payload=True)
-    def __init__(self, payload, engine=None, alias=None):
-        try:
+    def __init__(self, engine=None, alias=None, *, payload=None):
+        if payload is not None:
             payload["engine"] = type(engine)
-        except Exception as e:
-            payload["engine_parsing_error"] = str(e)
 
         if engine is None:
             raise ValueError("Engine cannot be None")
@@ -728,7 +1135,89 @@ class DBAPIConnection(Connection):
         Connection.current = self
 
         # TODO: create an abstract class
-        self._result_sets = []
+        self._result_sets = ResultSetRegistry()
+        self._lock = threading.RLock()
+
+    def _get_dbapi_connection(self):
+        return self.session.engine
+
+    def _get_interrupt(self):
+        cursor = self.session.cursor
+
+        if cursor is not None:
+            interrupt = _find_interrupt(cursor)
+
+            if interrupt is not None:
+                return interrupt
+
+        return _find_interrupt(self.session.engine)
+
+    def _pool_stats(self):
+        n_open_cursors = self.session.n_open_cursors
+        return f"{n_open_cursors} open cursor{'' if n_open_cursors == 1 else 's'}"
+
+
+def _is_async_engine(obj):
+    """
+    Checks if the object is a SQLAlchemy AsyncEngine (without importing
+    sqlalchemy.ext.asyncio, which is slow to import)
+    """
+    asyncio_ext = sys.modules.get("sqlalchemy.ext.asyncio")
+    return asyncio_ext is not None and isinstance(obj, asyncio_ext.AsyncEngine)
+
+
+class AsyncConnection(Connection):
+    """
+    A connection that uses an async driver (e.g., sqlite+aiosqlite,
+    postgresql+asyncpg). Async drivers can only be used from a coroutine, so
+    queries run with ``await sql.aexecute(query)``, each one with a connection from
+    the engine's pool (see sql.aio)
+
+    Attributes
+    ----------
+    async_engine : sqlalchemy.ext.asyncio.AsyncEngine
+        An async engine that uses the same connection pool as ``engine``
+    """
+
+    def __init__(self, engine, alias=None):
+        from sqlalchemy.ext.asyncio import AsyncEngine
+
+        super().__init__(engine, alias=alias)
+        self.async_engine = AsyncEngine(engine)
+        # serializes queries if the pool has a single connection (see sql.aio)
+        self._async_lock = None
+
+    @classmethod
+    def _create_session(cls, engine, connect_str):
+        # connecting requires an event loop, aexecute uses a connection from the
+        # pool for each query
+        return None
+
+    def _error_sync_query(self):
+        descriptor = self.alias or self.url
+        return exceptions.UsageError(
+            f"{self.url} uses an async driver, run queries with: "
+            f"await sql.aexecute(query, conn={descriptor!r})"
+        )
+
+    def execute(self, query, with_=None):
+        raise self._error_sync_query()
+
+    def interrupt(self):
+        return False
+
+    def close(self):
+        for rs in self._result_sets:
+            rs._sqlaproxy.close()
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self.async_engine.dispose())
+        else:
+            # called from a coroutine (e.g., IPython's autoawait), the engine is
+            # disposed once it gives control back to the event loop
+            self._dispose_task = loop.create_task(self.async_engine.dispose())
 
 
 def _check_if_duckdb_dbapi_connection(conn):
@@ -82,6 +82,21 @@ class Message:
         return self._message
 
 
+class UpdatableMessage:
+    """A message that's updated in place when shown again (e.g., progress)"""
+
+    def __init__(self) -> None:
+        self._handle = None
+
+    def show(self, message, style=None):
+        message = Message(message, style=style)
+
+        if self._handle is None:
+            self._handle = display(message, display_id=True)
+        else:
+            self._handle.update(message)
+
+
 def message(message):
     """Display a generic message"""
     display(Message(message))
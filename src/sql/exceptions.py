@@ -26,6 +26,7 @@ MissingPackageError = exception_factory("MissingPackageError")
 TypeError = exception_factory("TypeError")
 RuntimeError = exception_factory("RuntimeError")
 ValueError = exception_factory("ValueError")
+TimeoutError = exception_factory("TimeoutError")
 
 
 # The following are internal exceptions that should not be raised directly
@@ -0,0 +1,311 @@
+"""
+Export query results to CSV, Parquet and Arrow IPC files (``ResultSet.csv()``,
+``ResultSet.to_parquet()``, ``ResultSet.to_arrow_ipc()`` and ``%%sql --output``).
+Results are fetched and written in batches, so exporting a large result doesn't
+keep it in memory
+"""
+import csv
+import gzip
+import time
+from pathlib import Path
+
+from ploomber_core.dependencies import requires
+
+from sql import exceptions, display
+
+_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".ipc": "arrow",
+    ".feather": "arrow",
+}
+
+_COMPRESSIONS = {
+    ".gz": "gzip",
+    ".zst": "zstd",
+}
+
+# minimum number of seconds between progress updates
+_PROGRESS_INTERVAL = 1
+
+
+def compression_from_path(path):
+    """Returns the compression (gzip, zstd or None) based on the file extension"""
+    return _COMPRESSIONS.get(Path(path).suffix.lower())
+
+
+def format_from_path(path):
+    """
+    Returns the export format (csv, parquet or arrow) based on the file extension
+    (CSV files can be compressed, e.g., .csv.gz)
+    """
+    path = Path(path)
+    compression = compression_from_path(path)
+
+    if compression:
+        path = path.with_suffix("")
+
+    suffix = path.suffix.lower()
+
+    if suffix not in _FORMATS:
+        raise exceptions.ValueError(
+            f"Cannot export results to {str(path)!r}: unsupported extension. "
+            f"Supported extensions: {', '.join(_FORMATS)} "
+            f"(CSV files can be compressed: {', '.join(_COMPRESSIONS)})"
+        )
+
+    format = _FORMATS[suffix]
+
+    if compression and format != "csv":
+        raise exceptions.ValueError(
+            f"Cannot export results to {str(path)!r}: only CSV files can be "
+            "compressed"
+        )
+
+    return format
+
+
+class Progress:
+    """
+    Shows the number of rows written and the rows per second while exporting,
+    updated at most every ``interval`` seconds
+    """
+
+    def __init__(self, path, interval=_PROGRESS_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.n_rows = 0
+        self._started_at = time.monotonic()
+        self._updated_at = self._started_at
+        self._message = display.UpdatableMessage()
+
+    @property
+    def rate(self):
+        """Number of rows written per second"""
+        elapsed = time.monotonic() - self._started_at
+        return self.n_rows / elapsed if elapsed else 0.0
+
+    def add(self, n_rows):
+        self.n_rows += n_rows
+        now = time.monotonic()
+
+        if now - self._updated_at >= self.interval:
+            self._updated_at = now
+            self._message.show(
+                f"Writing {self.path}: {self.n_rows:,} rows "
+                f"({self.rate:,.0f} rows/s)"
+            )
+
+    def done(self, n_rows=None):
+        """Shows the total number of rows written"""
+        if n_rows is not None:
+            self.n_rows = n_rows
+
+        self._message.show(
+            f"Wrote {self.n_rows:,} rows to {self.path} ({self.rate:,.0f} rows/s)",
+            style="color: green",
+        )
+
+
+@requires(["zstandard"])
+def _open_zstd(path, encoding):
+    import zstandard
+
+    return zstandard.open(path, "wt", encoding=encoding, newline="")
+
+
+def open_text_file(path, compression=None, encoding="utf-8"):
+    """Opens a text file for writing, compressed with gzip or zstd (optional)"""
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding=encoding, newline="")
+
+    if compression == "zstd":
+        return _open_zstd(path, encoding)
+
+    if compression is not None:
+        raise exceptions.ValueError(
+            f"Unsupported compression: {compression!r}. "
+            f"Supported values: {', '.join(_COMPRESSIONS.values())}"
+        )
+
+    return open(path, "w", encoding=encoding, newline="")
+
+
+def write_csv(batches, header, file, progress=None, **format_params):
+    """
+    Writes batches of rows to a file object in CSV format (``format_params`` are
+    passed to ``csv.writer``), returns the number of rows written
+    """
+    writer = csv.writer(file, **format_params)
+    writer.writerow(header)
+    n_rows = 0
+
+    for rows in batches:
+        writer.writerows(rows)
+        n_rows += len(rows)
+
+        if progress is not None:
+            progress.add(len(rows))
+
+    return n_rows
+
+
+def _unify_schemas(schemas, names):
+    """
+    Types are inferred for each batch so a column with only NULLs in a batch has
+    type null, we take the first type that isn't null for each column
+    """
+    import pyarrow as pa
+
+    types = [pa.null()] * len(names)
+
+    for schema in schemas:
+        types = [
+            field.type if pa.types.is_null(type_) else type_
+            for type_, field in zip(types, schema)
+        ]
+
+    return pa.schema(list(zip(names, types)))
+
+
+def _write_batches(batches, names, open_writer, progress=None):
+    """
+    Writes record batches with the writer returned by ``open_writer(schema)``,
+    returns the number of rows written. Batches are buffered until the type of
+    every column is known (or until there are no more batches) since the schema
+    cannot change once the writer is open
+    """
+    import pyarrow as pa
+
+    pending = []
+    writer = None
+    schema = None
+    n_rows = 0
+
+    def write(batch):
+        nonlocal n_rows
+
+        table = pa.Table.from_batches([batch])
+
+        if table.schema != schema:
+            table = table.cast(schema)
+
+        writer.write_table(table)
+        n_rows += batch.num_rows
+
+        if progress is not None:
+            progress.add(batch.num_rows)
+
+    try:
+        for batch in batches:
+            if writer is not None:
+                write(batch)
+                continue
+
+            pending.append(batch)
+            schema = _unify_schemas([batch.schema for batch in pending], names)
+
+            if not any(pa.types.is_null(field.type) for field in schema):
+                writer = open_writer(schema)
+
+                for batch in pending:
+                    write(batch)
+
+                pending = []
+
+        if writer is None:
+            schema = _unify_schemas([batch.schema for batch in pending], names)
+            writer = open_writer(schema)
+
+            for batch in pending:
+                write(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return n_rows
+
+
+def _open_writer(path, format, schema, **kwargs):
+    if format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(str(path), schema, **kwargs)
+
+    import pyarrow as pa
+
+    return pa.ipc.new_file(str(path), schema, **kwargs)
+
+
+def write_file(batches, names, path, format, progress=None, **kwargs):
+    """
+    Writes record batches to a Parquet or Arrow IPC file (``kwargs`` are passed
+    to the writer), returns the number of rows written. ``names`` are the column
+    names, used if there are no batches
+    """
+    try:
+        return _write_batches(
+            batches,
+            names,
+            lambda schema: _open_writer(path, format, schema, **kwargs),
+            progress=progress,
+        )
+    # don't leave a partially written file
+    except BaseException:
+        Path(path).unlink(missing_ok=True)
+        raise
+
+
+def copy_statement(query, path, format="parquet", compression=None):
+    """
+    Returns a statement that writes the results of the query to a Parquet or CSV
+    file using DuckDB's native ``COPY ... TO``
+
+    Examples
+    --------
+    >>> from sql.export import copy_statement
+    >>> copy_statement("SELECT * FROM numbers;", "numbers.parquet")
+    "COPY (SELECT * FROM numbers) TO 'numbers.parquet' (FORMAT PARQUET)"
+    """
+    query = query.strip().rstrip(";")
+    path = str(path).replace("'", "''")
+
+    if format == "csv":
+        options = "FORMAT CSV, HEADER"
+
+        if compression:
+            options += f", COMPRESSION '{compression}'"
+    else:
+        options = "FORMAT PARQUET"
+
+    return f"COPY ({query}) TO '{path}' ({options})"
+
+
+def copy_to_stdout_statement(query):
+    """
+    Returns a statement that sends the results of the query to the client in CSV
+    format using PostgreSQL's native ``COPY ... TO STDOUT``
+    """
+    query = query.strip().rstrip(";")
+    return f"COPY ({query}) TO STDOUT WITH (FORMAT CSV, HEADER)"
+
+
+def is_psycopg2(dbapi_connection):
+    """Checks if the DBAPI connection was created by psycopg2"""
+    return type(dbapi_connection).__module__.split(".")[0] == "psycopg2"
+
+
+def copy_to_file_postgres(dbapi_connection, query, file):
+    """
+    Writes the results of the query to a file object in CSV format using
+    ``COPY ... TO STDOUT`` (requires psycopg2), returns the number of rows written
+    """
+    cursor = dbapi_connection.cursor()
+
+    try:
+        cursor.copy_expert(copy_to_stdout_statement(query), file)
+        return cursor.rowcount
+    finally:
+        cursor.close()
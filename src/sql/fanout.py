@@ -0,0 +1,194 @@
+"""
+Run the same query on multiple connections concurrently (``%%sql --on a,b``),
+combining their results with a column that identifies the connection each row
+came from
+"""
+import html
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sql import exceptions
+from sql.aio import _get_config
+from sql.background import _is_thread_bound
+from sql.cache import CachedResult
+from sql.connection import AsyncConnection, Connection
+from sql.run import run, select_df_type, _cached_result_set
+from sql.telemetry import telemetry
+
+# name of the column with the alias of the connection each row came from
+SOURCE_COLUMN = "source"
+
+
+class FanOutResult:
+    """Results of running a query on multiple connections (see run_on)
+
+    Attributes
+    ----------
+    result : sql.run.ResultSet
+        The combined results, with the connection's alias in the first column
+        (a data frame if autopandas or autopolars are enabled)
+
+    timings : dict
+        Number of seconds the query took on each connection
+
+    errors : dict
+        The exception raised by each connection that failed
+    """
+
+    def __init__(self, result, timings, errors):
+        self.result = result
+        self.timings = timings
+        self.errors = errors
+
+    def _summary(self):
+        summary = []
+
+        for alias, elapsed in self.timings.items():
+            if alias in self.errors:
+                summary.append(f"{alias} failed ({elapsed:.2f}s): {self.errors[alias]}")
+            else:
+                summary.append(f"{alias} ({elapsed:.2f}s)")
+
+        return summary
+
+    def __repr__(self):
+        summary = "\n".join(self._summary())
+        return f"{self.result!r}\n{summary}"
+
+    def _repr_html_(self):
+        result_html = getattr(self.result, "_repr_html_", lambda: None)()
+        summary = "<br>".join(html.escape(line) for line in self._summary())
+        return f"{result_html or ''}<p>{summary}</p>"
+
+
+def _get_connections(aliases):
+    if isinstance(aliases, str):
+        aliases = [alias.strip() for alias in aliases.split(",")]
+
+    # preserve the order but run the query once per connection
+    aliases = list(dict.fromkeys(alias for alias in aliases if alias))
+
+    if not aliases:
+        raise exceptions.UsageError("Pass at least one connection alias")
+
+    missing = [alias for alias in aliases if alias not in Connection.connections]
+
+    if missing:
+        raise exceptions.UsageError(
+            f"{', '.join(repr(alias) for alias in missing)}: connections not found, "
+            f"expected any of: "
+            f"{', '.join(repr(key) for key in Connection.connections)}"
+        )
+
+    return {alias: Connection.connections[alias] for alias in aliases}
+
+
+def _run_one(conn, sql, config, timeout):
+    """
+    Runs the query on a connection, returns the keys, the rows, the exception (if
+    it failed) and the number of seconds it took
+    """
+    started_at = time.monotonic()
+
+    try:
+        if isinstance(conn, AsyncConnection):
+            raise conn._error_sync_query()
+
+        # queries on the same connection run one at a time (see sql.background)
+        with conn._lock:
+            result = run(conn, sql, config, stream=True, timeout=timeout)
+
+            try:
+                keys, rows = list(result.keys), list(result)
+            finally:
+                result.close()
+    except Exception as e:
+        return None, None, e, time.monotonic() - started_at
+
+    return keys, rows, None, time.monotonic() - started_at
+
+
+@telemetry.log_call("run-on")
+def run_on(aliases, sql, config=None, timeout=None):
+    """Runs a SQL query on multiple connections concurrently (each one from its
+    own thread), returns a FanOutResult with the combined results, the time the
+    query took on each connection and the errors
+
+    Parameters
+    ----------
+    aliases : list or str
+        The aliases of the connections (a list or a comma-separated string)
+
+    sql : str
+        SQL query to execute
+
+    config
+        Configuration object, defaults to the SqlMagic instance in the current
+        IPython session
+
+    timeout : float, default None
+        Maximum number of seconds the query can run for on each connection,
+        defaults to ``config.statement_timeout``
+
+    Notes
+    -----
+    Connections that can only be used from the thread that created them (e.g.,
+    in-memory SQLite) run the query in the calling thread. If the columns returned
+    by a connection don't match the ones returned by the first connection, it's
+    reported as an error
+    """
+    connections = _get_connections(aliases)
+    config = config or _get_config()
+
+    threaded = [
+        alias for alias, conn in connections.items() if not _is_thread_bound(conn)
+    ]
+    outcomes = {}
+
+    with ThreadPoolExecutor(
+        max_workers=max(len(threaded), 1), thread_name_prefix="jupysql-on"
+    ) as executor:
+        futures = {
+            alias: executor.submit(_run_one, connections[alias], sql, config, timeout)
+            for alias in threaded
+        }
+
+        for alias, conn in connections.items():
+            if alias not in futures:
+                outcomes[alias] = _run_one(conn, sql, config, timeout)
+
+        for alias, future in futures.items():
+            outcomes[alias] = future.result()
+
+    keys, rows, timings, errors = None, [], {}, {}
+
+    for alias in connections:
+        keys_, rows_, error, timings[alias] = outcomes[alias]
+
+        if error is None and keys is not None and list(keys_) != list(keys):
+            error = exceptions.ValueError(
+                f"The columns ({', '.join(keys_)}) don't match the columns "
+                f"returned by the other connections ({', '.join(keys)})"
+            )
+
+        if error is not None:
+            errors[alias] = error
+            continue
+
+        if keys is None:
+            keys = keys_
+
+        rows.extend((alias, *row) for row in rows_)
+
+    if len(errors) == len(connections):
+        messages = "\n".join(f"{alias}: {error}" for alias, error in errors.items())
+        raise exceptions.RuntimeError(
+            f"The query failed on all connections:\n{messages}"
+        )
+
+    conn = next(conn for alias, conn in connections.items() if alias not in errors)
+    combined = _cached_result_set(
+        CachedResult([SOURCE_COLUMN, *keys], rows), sql, conn, config
+    )
+
+    return FanOutResult(select_df_type(combined, config), timings, errors)
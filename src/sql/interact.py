@@ -0,0 +1,243 @@
+"""
+Re-run ``%%sql --interact`` queries when the widgets change. Changes are debounced
+(dragging a slider runs the query once it stops moving), queries superseded by a
+newer value are interrupted, and the outputs are cached by the widgets' values
+"""
+import asyncio
+import contextvars
+import threading
+import traceback
+from collections import OrderedDict
+from functools import partial
+
+from IPython import get_ipython
+from IPython.display import display
+
+from sql.background import _get_executor, _is_thread_bound
+from sql.connection import Connection
+
+# number of seconds the widgets must stay unchanged before running the query
+DEBOUNCE_SECONDS = 0.3
+
+# number of outputs cached per widget (least recently used are evicted)
+CACHE_SIZE = 32
+
+
+def _cache_key(values):
+    key = tuple(values.items())
+
+    try:
+        hash(key)
+    except TypeError:
+        return None
+
+    return key
+
+
+def _to_output(result):
+    """Formats the result as an output of an ipywidgets Output widget"""
+    if result is None:
+        return None
+
+    shell = get_ipython()
+
+    if shell is None:
+        data, metadata = {"text/plain": repr(result)}, {}
+    else:
+        data, metadata = shell.display_formatter.format(result)
+
+    return {"output_type": "display_data", "data": data, "metadata": metadata}
+
+
+def _to_error_output(error):
+    text = "".join(traceback.format_exception_only(type(error), error))
+    return {"output_type": "stream", "name": "stderr", "text": text}
+
+
+class InteractiveQuery:
+    """
+    Runs a query with the values of the widgets (``update`` is the function passed
+    to ``ipywidgets.interactive``) and shows the results in ``output`` (an
+    ipywidgets Output)
+
+    Parameters
+    ----------
+    execute : callable
+        Runs the query with the widgets' values (passed as keyword arguments) and
+        returns the result
+
+    conn : sql.connection.Connection, default None
+        The connection the query runs on (it's locked while the query runs and
+        interrupted when the values change), defaults to the current connection
+
+    debounce : float, default None
+        Number of seconds to wait for the widgets to stop changing before running
+        the query, defaults to ``DEBOUNCE_SECONDS``
+
+    cache_size : int, default None
+        Number of outputs to cache, defaults to ``CACHE_SIZE``. 0 disables the
+        cache
+
+    Notes
+    -----
+    Queries run in a background thread, so the widgets stay responsive and a
+    query can be interrupted when the values change. Connections that can only
+    be used from the thread that created them (e.g., in-memory SQLite) run the
+    query in the kernel's thread. Without a running event loop (e.g., outside
+    Jupyter), queries run right away. Cached outputs aren't updated if the data
+    changes: run the cell again to clear the cache
+    """
+
+    def __init__(self, execute, conn=None, debounce=None, cache_size=None):
+        from ipywidgets import Output
+
+        self.conn = conn
+        self.debounce = DEBOUNCE_SECONDS if debounce is None else debounce
+        self.cache_size = CACHE_SIZE if cache_size is None else cache_size
+        self.output = Output()
+
+        self._execute = execute
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        # incremented every time the values change, results of older generations
+        # are dropped
+        self._generation = 0
+        self._scheduled = None
+        self._running = None
+
+        # generation of the query executing in the background (it holds the
+        # connection's lock)
+        self._active = None
+
+    def update(self, **values):
+        """Shows the output for the values (runs the query if it's not cached)"""
+        key = _cache_key(values)
+
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            output = self._cache.get(key) if key is not None else None
+
+            if output is not None:
+                self._cache.move_to_end(key)
+
+        if self._scheduled is not None:
+            self._scheduled.cancel()
+            self._scheduled = None
+
+        self._interrupt()
+
+        if output is not None:
+            self._show(output)
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is None or not self.debounce:
+            self._start(generation, key, values, loop)
+        else:
+            self._scheduled = loop.call_later(
+                self.debounce, self._start, generation, key, values, loop
+            )
+
+    def _interrupt(self):
+        """Cancels or interrupts the query running in the background"""
+        if self._running is None:
+            return
+
+        conn, future = self._running
+        self._running = None
+
+        if not future.cancel() and self._active is not None:
+            conn.interrupt()
+
+    def _start(self, generation, key, values, loop):
+        if generation != self._generation:
+            return
+
+        conn = self.conn if self.conn is not None else Connection.current
+
+        if loop is None or conn is None or _is_thread_bound(conn):
+            try:
+                output = _to_output(self._execute(**values))
+            except Exception as e:
+                self._finish(generation, key, _to_error_output(e), cache=False)
+            else:
+                self._finish(generation, key, output)
+
+            return
+
+        # run with the context of the widget's message, so it's the parent of the
+        # messages the query displays (instead of the cell running in the kernel)
+        future = _get_executor().submit(
+            contextvars.copy_context().run, self._run, conn, generation, values
+        )
+        self._running = (conn, future)
+        future.add_done_callback(partial(self._on_done, generation, key))
+
+    def _run(self, conn, generation, values):
+        with conn._lock:
+            self._active = generation
+
+            try:
+                # format the results while holding the lock, since it fetches the
+                # rows to show
+                return _to_output(self._execute(**values))
+            finally:
+                self._active = None
+
+    def _on_done(self, generation, key, future):
+        if future.cancelled():
+            return
+
+        error = future.exception()
+
+        if error is not None:
+            self._finish(generation, key, _to_error_output(error), cache=False)
+        else:
+            self._finish(generation, key, future.result())
+
+    def _finish(self, generation, key, output, cache=True):
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            if cache and key is not None and self.cache_size:
+                self._cache[key] = output
+
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        self._show(output)
+
+    def _show(self, output):
+        self.output.outputs = () if output is None else (output,)
+
+
+def interact(execute, widgets, conn=None):
+    """Shows the widgets and re-runs the query when they change, returns the
+    InteractiveQuery
+
+    Parameters
+    ----------
+    execute : callable
+        Runs the query with the widgets' values (passed as keyword arguments) and
+        returns the result
+
+    widgets : dict
+        Widgets (or values to create them from) passed to
+        ``ipywidgets.interactive``
+
+    conn : sql.connection.Connection, default None
+        The connection the query runs on, defaults to the current connection
+    """
+    from ipywidgets import VBox, interactive
+
+    query = InteractiveQuery(execute, conn=conn)
+    controls = interactive(query.update, **widgets)
+    display(VBox([controls, query.output]))
+    return query
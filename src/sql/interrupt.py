@@ -0,0 +1,130 @@
+"""
+Interrupt running statements with the driver's native mechanism (e.g., DuckDB and
+SQLite's ``interrupt()``, psycopg's ``cancel()``), used to enforce timeouts
+(``%%sql --timeout``, ``SqlMagic.statement_timeout``) and to stop a statement when
+the user presses Ctrl-C
+"""
+import signal
+import sqlite3
+import threading
+import time
+
+from sql import exceptions
+
+# number of SQLite virtual machine instructions between calls to the progress
+# handler (it checks the timeout and lets Python run the Ctrl-C handler)
+_SQLITE_PROGRESS_STEPS = 10_000
+
+
+class Interruptible:
+    """
+    Context manager to execute a statement that's interrupted if it runs for more
+    than ``timeout`` seconds (raising a TimeoutError) or if the user presses
+    Ctrl-C (raising KeyboardInterrupt)
+
+    SQLite connections check the timeout in a progress handler, other drivers are
+    interrupted from a timer thread. Ctrl-C is only handled when running in the
+    main thread
+
+    Parameters
+    ----------
+    conn : sql.connection.Connection
+        The connection executing the statement
+
+    timeout : float, default None
+        Maximum number of seconds the statement can run for. None or 0 means no
+        limit
+
+    deadline : float, default None
+        ``time.monotonic()`` value to interrupt the statement at, to continue the
+        deadline of a previous statement (e.g., fetching the rows of a query that
+        already ran). Defaults to ``timeout`` seconds from now
+    """
+
+    def __init__(self, conn, timeout=None, deadline=None):
+        self.conn = conn
+        self.timeout = timeout or None
+        self.timed_out = False
+        self.keyboard_interrupt = False
+        self._finished = False
+        # prevents interrupting the connection once the statement finished
+        self._lock = threading.Lock()
+        self._timer = None
+        self._previous_sigint_handler = None
+        self._sqlite_connection = None
+        self._deadline = deadline if self.timeout else None
+
+    def __enter__(self):
+        dbapi_connection = self.conn._get_dbapi_connection()
+        can_interrupt = self.conn._get_interrupt() is not None
+
+        if self.timeout and self._deadline is None:
+            self._deadline = time.monotonic() + self.timeout
+
+        if isinstance(dbapi_connection, sqlite3.Connection):
+            self._sqlite_connection = dbapi_connection
+            dbapi_connection.set_progress_handler(
+                self._progress_handler, _SQLITE_PROGRESS_STEPS
+            )
+        elif self.timeout and can_interrupt:
+            self._timer = threading.Timer(
+                max(self._deadline - time.monotonic(), 0), self._on_timeout
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+        # signal handlers can only be set from the main thread
+        if can_interrupt and threading.current_thread() is threading.main_thread():
+            self._previous_sigint_handler = signal.signal(
+                signal.SIGINT, self._on_sigint
+            )
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._lock:
+            self._finished = True
+
+        if self._timer is not None:
+            self._timer.cancel()
+
+        if self._previous_sigint_handler is not None:
+            signal.signal(signal.SIGINT, self._previous_sigint_handler)
+
+        if self._sqlite_connection is not None:
+            self._sqlite_connection.set_progress_handler(None, _SQLITE_PROGRESS_STEPS)
+
+        if self.keyboard_interrupt:
+            raise KeyboardInterrupt from exc_value
+
+        # the statement might've finished right before being interrupted
+        if self.timed_out and exc_value is not None:
+            raise exceptions.TimeoutError(
+                f"The query was cancelled since it ran for more than "
+                f"{self.timeout} seconds"
+            ) from exc_value
+
+        return False
+
+    def _progress_handler(self):
+        # a non-zero value tells SQLite to interrupt the statement
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            self.timed_out = True
+            return 1
+
+        return int(self.keyboard_interrupt)
+
+    def _interrupt(self):
+        with self._lock:
+            if not self._finished:
+                self.conn.interrupt()
+
+    def _on_timeout(self):
+        self.timed_out = True
+        self._interrupt()
+
+    def _on_sigint(self, signum, frame):
+        # raising KeyboardInterrupt here would leave the statement running in the
+        # driver, so we interrupt it and raise once the driver returns
+        self.keyboard_interrupt = True
+        self._interrupt()
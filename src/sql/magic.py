@@ -1,10 +1,7 @@
 import json
 import re
+from collections import ChainMap
 
-try:
-    from ipywidgets import interact
-except ModuleNotFoundError:
-    interact = None
 from ploomber_core.exceptions import modify_exceptions
 from IPython.core.magic import (
     Magics,
@@ -17,7 +14,7 @@ from IPython.core.magic import (
 from IPython.core.magic_arguments import argument, magic_arguments, parse_argstring
 from sqlalchemy.exc import OperationalError, ProgrammingError, DatabaseError
 from traitlets.config.configurable import Configurable
-from traitlets import Bool, Int, TraitError, Unicode, Dict, observe, validate
+from traitlets import Bool, Int, Float, TraitError, Unicode, Dict, observe, validate
 
 import warnings
 import shlex
@@ -25,9 +22,15 @@ from difflib import get_close_matches
 import sql.connection
 import sql.parse
 import sql.run
+import sql.background
+import sql.fanout
+import sql.interact
+import sql.params
+import sql.persist
 from sql.parse import _option_strings_from_parser
 from sql import display, exceptions
 from sql.store import store
+from sql.cache import query_cache, connection_key
 from sql.command import SQLCommand
 from sql.magic_plot import SqlPlotMagic
 from sql.magic_cmd import SqlCmdMagic
@@ -40,16 +43,8 @@ from sql.error_message import detail
 
 from ploomber_core.dependencies import check_installed
 
-
-try:
-    from pandas.core.frame import DataFrame, Series
-except ModuleNotFoundError:
-    DataFrame = None
-    Series = None
-
 from sql.telemetry import telemetry
 
-
 SUPPORT_INTERACTIVE_WIDGETS = ["Checkbox", "Text", "IntSlider", ""]
 
 
@@ -130,6 +125,14 @@ class SqlMagic(Magics, Configurable):
         config=True,
         help="Return Polars DataFrames instead of regular result sets",
     )
+    autoarrow = Bool(
+        False,
+        config=True,
+        help=(
+            "Convert results to pandas/polars data frames via Arrow record batches "
+            "(requires pyarrow)"
+        ),
+    )
     polars_dataframe_kwargs = Dict(
         {},
         config=True,
@@ -138,6 +141,97 @@ class SqlMagic(Magics, Configurable):
             "(e.g. infer_schema_length, nan_to_null, schema_overrides, etc)"
         ),
     )
+    result_memory_limit = Int(
+        0,
+        config=True,
+        allow_none=True,
+        help=(
+            "Maximum memory (in bytes) used to store the rows of a result set, rows "
+            "over the limit are spilled to a temporary file (requires pyarrow). "
+            "0 or None means no limit"
+        ),
+    )
+    result_sets_limit = Int(
+        0,
+        config=True,
+        allow_none=True,
+        help=(
+            "Maximum number of result sets kept per connection, the least recently "
+            "used ones are closed (their cursor is closed and their rows are "
+            "dropped). 0 or None means no limit"
+        ),
+    )
+    result_sets_memory_limit = Int(
+        0,
+        config=True,
+        allow_none=True,
+        help=(
+            "Maximum memory (in bytes) used by the result sets of a connection, the "
+            "least recently used ones are closed once exceeded. "
+            "0 or None means no limit"
+        ),
+    )
+    stream_results = Bool(
+        None,
+        config=True,
+        allow_none=True,
+        help=(
+            "Execute SELECT statements with server-side cursors, so rows are fetched "
+            "in batches of yield_per rows instead of loading the whole result on the "
+            "client. None enables them if the driver supports them (MySQL "
+            "connections only use them for results that are streamed with --stream)"
+        ),
+    )
+    yield_per = Int(
+        1000,
+        config=True,
+        help="Number of rows to fetch at a time when using server-side cursors",
+    )
+    cache_ttl = Int(
+        3600,
+        config=True,
+        allow_none=True,
+        help=(
+            "Number of seconds the results of queries executed with --cache are "
+            "cached for. 0 or None means they don't expire"
+        ),
+    )
+    cache_max_bytes = Int(
+        100 * 1024**2,
+        config=True,
+        allow_none=True,
+        help=(
+            "Maximum memory (in bytes) used by the results of queries executed with "
+            "--cache, the least recently used ones are evicted once exceeded. "
+            "0 or None means no limit"
+        ),
+    )
+    statement_timeout = Float(
+        None,
+        config=True,
+        allow_none=True,
+        help=(
+            "Maximum number of seconds a statement can run for, statements that "
+            "exceed it are interrupted. 0 or None means no limit"
+        ),
+    )
+    persist_chunksize = Int(
+        100_000,
+        config=True,
+        allow_none=True,
+        help=(
+            "Number of rows inserted at a time by --persist and --append "
+            "(all in a single transaction). None inserts all rows at once"
+        ),
+    )
+    persist_method = Unicode(
+        "auto",
+        config=True,
+        help=(
+            "How --persist and --append insert rows: auto (fastest method the "
+            "database supports), multi (multiple rows per INSERT) or insert"
+        ),
+    )
     column_local_vars = Bool(
         False, config=True, help="Return data into local variables from column names"
     )
@@ -151,6 +245,15 @@ class SqlMagic(Magics, Configurable):
         "matching section in the DSN file.",
     )
     autocommit = Bool(True, config=True, help="Set autocommit mode")
+    pool_options = Dict(
+        default_value={},
+        config=True,
+        help=(
+            "Connection pool options passed to sqlalchemy.create_engine when "
+            "opening new connections (pool_size, max_overflow, pool_timeout, "
+            "pool_recycle and pool_pre_ping), --connection_arguments override them"
+        ),
+    )
 
     @telemetry.log_call("init")
     def __init__(self, shell):
@@ -182,6 +285,52 @@ class SqlMagic(Magics, Configurable):
         except ValueError:
             raise TraitError("{}: displaylimit is not an integer".format(value))
 
+    @validate("yield_per")
+    def _valid_yield_per(self, proposal):
+        if proposal["value"] < 1:
+            raise TraitError(
+                "{}: yield_per must be a positive integer".format(proposal["value"])
+            )
+        return proposal["value"]
+
+    @validate("statement_timeout")
+    def _valid_statement_timeout(self, proposal):
+        if proposal["value"] is not None and proposal["value"] < 0:
+            raise TraitError(
+                "{}: statement_timeout cannot be negative".format(proposal["value"])
+            )
+        return proposal["value"]
+
+    @validate("pool_options")
+    def _valid_pool_options(self, proposal):
+        invalid = set(proposal["value"]) - set(sql.connection.POOL_OPTIONS)
+
+        if invalid:
+            raise TraitError(
+                "{}: invalid pool options, expected: {}".format(
+                    ", ".join(sorted(invalid)), ", ".join(sql.connection.POOL_OPTIONS)
+                )
+            )
+        return proposal["value"]
+
+    @validate("persist_chunksize")
+    def _valid_persist_chunksize(self, proposal):
+        if proposal["value"] is not None and proposal["value"] < 1:
+            raise TraitError(
+                "{}: persist_chunksize must be positive".format(proposal["value"])
+            )
+        return proposal["value"]
+
+    @validate("persist_method")
+    def _valid_persist_method(self, proposal):
+        if proposal["value"] not in sql.persist.METHODS:
+            raise TraitError(
+                "{}: persist_method must be one of: {}".format(
+                    proposal["value"], ", ".join(sql.persist.METHODS)
+                )
+            )
+        return proposal["value"]
+
     @observe("autopandas", "autopolars")
     def _mutex_autopandas_autopolars(self, change):
         # When enabling autopandas or autopolars, automatically disable the
@@ -292,6 +441,15 @@ class SqlMagic(Magics, Configurable):
             "named DataFrame"
         ),
     )
+    @argument(
+        "--parallel",
+        type=int,
+        metavar="N",
+        help=(
+            "insert the DataFrame in chunks from N connections (used with "
+            "--persist, --persist-replace and --append)"
+        ),
+    )
     @argument(
         "-a",
         "--connection_arguments",
@@ -326,6 +484,63 @@ class SqlMagic(Magics, Configurable):
         action="append",
         help="Interactive mode",
     )
+    @argument(
+        "--stream",
+        action="store_true",
+        help=(
+            "Return a result set that fetches rows in batches when iterating "
+            "over it, without keeping them in memory"
+        ),
+    )
+    @argument(
+        "--cache",
+        action="store_true",
+        help=(
+            "Return the cached results of the query (if any), otherwise, execute "
+            "it and cache the results"
+        ),
+    )
+    @argument(
+        "--background",
+        action="store_true",
+        help=(
+            "Run the query in a background thread and return a handle to get its "
+            "status and results"
+        ),
+    )
+    @argument(
+        "--output",
+        type=str,
+        help=(
+            "Write the results to a CSV (.csv, .csv.gz, .csv.zst), Parquet (.parquet) "
+            "or Arrow IPC (.arrow) file instead of returning them"
+        ),
+    )
+    @argument(
+        "--timeout",
+        type=float,
+        help=(
+            "Interrupt the query if it runs for more than this number of seconds "
+            "(overrides SqlMagic.statement_timeout)"
+        ),
+    )
+    @argument(
+        "--on",
+        type=str,
+        metavar="ALIASES",
+        help=(
+            "Run the query concurrently on the connections with these aliases "
+            "(comma-separated) and combine the results"
+        ),
+    )
+    @argument(
+        "--params",
+        action="store_true",
+        help=(
+            "Bind :name placeholders to the variables with the same name (passed "
+            "to the database as parameters instead of being rendered in the query)"
+        ),
+    )
     def execute(self, line="", cell="", local_ns=None):
         """
         Runs SQL statement against a database, specified by
@@ -359,11 +574,15 @@ class SqlMagic(Magics, Configurable):
 
     @telemetry.log_call("execute", payload=True)
     @modify_exceptions
-    def _execute(self, payload, line, cell, local_ns, is_interactive_mode=False):
+    def _execute(
+        self, line, cell, local_ns, is_interactive_mode=False, *, payload=None
+    ):
         def interactive_execute_wrapper(**kwargs):
-            for key, value in kwargs.items():
-                local_ns[key] = value
-            return self._execute(line, cell, local_ns, is_interactive_mode=True)
+            # the values are passed in their own namespace since the query might
+            # run in a background thread while the widgets keep changing
+            return self._execute(
+                line, cell, ChainMap(kwargs, local_ns), is_interactive_mode=True
+            )
 
         """
         This function implements the cell logic; we create this private
@@ -386,9 +605,9 @@ class SqlMagic(Magics, Configurable):
         if local_ns is None:
             local_ns = {}
 
-        # save globals and locals so they can be referenced in bind vars
-        user_ns = self.shell.user_ns.copy()
-        user_ns.update(local_ns)
+        # save globals and locals so they can be referenced in bind vars (a view
+        # instead of a copy since the namespace might have many objects)
+        user_ns = ChainMap(local_ns, self.shell.user_ns)
 
         command = SQLCommand(self, user_ns, line, cell)
         # args.line: contains the line after the magic with all options removed
@@ -407,18 +626,6 @@ class SqlMagic(Magics, Configurable):
             else:
                 with_ = None
 
-        # Create the interactive slider
-        if args.interact and not is_interactive_mode:
-            check_installed(["ipywidgets"], "--interactive argument")
-            interactive_dict = {}
-            for key in args.interact:
-                interactive_dict[key] = local_ns[key]
-            display.message(
-                "Interactive mode, please interact with below "
-                "widget(s) to control the variable"
-            )
-            interact(interactive_execute_wrapper, **interactive_dict)
-            return
         if args.connections:
             return sql.connection.Connection.connections_table()
         elif args.close:
@@ -458,8 +665,36 @@ class SqlMagic(Magics, Configurable):
             connect_args=args.connection_arguments,
             creator=args.creator,
             alias=args.alias,
+            pool_options=self.pool_options,
         )
-        payload["connection_info"] = conn._get_curr_sqlalchemy_connection_info()
+        if payload is not None:
+            payload["connection_info"] = conn._get_curr_sqlalchemy_connection_info()
+
+        # Create the interactive slider (after resolving the connection, since the
+        # query runs on it)
+        if args.interact and not is_interactive_mode:
+            check_installed(["ipywidgets"], "--interactive argument")
+
+            interactive_dict = {}
+            for key in args.interact:
+                interactive_dict[key] = local_ns[key]
+            display.message(
+                "Interactive mode, please interact with below "
+                "widget(s) to control the variable"
+            )
+            sql.interact.interact(
+                interactive_execute_wrapper, interactive_dict, conn=conn
+            )
+            return
+
+        # async drivers can only run queries from a coroutine (see sql.aio)
+        if (
+            command.sql
+            and not args.no_execute
+            and not args.on
+            and isinstance(conn, sql.connection.AsyncConnection)
+        ):
+            raise conn._error_sync_query()
 
         if args.persist_replace and args.append:
             raise exceptions.UsageError(
@@ -475,10 +710,16 @@ class SqlMagic(Magics, Configurable):
                 append=False,
                 index=not args.no_index,
                 replace=True,
+                parallel=args.parallel,
             )
         elif args.persist:
             return self._persist_dataframe(
-                command.sql, conn, user_ns, append=False, index=not args.no_index
+                command.sql,
+                conn,
+                user_ns,
+                append=False,
+                index=not args.no_index,
+                parallel=args.parallel,
             )
         elif args.persist_replace:
             return self._persist_dataframe(
@@ -488,10 +729,16 @@ class SqlMagic(Magics, Configurable):
                 append=False,
                 index=not args.no_index,
                 replace=True,
+                parallel=args.parallel,
             )
         if args.append:
             return self._persist_dataframe(
-                command.sql, conn, user_ns, append=True, index=not args.no_index
+                command.sql,
+                conn,
+                user_ns,
+                append=True,
+                index=not args.no_index,
+                parallel=args.parallel,
             )
 
         if not command.sql:
@@ -513,8 +760,76 @@ class SqlMagic(Magics, Configurable):
             display.message("Skipping execution...")
             return
 
+        if args.stream and args.cache:
+            raise exceptions.UsageError(
+                "--stream and --cache cannot be used together since streamed "
+                "results are not stored"
+            )
+
+        if args.output and (args.background or args.stream or args.cache):
+            raise exceptions.UsageError(
+                "--output cannot be used with --background, --stream or --cache"
+            )
+
+        if args.params and (args.on or args.background or args.cache or args.output):
+            raise exceptions.UsageError(
+                "--params cannot be used with --on, --background, --cache or --output"
+            )
+
+        if args.on:
+            if args.background or args.stream or args.cache or args.output:
+                raise exceptions.UsageError(
+                    "--on cannot be used with --background, --stream, --cache or "
+                    "--output"
+                )
+
+            result = sql.fanout.run_on(args.on, command.sql, self, timeout=args.timeout)
+
+            if command.result_var:
+                self.shell.user_ns.update({command.result_var: result})
+                return result if command.return_result_var else None
+
+            return result
+
+        if args.background:
+            if args.stream:
+                raise exceptions.UsageError(
+                    "--background and --stream cannot be used together since "
+                    "results of background queries are fetched in the background"
+                )
+
+            result = sql.background.run_in_background(
+                conn, command.sql, self, timeout=args.timeout
+            )
+
+            if command.result_var:
+                self.shell.user_ns.update({command.result_var: result})
+                return result if command.return_result_var else None
+
+            return result
+
         try:
-            result = sql.run.run(conn, command.sql, self)
+            # wait for the queries running in the background on this connection
+            with conn._lock:
+                if args.output:
+                    sql.run.run_to_file(
+                        conn, command.sql, self, args.output, timeout=args.timeout
+                    )
+                    return None
+
+                result = sql.run.run(
+                    conn,
+                    command.sql,
+                    self,
+                    stream=args.stream,
+                    cache=args.cache,
+                    timeout=args.timeout,
+                    parameters=(
+                        sql.params.get_parameters(command.sql, user_ns)
+                        if args.params
+                        else None
+                    ),
+                )
 
             if (
                 result is not None
@@ -563,14 +878,9 @@ class SqlMagic(Magics, Configurable):
 
     @modify_exceptions
     def _persist_dataframe(
-        self, raw, conn, user_ns, append=False, index=True, replace=False
+        self, raw, conn, user_ns, append=False, index=True, replace=False, parallel=None
     ):
         """Implements PERSIST, which writes a DataFrame to the RDBMS"""
-        if not DataFrame:
-            raise exceptions.MissingPackageError(
-                "You must install pandas to persist results: pip install pandas"
-            )
-
         frame_name = raw.strip(";")
 
         # invalid identifier
@@ -594,10 +904,20 @@ class SqlMagic(Magics, Configurable):
 
         frame = user_ns[frame_name]
 
-        if not isinstance(frame, DataFrame) and not isinstance(frame, Series):
-            raise exceptions.TypeError(
-                f"{frame_name!r} is not a Pandas DataFrame or Series"
-            )
+        # polars and pyarrow objects are written without converting them to pandas
+        if not sql.persist.is_arrow_compatible(frame):
+            try:
+                from pandas import DataFrame, Series
+            except ModuleNotFoundError:
+                raise exceptions.MissingPackageError(
+                    "You must install pandas to persist results: pip install pandas"
+                )
+
+            if not isinstance(frame, DataFrame) and not isinstance(frame, Series):
+                raise exceptions.TypeError(
+                    f"{frame_name!r} is not a Pandas DataFrame or Series, a polars "
+                    "DataFrame or LazyFrame, or a pyarrow Table or RecordBatchReader"
+                )
 
         # Make a suitable name for the resulting database table
         table_name = frame_name.lower()
@@ -610,14 +930,41 @@ class SqlMagic(Magics, Configurable):
         else:
             if_exists = "fail"
 
+        if parallel is not None and parallel < 1:
+            raise exceptions.UsageError(
+                f"--parallel must be a positive integer, got: {parallel}"
+            )
+
+        kwargs = dict(
+            if_exists=if_exists,
+            index=index,
+            chunksize=self.persist_chunksize,
+            method=self.persist_method,
+        )
+
+        # otherwise, the rows would be inserted in the transaction of a result set
+        # that's still fetching its rows (see sql.run._begin_transaction)
+        sql.run.finish_transaction(conn)
+
         try:
-            frame.to_sql(table_name, conn.session, if_exists=if_exists, index=index)
-        except ValueError:
+            if parallel is None:
+                sql.persist.persist_frame(conn, frame, table_name, **kwargs)
+            else:
+                sql.persist.persist_frame_parallel(
+                    conn, frame, table_name, n_jobs=parallel, **kwargs
+                )
+        except ValueError as e:
+            # other errors subclass ValueError too (e.g., pyarrow's ArrowInvalid), so
+            # we check the message that pandas (and sql.persist) use
+            if str(e) != f"Table '{table_name}' already exists.":
+                raise
+
             raise exceptions.ValueError(
                 f"""Table {table_name!r} already exists. Consider using \
 --persist-replace to drop the table before persisting the data frame"""
             )
 
+        query_cache.invalidate(connection_key(conn))
         display.message_success(f"Success! Persisted {table_name} to the database.")
 
 
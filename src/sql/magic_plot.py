@@ -12,7 +12,6 @@ except ModuleNotFoundError:
     from IPython.config.configurable import Configurable
 
 
-from sql import plot
 from sql.command import SQLPlotCommand
 from sql import exceptions
 from sql import util
@@ -94,6 +93,8 @@ class SqlPlotMagic(Magics, Configurable):
         else:
             with_ = self._check_table_exists(table)
 
+        from sql import plot
+
         if cmd.args.line[0] in {"box", "boxplot"}:
             return plot.boxplot(
                 table=table,
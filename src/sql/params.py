@@ -0,0 +1,117 @@
+"""
+Bind parameters (``%%sql --params``): ``:name`` placeholders are bound to the
+variables with the same name, so queries that only differ in their values run the
+same SQL and reuse the statements prepared by SQLAlchemy and the database driver
+"""
+import sys
+from collections import OrderedDict
+from functools import lru_cache
+
+import sqlalchemy
+from sqlalchemy.engine.default import DefaultDialect
+
+from sql import exceptions
+from sql.connection import Connection
+
+# number of statements in each connection's cache of prepared statements
+STATEMENT_CACHE_SIZE = 128
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _bind_names(sql):
+    return tuple(sqlalchemy.sql.text(sql).compile().params)
+
+
+def get_parameters(sql, namespace):
+    """Returns the values of the ``:name`` placeholders in the query, taken from
+    the namespace
+
+    Examples
+    --------
+    >>> from sql.params import get_parameters
+    >>> get_parameters("SELECT * FROM numbers WHERE x > :low", {"low": 1, "high": 2})
+    {'low': 1}
+    """
+    names = _bind_names(sql)
+    missing = [name for name in names if name not in namespace]
+
+    if missing:
+        raise exceptions.UsageError(
+            f"Cannot bind {', '.join(repr(name) for name in missing)} since "
+            f"{'they are' if len(missing) > 1 else 'it is'} not defined. Define the "
+            "variables or remove --params"
+        )
+
+    return {name: namespace[name] for name in names}
+
+
+def _paramstyle(connection):
+    """Returns the paramstyle of the DBAPI module the connection belongs to"""
+    module = sys.modules.get(type(connection).__module__.split(".")[0])
+    return getattr(module, "paramstyle", "named")
+
+
+class PreparedStatement:
+    """A statement with ``:name`` placeholders, ready to be executed on a connection
+
+    Parameters
+    ----------
+    statement : str
+        The SQL statement
+
+    paramstyle : str, default None
+        The DBAPI paramstyle to compile the placeholders to (e.g., ``qmark``), if
+        None, the statement is executed with SQLAlchemy, which compiles them
+    """
+
+    def __init__(self, statement, paramstyle=None):
+        clause = sqlalchemy.sql.text(statement)
+        self._compiled = None
+
+        if paramstyle is None:
+            self.statement = clause
+        else:
+            self._compiled = clause.compile(
+                dialect=DefaultDialect(paramstyle=paramstyle)
+            )
+            self.statement = str(self._compiled)
+
+        self.names = _bind_names(statement)
+
+    def bind(self, parameters):
+        """Returns the parameters to pass to ``execute`` along with the statement"""
+        values = {name: parameters[name] for name in self.names}
+
+        if self._compiled is None:
+            return values
+
+        values = self._compiled.construct_params(values)
+
+        if self._compiled.positional:
+            return tuple(values[name] for name in self._compiled.positiontup)
+
+        return values
+
+
+def prepare(conn, statement):
+    """Returns a PreparedStatement, statements are cached per connection (LRU) so
+    running the same query with different values doesn't compile it again
+    """
+    cache = conn.__dict__.setdefault("_prepared_statements", OrderedDict())
+    prepared = cache.get(statement)
+
+    if prepared is not None:
+        cache.move_to_end(statement)
+        return prepared
+
+    if Connection.is_dbapi_connection(conn):
+        paramstyle = _paramstyle(conn._get_dbapi_connection())
+    else:
+        paramstyle = None
+
+    prepared = cache[statement] = PreparedStatement(statement, paramstyle)
+
+    if len(cache) > STATEMENT_CACHE_SIZE:
+        cache.popitem(last=False)
+
+    return prepared
@@ -1,10 +1,11 @@
 import itertools
 import shlex
+from argparse import Namespace
+from functools import lru_cache
 from os.path import expandvars
 
 from six.moves import configparser as CP
 from sqlalchemy.engine.url import URL
-from IPython.core.magic_arguments import parse_argstring
 
 
 def connection_from_dsn_section(section, config):
@@ -102,6 +103,25 @@ def without_sql_comment(parser, line):
     return " ".join(result)
 
 
+# number of lines in the cache of parsed magic arguments
+_ARGS_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=_ARGS_CACHE_SIZE)
+def _parse_argstring(parser, line):
+    line = without_sql_comment(parser=parser, line=line)
+    return parser.parse_argstring(line)
+
+
 def magic_args(magic_execute, line):
-    line = without_sql_comment(parser=magic_execute.parser, line=line)
-    return parse_argstring(magic_execute, line)
+    """Parses the arguments in the line, results are cached by line (since %sql
+    is often called with the same line, e.g., in a loop) and each call returns a
+    copy so callers can modify it
+    """
+    args = _parse_argstring(magic_execute.parser, line)
+    return Namespace(
+        **{
+            key: list(value) if isinstance(value, list) else value
+            for key, value in vars(args).items()
+        }
+    )
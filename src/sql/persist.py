@@ -0,0 +1,568 @@
+"""
+Write data frames to the database (``%sql --persist``, ``--persist-replace`` and
+``--append``) using the fastest method each database supports: DuckDB creates the
+table from the registered data frame, PostgreSQL uses ``COPY ... FROM STDIN`` and
+SQLite inserts the rows with ``executemany``. Other databases use pandas'
+``to_sql``
+
+polars data frames and pyarrow tables are written without converting them to
+pandas: DuckDB and ADBC connections ingest the Arrow data natively and other
+databases insert it in batches
+"""
+import math
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from io import StringIO
+
+import sqlalchemy
+from sqlalchemy.pool import SingletonThreadPool
+
+from sql import exceptions
+from sql.connection import Connection
+from sql.export import is_psycopg2
+
+# values for SqlMagic.persist_method
+METHODS = ("auto", "multi", "insert")
+
+
+def _quote(identifier):
+    return '"{}"'.format(identifier.replace('"', '""'))
+
+
+def _qualified_name(table):
+    """Returns the quoted name of a pandas SQLTable"""
+    if table.schema:
+        return f"{_quote(table.schema)}.{_quote(table.name)}"
+
+    return _quote(table.name)
+
+
+def _csv_field(value):
+    # COPY reads unquoted empty fields as NULL, so the values are quoted (otherwise,
+    # empty strings would be stored as NULL)
+    if value is None:
+        return ""
+
+    return '"{}"'.format(str(value).replace('"', '""'))
+
+
+def copy_from_stdin(table, conn, keys, data_iter):
+    """
+    pandas ``to_sql`` insertion method that loads the rows with PostgreSQL's
+    ``COPY ... FROM STDIN`` (requires psycopg2)
+    """
+    buffer = StringIO()
+
+    for row in data_iter:
+        buffer.write(",".join(_csv_field(value) for value in row))
+        buffer.write("\n")
+
+    buffer.seek(0)
+
+    columns = ", ".join(_quote(key) for key in keys)
+    statement = f"COPY {_qualified_name(table)} ({columns}) FROM STDIN WITH CSV"
+
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(statement, buffer)
+        return cursor.rowcount
+
+
+def executemany(table, conn, keys, data_iter):
+    """
+    pandas ``to_sql`` insertion method that passes the rows to the driver's
+    ``executemany`` (pandas' default builds a dictionary per row and goes through
+    SQLAlchemy's parameter processing)
+    """
+    columns = ", ".join(_quote(key) for key in keys)
+    placeholders = ", ".join("?" for _ in keys)
+    statement = (
+        f"INSERT INTO {_qualified_name(table)} ({columns}) VALUES ({placeholders})"
+    )
+
+    result = conn.exec_driver_sql(statement, list(data_iter))
+    return result.rowcount
+
+
+def _insert_method(conn, method):
+    """Returns the pandas ``to_sql`` insertion method for the connection"""
+    if method == "multi":
+        return "multi"
+
+    if method == "insert" or Connection.is_dbapi_connection(conn):
+        return None
+
+    dialect = conn._get_curr_sqlglot_dialect()
+
+    if dialect == "postgres" and is_psycopg2(conn._get_dbapi_connection()):
+        return copy_from_stdin
+
+    if dialect == "sqlite":
+        return executemany
+
+    return None
+
+
+def _is_duckdb(conn):
+    # native duckdb connections (DBAPIConnection) don't have a SQLAlchemy dialect
+    return conn._get_curr_sqlglot_dialect() == "duckdb" or conn.dialect == "duckdb"
+
+
+def _table_exists_duckdb(connection, table_name):
+    # duckdb-engine's wrapper returns None from execute() so we fetch from the
+    # connection (duckdb's connections also implement the cursor methods)
+    connection.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?",
+        [table_name],
+    )
+    (count,) = connection.fetchone()
+    return count > 0
+
+
+def _persist_duckdb(conn, frame, table_name, if_exists, index):
+    """
+    Registers the data frame in DuckDB and creates the table from it, so the data
+    is copied by DuckDB instead of inserted row by row
+    """
+    # duckdb (or duckdb-engine's wrapper, which forwards register and unregister)
+    connection = conn._get_dbapi_connection()
+
+    if index:
+        frame = frame.reset_index()
+
+    exists = _table_exists_duckdb(connection, table_name)
+
+    if exists and if_exists == "fail":
+        raise ValueError(f"Table '{table_name}' already exists.")
+
+    view = f"__jupysql_persist_{uuid.uuid4().hex}"
+    connection.register(view, frame)
+
+    try:
+        if exists and if_exists == "append":
+            # match the columns by name (the frame's might be in another order)
+            names = frame.schema.names if is_arrow_compatible(frame) else frame.columns
+            columns = ", ".join(_quote(str(name)) for name in names)
+            statement = (
+                f"INSERT INTO {_quote(table_name)} ({columns}) "
+                f"SELECT {columns} FROM {view}"
+            )
+        else:
+            statement = (
+                f"CREATE OR REPLACE TABLE {_quote(table_name)} AS SELECT * FROM {view}"
+            )
+
+        connection.execute(statement)
+    finally:
+        connection.unregister(view)
+
+
+def is_arrow_compatible(obj):
+    """
+    Checks if the object is a polars DataFrame or LazyFrame, or a pyarrow Table,
+    RecordBatch or RecordBatchReader (without importing polars or pyarrow)
+    """
+    polars = sys.modules.get("polars")
+    pyarrow = sys.modules.get("pyarrow")
+
+    if polars is not None and isinstance(obj, (polars.DataFrame, polars.LazyFrame)):
+        return True
+
+    return pyarrow is not None and isinstance(
+        obj, (pyarrow.Table, pyarrow.RecordBatch, pyarrow.RecordBatchReader)
+    )
+
+
+def _to_arrow(frame):
+    """Returns a pyarrow Table or RecordBatchReader with the data"""
+    import pyarrow as pa
+
+    if isinstance(frame, (pa.Table, pa.RecordBatchReader)):
+        return frame
+
+    if isinstance(frame, pa.RecordBatch):
+        return pa.Table.from_batches([frame])
+
+    # polars LazyFrame
+    if hasattr(frame, "collect"):
+        frame = frame.collect()
+
+    return frame.to_arrow()
+
+
+def _iter_batches(data, chunksize):
+    """Yields record batches with at most ``chunksize`` rows"""
+    import pyarrow as pa
+
+    batches = data.to_batches() if isinstance(data, pa.Table) else data
+
+    for batch in batches:
+        if chunksize is None:
+            yield batch
+            continue
+
+        for offset in range(0, batch.num_rows, chunksize):
+            yield batch.slice(offset, chunksize)
+
+
+def _sqlalchemy_type(type_):
+    """Returns the SQLAlchemy type to store an Arrow type"""
+    import pyarrow as pa
+
+    if pa.types.is_boolean(type_):
+        return sqlalchemy.Boolean()
+
+    if pa.types.is_integer(type_):
+        return sqlalchemy.BigInteger()
+
+    if pa.types.is_floating(type_):
+        return sqlalchemy.Float()
+
+    if pa.types.is_decimal(type_):
+        return sqlalchemy.Numeric(type_.precision, type_.scale)
+
+    if pa.types.is_timestamp(type_):
+        return sqlalchemy.DateTime(timezone=type_.tz is not None)
+
+    if pa.types.is_date(type_):
+        return sqlalchemy.Date()
+
+    if pa.types.is_time(type_):
+        return sqlalchemy.Time()
+
+    if (
+        pa.types.is_binary(type_)
+        or pa.types.is_large_binary(type_)
+        or pa.types.is_fixed_size_binary(type_)
+    ):
+        return sqlalchemy.LargeBinary()
+
+    return sqlalchemy.Text()
+
+
+def _arrow_table(table_name, schema):
+    """Returns a SQLAlchemy table with columns for the fields in the Arrow schema"""
+    return sqlalchemy.Table(
+        table_name,
+        sqlalchemy.MetaData(),
+        *(
+            sqlalchemy.Column(field.name, _sqlalchemy_type(field.type))
+            for field in schema
+        ),
+    )
+
+
+def _insert_batches(connection, table, batches, method):
+    """Inserts record batches into a SQLAlchemy table"""
+    for batch in batches:
+        if not batch.num_rows:
+            continue
+
+        rows = batch.to_pylist()
+
+        if method == "multi":
+            connection.execute(table.insert().values(rows))
+        else:
+            connection.execute(table.insert(), rows)
+
+
+def _persist_arrow_sqlalchemy(conn, data, table_name, if_exists, chunksize, method):
+    """Creates the table from the Arrow schema and inserts the data in batches"""
+    session = conn.session
+    table = _arrow_table(table_name, data.schema)
+
+    # same as pandas: use the current transaction or start one
+    transaction = nullcontext() if session.in_transaction() else session.begin()
+
+    with transaction:
+        exists = sqlalchemy.inspect(session).has_table(table_name)
+
+        if exists and if_exists == "fail":
+            raise ValueError(f"Table '{table_name}' already exists.")
+
+        if exists and if_exists == "replace":
+            table.drop(session)
+
+        if not exists or if_exists == "replace":
+            table.create(session)
+
+        _insert_batches(session, table, _iter_batches(data, chunksize), method)
+
+
+def _is_adbc(conn):
+    """Checks if the connection is an ADBC connection (supports Arrow ingestion)"""
+    connection = conn._get_dbapi_connection()
+    return type(connection).__module__.split(".")[0].startswith("adbc_driver")
+
+
+def _persist_adbc(conn, data, table_name, if_exists):
+    """Ingests the Arrow data with ADBC's bulk ingestion"""
+    connection = conn._get_dbapi_connection()
+    mode = {"fail": "create", "append": "create_append", "replace": "replace"}
+
+    with connection.cursor() as cursor:
+        cursor.adbc_ingest(table_name, data, mode=mode[if_exists])
+
+    connection.commit()
+
+
+def _persist_arrow(conn, frame, table_name, if_exists, chunksize, method):
+    data = _to_arrow(frame)
+
+    if method == "auto" and _is_duckdb(conn):
+        return _persist_duckdb(conn, data, table_name, if_exists, index=False)
+
+    if Connection.is_dbapi_connection(conn):
+        if method == "auto" and _is_adbc(conn):
+            return _persist_adbc(conn, data, table_name, if_exists)
+
+        # other DBAPI connections are only supported by pandas' to_sql
+        data = data.to_pandas() if hasattr(data, "to_pandas") else data.read_pandas()
+        return _persist_pandas(
+            conn, data, table_name, if_exists, False, chunksize, method
+        )
+
+    return _persist_arrow_sqlalchemy(
+        conn, data, table_name, if_exists, chunksize, method
+    )
+
+
+def _persist_pandas(conn, frame, table_name, if_exists, index, chunksize, method):
+    if frame.ndim == 1:
+        frame = frame.to_frame()
+
+    if method == "auto" and _is_duckdb(conn):
+        return _persist_duckdb(conn, frame, table_name, if_exists, index)
+
+    if Connection.is_dbapi_connection(conn):
+        # pandas supports sqlite3 connections (and tries with other DBAPI ones)
+        con = conn._get_dbapi_connection()
+    else:
+        con = conn.session
+
+    frame.to_sql(
+        table_name,
+        con,
+        if_exists=if_exists,
+        index=index,
+        chunksize=chunksize,
+        method=_insert_method(conn, method),
+    )
+
+
+def persist_frame(
+    conn, frame, table_name, if_exists="fail", index=True, chunksize=None, method="auto"
+):
+    """Writes a data frame to a table
+
+    Parameters
+    ----------
+    conn : sql.connection.Connection
+        The connection to use
+
+    frame : pandas.DataFrame, pandas.Series, polars.DataFrame, polars.LazyFrame,
+    pyarrow.Table, pyarrow.RecordBatch or pyarrow.RecordBatchReader
+        The data to write
+
+    table_name : str
+        Name of the table
+
+    if_exists : str, default "fail"
+        What to do if the table exists: "fail", "replace" or "append" (same as
+        pandas' ``to_sql``)
+
+    index : bool, default True
+        Write the index as a column (only pandas data frames have an index)
+
+    chunksize : int, default None
+        Number of rows to insert at a time (ignored by DuckDB), None inserts all
+        the rows at once. All chunks are inserted in a single transaction
+
+    method : str, default "auto"
+        "auto" uses the fastest method the database supports, "multi" inserts
+        multiple rows per INSERT statement and "insert" uses pandas' default (one
+        INSERT statement executed for all the rows)
+    """
+    if method not in METHODS:
+        raise exceptions.ValueError(
+            f"Invalid method: {method!r}. Expected one of: {', '.join(METHODS)}"
+        )
+
+    if is_arrow_compatible(frame):
+        return _persist_arrow(conn, frame, table_name, if_exists, chunksize, method)
+
+    return _persist_pandas(conn, frame, table_name, if_exists, index, chunksize, method)
+
+
+def _check_parallel(conn):
+    """Checks if the connection can insert data from multiple connections"""
+    if Connection.is_dbapi_connection(conn):
+        raise exceptions.UsageError(
+            "--parallel requires a SQLAlchemy connection since it inserts the data "
+            "using multiple connections from the engine's pool"
+        )
+
+    engine = conn.engine
+    in_memory = engine.dialect.name in {"sqlite", "duckdb"} and (
+        engine.url.database in {None, "", ":memory:"}
+    )
+
+    if in_memory or isinstance(engine.pool, SingletonThreadPool):
+        raise exceptions.UsageError(
+            f"--parallel cannot be used with this connection ({conn.url}) since "
+            "each connection opens a different database. "
+            "Use a database stored in a file instead"
+        )
+
+    # SQLite allows a single writer at a time, the other connections wait for it
+    # and fail with "database is locked" once they exceed the busy timeout
+    if engine.dialect.name == "sqlite":
+        raise exceptions.UsageError(
+            "--parallel cannot be used with SQLite since it only allows one "
+            "connection to write at a time. Remove --parallel"
+        )
+
+
+def _insert_chunks(engine, chunks, lock, stop, insert):
+    """
+    Inserts chunks (shared with the other workers) in a single transaction until
+    there are no chunks left or another worker failed
+    """
+    with engine.begin() as connection:
+        while not stop.is_set():
+            with lock:
+                chunk = next(chunks, None)
+
+            if chunk is None:
+                return
+
+            insert(connection, chunk)
+
+
+def persist_frame_parallel(
+    conn,
+    frame,
+    table_name,
+    if_exists="fail",
+    index=True,
+    chunksize=None,
+    method="auto",
+    n_jobs=2,
+):
+    """
+    Writes a data frame to a table by splitting it in chunks that are inserted
+    concurrently from ``n_jobs`` connections (from the engine's pool). The data
+    is inserted into a staging table that replaces (or is appended to) the table
+    once all chunks are inserted, so the table is never half-written
+
+    Parameters are the same as ``persist_frame``. If ``chunksize`` is None,
+    pandas data frames are split in ``n_jobs`` chunks (Arrow data is split in
+    the record batches it's made of)
+    """
+    if method not in METHODS:
+        raise exceptions.ValueError(
+            f"Invalid method: {method!r}. Expected one of: {', '.join(METHODS)}"
+        )
+
+    if n_jobs < 1:
+        raise exceptions.ValueError(f"n_jobs must be positive, got: {n_jobs}")
+
+    _check_parallel(conn)
+
+    engine = conn.engine
+    quote = engine.dialect.identifier_preparer.quote
+    exists = sqlalchemy.inspect(engine).has_table(table_name)
+
+    if exists and if_exists == "fail":
+        raise ValueError(f"Table '{table_name}' already exists.")
+
+    staging_name = f"{table_name}__jupysql_staging_{uuid.uuid4().hex[:8]}"
+
+    if is_arrow_compatible(frame):
+        data = _to_arrow(frame)
+        columns = data.schema.names
+        chunks = _iter_batches(data, chunksize)
+        staging = _arrow_table(staging_name, data.schema)
+
+        def create(connection, chunk):
+            staging.create(connection)
+            _insert_batches(
+                connection, staging, [] if chunk is None else [chunk], method
+            )
+
+        def insert(connection, chunk):
+            _insert_batches(connection, staging, [chunk], method)
+
+    else:
+        if frame.ndim == 1:
+            frame = frame.to_frame()
+
+        if index:
+            frame = frame.reset_index()
+
+        columns = [str(column) for column in frame.columns]
+        chunksize = chunksize or max(1, math.ceil(len(frame) / n_jobs))
+        chunks = (
+            frame.iloc[offset : offset + chunksize]
+            for offset in range(0, len(frame), chunksize)
+        )
+        insert_method = _insert_method(conn, method)
+
+        def insert(connection, chunk):
+            chunk.to_sql(
+                staging_name,
+                connection,
+                if_exists="append",
+                index=False,
+                method=insert_method,
+            )
+
+        # the column types are inferred from the first chunk
+        def create(connection, chunk):
+            insert(connection, frame.head(0) if chunk is None else chunk)
+
+    # the staging table must exist (and be committed) before the workers start
+    try:
+        with engine.begin() as connection:
+            create(connection, next(chunks, None))
+
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        with ThreadPoolExecutor(
+            max_workers=n_jobs, thread_name_prefix="jupysql-persist"
+        ) as executor:
+            futures = [
+                executor.submit(_insert_chunks, engine, chunks, lock, stop, insert)
+                for _ in range(n_jobs)
+            ]
+
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                stop.set()
+                raise
+
+        with engine.begin() as connection:
+            if exists and if_exists == "append":
+                names = ", ".join(quote(column) for column in columns)
+                connection.exec_driver_sql(
+                    f"INSERT INTO {quote(table_name)} ({names}) "
+                    f"SELECT {names} FROM {quote(staging_name)}"
+                )
+                connection.exec_driver_sql(f"DROP TABLE {quote(staging_name)}")
+            else:
+                if exists:
+                    connection.exec_driver_sql(f"DROP TABLE {quote(table_name)}")
+
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {quote(staging_name)} RENAME TO {quote(table_name)}"
+                )
+    except BaseException:
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {quote(staging_name)}")
+
+        raise
@@ -9,18 +9,6 @@ from sql.util import flatten
 from sqlalchemy.exc import ProgrammingError
 from sql import exceptions, display
 
-try:
-    import matplotlib.pyplot as plt
-    from matplotlib.colors import Normalize
-except ModuleNotFoundError:
-    plt = None
-    Normalize = None
-
-try:
-    import numpy as np
-except ModuleNotFoundError:
-    np = None
-
 import sql.connection
 from sql.telemetry import telemetry
 import warnings
@@ -138,6 +126,8 @@ OR  "{{column}}" > {{whishi}}
 @modify_exceptions
 def _boxplot_stats(conn, table, column, whis=1.5, autorange=False, with_=None):
     """Compute statistics required to create a boxplot"""
+    import numpy as np
+
     if not conn:
         conn = sql.connection.Connection.current
 
@@ -210,7 +200,7 @@ def _boxplot_stats(conn, table, column, whis=1.5, autorange=False, with_=None):
 # https://github.com/matplotlib/matplotlib/blob/ddc260ce5a53958839c244c0ef0565160aeec174/lib/matplotlib/axes/_axes.py#L3915
 @requires(["matplotlib"])
 @telemetry.log_call("boxplot", payload=True)
-def boxplot(payload, table, column, *, orient="v", with_=None, conn=None, ax=None):
+def boxplot(table, column, *, orient="v", with_=None, conn=None, ax=None, payload=None):
     """Plot boxplot
 
     Parameters
@@ -257,10 +247,13 @@ def boxplot(payload, table, column, *, orient="v", with_=None, conn=None, ax=Non
 
     .. plot:: ../examples/plot_boxplot_many.py
     """
+    import matplotlib.pyplot as plt
+
     if not conn:
         conn = sql.connection.Connection.current
 
-    payload["connection_info"] = conn._get_curr_sqlalchemy_connection_info()
+    if payload is not None:
+        payload["connection_info"] = conn._get_curr_sqlalchemy_connection_info()
 
     ax = plt.gca()
     vert = orient == "v"
@@ -327,6 +320,7 @@ def _get_bar_width(ax, bins, bin_size):
     width : float
         A single bar width
     """
+    import matplotlib.pyplot as plt
 
     if _are_numeric_values(bin_size):
         width = bin_size
@@ -342,7 +336,6 @@ def _get_bar_width(ax, bins, bin_size):
 @requires(["matplotlib"])
 @telemetry.log_call("histogram", payload=True)
 def histogram(
-    payload,
     table,
     column,
     bins,
@@ -354,6 +347,8 @@ def histogram(
     edgecolor=None,
     ax=None,
     facet=None,
+    *,
+    payload=None,
 ):
     """Plot histogram
 
@@ -394,11 +389,16 @@ def histogram(
 
     .. plot:: ../examples/plot_histogram_many.py
     """
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import Normalize
+    import numpy as np
+
     if not conn:
         conn = sql.connection.Connection.current
 
     ax = ax or plt.gca()
-    payload["connection_info"] = conn._get_curr_sqlalchemy_connection_info()
+    if payload is not None:
+        payload["connection_info"] = conn._get_curr_sqlalchemy_connection_info()
     if category:
         if isinstance(column, list):
             if len(column) > 1:
@@ -732,7 +732,6 @@ def _bar(table, column, with_=None, conn=None):
 @requires(["matplotlib"])
 @telemetry.log_call("bar", payload=True)
 def bar(
-    payload,
     table,
     column,
     show_num=False,
@@ -743,6 +742,8 @@ def bar(
     color=None,
     edgecolor=None,
     ax=None,
+    *,
+    payload=None,
 ):
     """Plot Bar Chart
 
@@ -774,12 +775,15 @@ def bar(
         Generated plot
 
     """
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import Normalize
 
     if not conn:
         conn = sql.connection.Connection.current
 
     ax = ax or plt.gca()
-    payload["connection_info"] = conn._get_curr_sqlalchemy_connection_info()
+    if payload is not None:
+        payload["connection_info"] = conn._get_curr_sqlalchemy_connection_info()
 
     if column is None:
         raise exceptions.UsageError("Column name has not been specified")
@@ -910,7 +914,6 @@ def _pie(table, column, with_=None, conn=None):
 @requires(["matplotlib"])
 @telemetry.log_call("bar", payload=True)
 def pie(
-    payload,
     table,
     column,
     show_num=False,
@@ -919,6 +922,8 @@ def pie(
     cmap=None,
     color=None,
     ax=None,
+    *,
+    payload=None,
 ):
     """Plot Pie Chart
 
@@ -946,12 +951,15 @@ def pie(
     ax : matplotlib.Axes
         Generated plot
     """
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import Normalize
 
     if not conn:
         conn = sql.connection.Connection.current
 
     ax = ax or plt.gca()
-    payload["connection_info"] = conn._get_curr_sqlalchemy_connection_info()
+    if payload is not None:
+        payload["connection_info"] = conn._get_curr_sqlalchemy_connection_info()
 
     if column is None:
         raise exceptions.UsageError("Column name has not been specified")
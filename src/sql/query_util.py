@@ -1,7 +1,3 @@
-from sqlglot import parse_one, exp
-from sqlglot.errors import ParseError
-
-
 def extract_tables_from_query(query):
     """
     Function to extract names of tables from
@@ -17,6 +13,9 @@ def extract_tables_from_query(query):
         List of tables in the query
         [] if error in parsing the query
     """
+    from sqlglot import parse_one, exp
+    from sqlglot.errors import ParseError
+
     try:
         tables = [table.name for table in parse_one(query).find_all(exp.Table)]
         return tables
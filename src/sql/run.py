@@ -1,25 +1,28 @@
-import codecs
-import csv
+import itertools
 import operator
 import os.path
 import re
 from functools import reduce
 from io import StringIO
+from pathlib import Path
 import html
+import time
+from contextlib import contextmanager, nullcontext
 
 import prettytable
 import sqlalchemy
 import sqlparse
 from sql.connection import Connection
+from sql.buffer import ColumnarBuffer
+from sql.interrupt import Interruptible
+from sql import export, params
+from sql.cache import CachedCursor, query_cache, cache_key, connection_key
 from sqlalchemy.exc import ResourceClosedError
 from sql import exceptions, display
 from .column_guesser import ColumnGuesserMixin
 from sql.warnings import JupySQLDataFramePerformanceWarning
+from ploomber_core.dependencies import requires, check_installed
 
-try:
-    from pgspecial.main import PGSpecial
-except ModuleNotFoundError:
-    PGSpecial = None
 from sqlalchemy.orm import Session
 
 from sql.telemetry import telemetry
@@ -41,35 +44,6 @@ def unduplicate_field_names(field_names):
     return res
 
 
-class UnicodeWriter(object):
-    """
-    A CSV writer which will write rows to CSV file "f",
-    which is encoded in the given encoding.
-    """
-
-    def __init__(self, f, dialect=csv.excel, encoding="utf-8", **kwds):
-        # Redirect output to a queue
-        self.queue = StringIO()
-        self.writer = csv.writer(self.queue, dialect=dialect, **kwds)
-        self.stream = f
-        self.encoder = codecs.getincrementalencoder(encoding)()
-
-    def writerow(self, row):
-        _row = row
-        self.writer.writerow(_row)
-        # Fetch UTF-8 output from the queue ...
-        data = self.queue.getvalue()
-        # write to the target stream
-        self.stream.write(data)
-        # empty queue
-        self.queue.truncate(0)
-        self.queue.seek(0)
-
-    def writerows(self, rows):
-        for row in rows:
-            self.writerow(row)
-
-
 class CsvResultDescriptor(object):
     """
     Provides IPython Notebook-friendly output for the
@@ -101,6 +75,15 @@ def _nonbreaking_spaces(match_obj):
 
 _cell_with_spaces_pattern = re.compile(r"(<td>)( {2,})")
 
+# number of rows to fetch (and convert) at a time when building an Arrow table
+_ARROW_BATCH_SIZE = 100_000
+
+# number of rows to fetch at a time when iterating over the results in batches
+_FETCH_BATCH_SIZE = 1_000
+
+# number of rows to fetch (and write) at a time when exporting to CSV
+_CSV_BATCH_SIZE = 10_000
+
 
 class ResultSet(ColumnGuesserMixin):
     """
@@ -111,8 +94,19 @@ class ResultSet(ColumnGuesserMixin):
     # user to overcome a duckdb-engine limitation, see @sqlaproxy for details
     LAST_BY_CONNECTION = {}
 
-    def __init__(self, sqlaproxy, config, statement=None, conn=None):
-        ResultSet.LAST_BY_CONNECTION[conn] = self
+    def __init__(
+        self,
+        sqlaproxy,
+        config,
+        statement=None,
+        conn=None,
+        timeout=None,
+        deadline=None,
+        transaction=None,
+    ):
+        # cached results don't use the connection's cursor
+        if not isinstance(sqlaproxy, CachedCursor):
+            ResultSet.LAST_BY_CONNECTION[conn] = self
 
         self.config = config
         self.truncated = False
@@ -120,16 +114,35 @@ class ResultSet(ColumnGuesserMixin):
 
         self._sqlaproxy = sqlaproxy
         self._conn = conn
+        # fetching the rows is interrupted if it exceeds the timeout, the first
+        # fetch continues the deadline of the statement (see _interruptible)
+        self._timeout = timeout
+        self._deadline = deadline
+        # the transaction the statement runs in, committed once the rows are
+        # fetched (see _begin_transaction)
+        self._transaction = transaction
         self._dialect = conn._get_curr_sqlglot_dialect()
         self._keys = None
         self._field_names = None
-        self._results = []
+        if config.result_memory_limit:
+            check_installed(["pyarrow"], "result_memory_limit")
+
+        self._results = ColumnarBuffer(memory_limit=config.result_memory_limit)
+        # number of rows fetched but not stored in _results (see iter_batches)
+        self._n_streamed = 0
+        self._closed = False
+        # True once the cursor was returned to the DBAPI session
+        self._cursor_released = False
+        # identifies the statement in the DBAPI session's cursor (see _owns_cursor)
+        execution_id = getattr(getattr(conn, "session", None), "execution_id", None)
+        self._execution_id = execution_id(sqlaproxy) if execution_id else None
 
         # https://peps.python.org/pep-0249/#description
         self.is_dbapi_results = hasattr(sqlaproxy, "description")
 
         # note that calling this will fetch the keys
         self.pretty_table = self._init_table()
+        self._results.fields = self.keys
 
         self._mark_fetching_as_done = False
 
@@ -147,7 +160,8 @@ class ResultSet(ColumnGuesserMixin):
         self._finished_init = True
 
         if conn:
-            conn._result_sets.append(self)
+            conn._result_sets.add(self)
+            self._evict_result_sets()
 
     @property
     def sqlaproxy(self):
@@ -166,24 +180,163 @@ class ResultSet(ColumnGuesserMixin):
             # this only applies to duckdb + sqlalchemy with outdated results
             and is_duckdb_sqlalchemy
             and not is_last_result
+            # cached results (e.g., --cache, --on) are not read from the database
+            and not isinstance(self._sqlaproxy, CachedCursor)
         ):
-            self._sqlaproxy = self._conn.session.execute(self.statement)
-            self._sqlaproxy.fetchmany(size=len(self._results))
+            with self._conn._lock:
+                self._sqlaproxy = self._conn.session.execute(self.statement)
+                self._sqlaproxy.fetchmany(size=len(self._results) + self._n_streamed)
 
             ResultSet.LAST_BY_CONNECTION[self._conn] = self
 
         return self._sqlaproxy
 
-    def _extend_results(self, elements):
-        """Store the DB fetched results into the internal list of results"""
+    @property
+    def nbytes(self):
+        """Estimated number of bytes used by the rows stored in memory"""
+        return self._results.nbytes
+
+    def close(self):
+        """
+        Close the cursor and drop the stored rows. Result sets are closed
+        automatically when evicted (see SqlMagic.result_sets_limit and
+        SqlMagic.result_sets_memory_limit)
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        self._results.clear()
+        self.pretty_table.clear_rows()
+
+        # close the cursor instead of keeping it for the next statement
+        if not self._release_cursor(reuse=False):
+            close = getattr(self._sqlaproxy, "close", None)
+
+            if close is not None:
+                close()
+
+        self.mark_fetching_as_done()
+
+        if self._conn:
+            self._conn._result_sets.remove(self)
+
+        if ResultSet.LAST_BY_CONNECTION.get(self._conn) is self:
+            del ResultSet.LAST_BY_CONNECTION[self._conn]
+
+    def _release_cursor(self, reuse=True):
+        """
+        Returns the cursor to the DBAPI session so it can be reused or closed (see
+        DBAPISession.release_cursor). Returns False if the session doesn't manage
+        the cursor (e.g., SQLAlchemy connections)
+        """
+        if self._cursor_released:
+            return True
+
+        session = getattr(self._conn, "session", None)
+        release_cursor = getattr(session, "release_cursor", None)
+
+        if release_cursor is not None and release_cursor(self._sqlaproxy, reuse=reuse):
+            self._cursor_released = True
+
+        return self._cursor_released
+
+    def _owns_cursor(self):
+        """
+        Checks if the cursor still has this result set's results (it might've been
+        released and used for another statement)
+        """
+        if not self._cursor_released:
+            return True
+
+        is_idle = getattr(self._conn.session, "is_idle", None)
+        return is_idle is not None and is_idle(self._sqlaproxy, self._execution_id)
+
+    @contextmanager
+    def _native_cursor(self):
+        """
+        Yields the native duckdb (or ADBC) cursor after executing the statement
+        again. If the cursor was used for another statement, a new one is used
+        """
+        with self._conn._lock:
+            if self._owns_cursor():
+                self.sqlaproxy.execute(self.statement)
+                yield self.sqlaproxy
+                return
+
+            cursor = self._conn.session.execute(self.statement)
+
+            try:
+                yield cursor
+            finally:
+                self._conn.session.release_cursor(cursor)
+
+    def _evict_result_sets(self):
+        """Evict the least recently used result sets of this connection"""
+        self._conn._result_sets.evict(
+            max_size=self.config.result_sets_limit,
+            max_bytes=self.config.result_sets_memory_limit,
+        )
+
+    def _touch(self):
+        """Raise an error if closed, otherwise, mark as most recently used"""
+        if self._closed:
+            raise exceptions.RuntimeError(
+                "The result set was closed (the least recently used result sets are "
+                "closed automatically, see SqlMagic.result_sets_limit and "
+                "SqlMagic.result_sets_memory_limit, and results streamed in a "
+                "transaction are closed when running another statement). Run the "
+                "query again to fetch the results"
+            )
+
+        if self._conn:
+            self._conn._result_sets.touch(self)
+
+    def _extend_results(self, elements, arrays=None):
+        """Store the DB fetched results into the internal list of results. If
+        ``arrays`` (the columns of the results as Arrow arrays) are passed, they're
+        stored instead of the rows
+        """
         to_add = self.config.displaylimit - len(self._results)
-        self._results.extend(elements)
+
+        if arrays is None:
+            self._results.extend(elements)
+        else:
+            self._results.extend_arrow(arrays)
+
         self.pretty_table.add_rows(elements[:to_add])
 
     def mark_fetching_as_done(self):
         self._mark_fetching_as_done = True
         # NOTE: don't close the connection here (self.sqlaproxy.close()),
-        # because we need to keep it open for the next query
+        # because we need to keep it open for the next query. DBAPI cursors are
+        # returned to the session, which reuses them for the next statement
+        self._release_cursor()
+        self._end_transaction()
+
+    def _end_transaction(self):
+        """Commits the transaction the statement runs in (if any, see run)"""
+        transaction, self._transaction = self._transaction, None
+
+        if transaction is not None:
+            with self._conn._lock:
+                # committing closes the server-side cursor, so close it first
+                self._sqlaproxy.close()
+                _end_transaction(self._conn, transaction)
+
+    def _finish_transaction(self):
+        """
+        Fetches the remaining rows so the transaction the statement runs in (if
+        any) is committed before running another statement on the connection. If
+        some rows were consumed without storing them, the result set is closed
+        """
+        if self._transaction is None:
+            return
+
+        if self._n_streamed:
+            self.close()
+        else:
+            self.fetchall()
 
     def _done_fetching(self):
         return self._mark_fetching_as_done
@@ -279,6 +432,8 @@ class ResultSet(ColumnGuesserMixin):
         Access by integer (row position within result set)
         or by string (value of leftmost column)
         """
+        self._touch()
+
         try:
             return self._results[key]
         except TypeError:
@@ -301,7 +456,8 @@ class ResultSet(ColumnGuesserMixin):
         """Returns a single dict built from the result set
 
         Keys are column names; values are a tuple"""
-        return dict(zip(self.keys, zip(*self)))
+        self.fetchall()
+        return dict(zip(self.keys, (tuple(c) for c in self._results.columns())))
 
     def dicts(self):
         "Iterator yielding a dict for each row"
@@ -309,11 +465,20 @@ class ResultSet(ColumnGuesserMixin):
             yield dict(zip(self.keys, row))
 
     @telemetry.log_call("data-frame", payload=True)
-    def DataFrame(self, payload):
+    def DataFrame(self, *, payload=None):
         """Returns a Pandas DataFrame instance built from the result set."""
-        payload["connection_info"] = self._conn._get_curr_sqlalchemy_connection_info()
+        if payload is not None:
+            info = self._conn._get_curr_sqlalchemy_connection_info()
+            payload["connection_info"] = info
+
         import pandas as pd
 
+        if self.config.autoarrow:
+            table = _to_arrow_or_none(self)
+
+            if table is not None:
+                return table.to_pandas(split_blocks=True, self_destruct=True)
+
         kwargs = {"columns": (self and self.keys) or []}
         return _convert_to_data_frame(self, "df", pd.DataFrame, kwargs)
 
@@ -322,9 +487,149 @@ class ResultSet(ColumnGuesserMixin):
         """Returns a Polars DataFrame instance built from the result set."""
         import polars as pl
 
+        # polars_dataframe_kwargs are only understood by the pl.DataFrame
+        # constructor, so we only take the Arrow path if there are none
+        if self.config.autoarrow and not polars_dataframe_kwargs:
+            table = _to_arrow_or_none(self)
+
+            if table is not None:
+                return pl.from_arrow(table)
+
         polars_dataframe_kwargs["schema"] = self.keys
         return _convert_to_data_frame(self, "pl", pl.DataFrame, polars_dataframe_kwargs)
 
+    @telemetry.log_call("to-arrow")
+    def to_arrow(self, batch_size=_ARROW_BATCH_SIZE):
+        """Returns a pyarrow.Table built from the result set.
+
+        Native DuckDB (and ADBC) cursors stream Arrow record batches directly,
+        other connections are converted ``batch_size`` rows at a time.
+        """
+        return self._to_arrow(batch_size=batch_size)
+
+    @requires(["pyarrow"])
+    def _to_arrow(self, batch_size=_ARROW_BATCH_SIZE):
+        import pyarrow as pa
+
+        # native duckdb connection or ADBC driver. Same as in _convert_to_data_frame:
+        # if we already fetched some rows, we need to re-execute the statement, but
+        # only if it's a SELECT, other statements are built from the fetched rows
+        if hasattr(self.sqlaproxy, "fetch_record_batch") and _statement_is_select(
+            self.statement
+        ):
+            with self._native_cursor() as cursor:
+                return cursor.fetch_record_batch(batch_size).read_all()
+
+        self._touch()
+        self._raise_if_streamed()
+
+        chunks = [[] for _ in self.keys]
+        # the stored rows (the batches are listed before fetching the rest, since
+        # fetching stores more chunks)
+        batches = list(self._results.iter_arrow_batches(batch_size))
+
+        for columns in itertools.chain(batches, self._fetch_arrow(batch_size)):
+            for idx, values in enumerate(columns):
+                chunks[idx].append(values)
+
+        self._evict_result_sets()
+
+        return pa.Table.from_arrays(
+            [_concat_arrow_chunks(chunks_) for chunks_ in chunks],
+            names=list(self.keys),
+        )
+
+    def _fetch_arrow(self, size):
+        """
+        Fetches the rows that haven't been fetched ``size`` at a time, converting
+        each batch to Arrow arrays (one per column). The arrays are stored in the
+        result set instead of the rows and yielded
+        """
+        import pyarrow as pa
+
+        while not self._done_fetching():
+            returned = self._fetchmany_from_cursor(size)
+
+            if returned is None:
+                break
+
+            try:
+                arrays = [pa.array(list(values)) for values in zip(*returned)]
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # store the rows, so they're there if the caller falls back to the
+                # regular conversion
+                self._extend_results(returned)
+                self._mark_done_if_needed(returned, size)
+                raise
+
+            self._extend_results(returned, arrays or None)
+            self._mark_done_if_needed(returned, size)
+
+            if arrays:
+                yield arrays
+
+    @telemetry.log_call("to-parquet")
+    def to_parquet(self, path, batch_size=_ARROW_BATCH_SIZE, retain=False, **kwargs):
+        """Writes the results to a Parquet file.
+
+        Rows that haven't been fetched are fetched and written ``batch_size`` at a
+        time without storing them in the result set (same as ``iter_batches``), so
+        exporting a large result doesn't keep it in memory. Pass ``retain=True`` to
+        store them (to keep using the result set afterwards). ``kwargs`` are passed
+        to ``pyarrow.parquet.ParquetWriter`` (e.g., ``compression``)
+        """
+        self._to_file(path, "parquet", batch_size, retain=retain, **kwargs)
+
+    @telemetry.log_call("to-arrow-ipc")
+    def to_arrow_ipc(self, path, batch_size=_ARROW_BATCH_SIZE, retain=False, **kwargs):
+        """Writes the results to an Arrow IPC file (also known as Feather V2).
+
+        Same as ``to_parquet``, rows are written in batches, ``kwargs`` are passed
+        to ``pyarrow.ipc.new_file``
+        """
+        self._to_file(path, "arrow", batch_size, retain=retain, **kwargs)
+
+    @requires(["pyarrow"])
+    def _to_file(self, path, format, batch_size, progress=None, retain=True, **kwargs):
+        """Writes the results to a file, returns the number of rows written"""
+        return export.write_file(
+            self._iter_record_batches(batch_size, retain),
+            list(self.keys),
+            path,
+            format,
+            progress=progress,
+            **kwargs,
+        )
+
+    def _iter_record_batches(self, batch_size, retain=True):
+        """
+        Yields the results as pyarrow.RecordBatch objects of (at most)
+        ``batch_size`` rows, the rows fetched are stored if ``retain=True``
+        """
+        import pyarrow as pa
+
+        # same as in _to_arrow, native duckdb cursors return record batches
+        if hasattr(self.sqlaproxy, "fetch_record_batch") and _statement_is_select(
+            self.statement
+        ):
+            with self._native_cursor() as cursor:
+                yield from cursor.fetch_record_batch(batch_size)
+
+            return
+
+        names = list(self.keys)
+
+        # all the rows are stored, convert the columns directly
+        if self._done_fetching() and not self._n_streamed:
+            for columns in self._results.iter_arrow_batches(batch_size):
+                yield pa.record_batch(columns, names)
+
+            return
+
+        for rows in self._iter_batches(batch_size, retain):
+            columns = zip(*rows) if names else []
+            yield pa.record_batch([pa.array(list(values)) for values in columns], names)
+
     @telemetry.log_call("pie")
     def pie(self, key_word_sep=" ", title=None, **kwargs):
         """Generates a pylab pie chart from the result set.
@@ -431,62 +736,252 @@ class ResultSet(ColumnGuesserMixin):
         return ax
 
     @telemetry.log_call("generate-csv")
-    def csv(self, filename=None, **format_params):
+    def csv(
+        self,
+        filename=None,
+        compression="infer",
+        batch_size=_CSV_BATCH_SIZE,
+        progress=False,
+        retain=False,
+        **format_params,
+    ):
         """Generate results in comma-separated form.  Write to ``filename`` if given.
-        Any other parameters will be passed on to csv.writer."""
-        if filename:
-            encoding = format_params.get("encoding", "utf-8")
-            outfile = open(filename, "w", newline="", encoding=encoding)
-        else:
-            outfile = StringIO()
+        Any other parameters will be passed on to csv.writer.
+
+        When writing to a file, rows that haven't been fetched are fetched and
+        written ``batch_size`` at a time without storing them in the result set
+        (same as ``iter_batches``), so writing a large result doesn't keep it in
+        memory. Pass ``retain=True`` to store them (to keep using the result set
+        afterwards), the rows are always stored when returning a string.
+        ``compression`` can be ``"gzip"``, ``"zstd"`` (requires ``zstandard``) or
+        None, by default, it's inferred from the extension (.gz or .zst). If
+        ``progress=True``, shows the number of rows written (and rows per second)
+        """
+        encoding = format_params.pop("encoding", "utf-8")
 
-        writer = UnicodeWriter(outfile, **format_params)
-        writer.writerow(self.field_names)
-        for row in self:
-            writer.writerow(row)
-        if filename:
-            outfile.close()
-            return CsvResultDescriptor(filename)
-        else:
+        if not filename:
+            # the whole output is in memory anyway, so keep the rows
+            self.fetchall()
+            outfile = StringIO()
+            export.write_csv(
+                self.iter_batches(size=batch_size),
+                self.field_names,
+                outfile,
+                **format_params,
+            )
             return outfile.getvalue()
 
+        progress = export.Progress(filename) if progress else None
+        self._csv_to_file(
+            filename,
+            compression=compression,
+            batch_size=batch_size,
+            progress=progress,
+            encoding=encoding,
+            retain=retain,
+            **format_params,
+        )
+
+        if progress is not None:
+            progress.done()
+
+        return CsvResultDescriptor(filename)
+
+    def _csv_to_file(
+        self,
+        filename,
+        compression="infer",
+        batch_size=_CSV_BATCH_SIZE,
+        progress=None,
+        encoding="utf-8",
+        retain=True,
+        **format_params,
+    ):
+        """Writes the results to a CSV file, returns the number of rows written"""
+        if compression == "infer":
+            compression = export.compression_from_path(filename)
+
+        try:
+            with export.open_text_file(filename, compression, encoding) as outfile:
+                return export.write_csv(
+                    self._iter_batches(batch_size, retain),
+                    self.field_names,
+                    outfile,
+                    progress=progress,
+                    **format_params,
+                )
+        # don't leave a partially written file
+        except BaseException:
+            Path(filename).unlink(missing_ok=True)
+            raise
+
     def fetchmany(self, size):
         """Fetch n results and add it to the results"""
+        self._touch()
+
         if not self._done_fetching():
-            try:
-                returned = self.sqlaproxy.fetchmany(size=size)
-            # sqlite raises this error when running a script that doesn't return rows
-            # e.g, 'CREATE TABLE' but others don't (e.g., duckdb)
-            except ResourceClosedError:
-                self.mark_fetching_as_done()
-                return
+            self._raise_if_streamed()
+            returned = self._fetchmany_from_cursor(size)
+
+            if returned is not None:
+                self._extend_results(returned)
+                self._mark_done_if_needed(returned, size)
+
+    def _interruptible(self):
+        """
+        Interrupts fetching the rows if it runs for more than the timeout (or the
+        user presses Ctrl-C). The first fetch (while initializing) has the
+        statement's deadline, later fetches get the whole timeout
+        """
+        if isinstance(self._sqlaproxy, CachedCursor):
+            return nullcontext()
+
+        deadline = None if hasattr(self, "_finished_init") else self._deadline
+        return Interruptible(self._conn, timeout=self._timeout, deadline=deadline)
+
+    @contextmanager
+    def _fetching(self):
+        """
+        Context manager to use while fetching rows from the cursor, holds the
+        connection's lock so the rows aren't fetched while a query runs on the
+        connection in the background (see sql.background)
+        """
+        with self._conn._lock, self._interruptible():
+            yield
+
+    def _fetchmany_from_cursor(self, size):
+        """Fetch n results from the cursor, returns None if there are no results"""
+        try:
+            with self._fetching():
+                return self.sqlaproxy.fetchmany(size=size)
+        # sqlite raises this error when running a script that doesn't return rows
+        # e.g, 'CREATE TABLE' but others don't (e.g., duckdb)
+        except ResourceClosedError:
+            self.mark_fetching_as_done()
+            return None
 
-            self._extend_results(returned)
+    def _mark_done_if_needed(self, returned, size):
+        if len(returned) < size:
+            self.mark_fetching_as_done()
 
-            if len(returned) < size:
-                self.mark_fetching_as_done()
+        if (
+            self.config.autolimit is not None
+            and self.config.autolimit != 0
+            and len(self._results) + self._n_streamed >= self.config.autolimit
+        ):
+            self.mark_fetching_as_done()
 
-            if (
-                self.config.autolimit is not None
-                and self.config.autolimit != 0
-                and len(self._results) >= self.config.autolimit
-            ):
-                self.mark_fetching_as_done()
+    def _raise_if_streamed(self):
+        if self._n_streamed:
+            raise exceptions.RuntimeError(
+                "The results were already consumed by iterating over them without "
+                "storing them (e.g., with .iter_batches(), --stream or by writing "
+                "them to a file with retain=False). "
+                "Run the query again to fetch them"
+            )
 
     def fetch_for_repr_if_needed(self):
+        self._touch()
+
         if self.config.displaylimit == 0:
             self.fetchall()
 
         missing = self.config.displaylimit - len(self._results)
 
-        if missing > 0:
+        # if we streamed some rows, we can't fill the preview anymore since the
+        # next rows in the cursor are not the ones after the stored ones
+        if missing > 0 and not self._n_streamed:
             self.fetchmany(missing)
 
     def fetchall(self):
+        self._touch()
+        self._raise_if_streamed()
+
+        # if there's a memory limit, fetch in batches so the buffer can spill them to
+        # disk, otherwise, all the rows would be in memory at once
+        if self._results.memory_limit:
+            while not self._done_fetching():
+                self.fetchmany(_ARROW_BATCH_SIZE)
+
         if not self._done_fetching():
-            self._extend_results(self.sqlaproxy.fetchall())
+            with self._fetching():
+                rows = self.sqlaproxy.fetchall()
+
+            self._extend_results(rows)
             self.mark_fetching_as_done()
 
+        self._evict_result_sets()
+
+    def iter_batches(self, size=_FETCH_BATCH_SIZE):
+        """
+        Yields the results in lists of (at most) ``size`` rows. The rows are
+        fetched with ``fetchmany`` and are not stored in the result set, so
+        iterating over a large result doesn't keep all the rows in memory. Note
+        that this consumes the results: once done, the result set only holds the
+        rows that had been fetched before (e.g., to display the preview)
+        """
+        self._touch()
+        self._raise_if_streamed()
+
+        for start in range(0, len(self._results), size):
+            yield self._results[start : start + size]
+
+        while not self._done_fetching():
+            returned = self._fetchmany_from_cursor(size)
+
+            if returned is None:
+                break
+
+            self._n_streamed += len(returned)
+            self._mark_done_if_needed(returned, size)
+
+            if returned:
+                yield list(returned)
+
+    def _iter_batches(self, size, retain):
+        """
+        Yields the results in lists of (at most) ``size`` rows, same as
+        ``iter_batches`` but the rows fetched are stored if ``retain=True``
+        """
+        if not retain:
+            yield from self.iter_batches(size=size)
+            return
+
+        self._touch()
+        self._raise_if_streamed()
+
+        for start in itertools.count(0, size):
+            if start + size > len(self._results):
+                self.fetchmany(size)
+
+            batch = self._results[start : start + size]
+
+            if not batch:
+                return
+
+            yield batch
+
+    def iter_rows(self, retain=True, size=_FETCH_BATCH_SIZE):
+        """
+        Yields the results row by row, fetching ``size`` rows at a time. If
+        ``retain=False``, rows are not stored in the result set (see
+        ``iter_batches``)
+        """
+        if not retain:
+            for batch in self.iter_batches(size=size):
+                yield from batch
+
+            return
+
+        self._touch()
+        self._raise_if_streamed()
+        yield from self._results
+
+        while not self._done_fetching():
+            n_fetched = len(self._results)
+            self.fetchmany(size)
+            yield from self._results[n_fetched:]
+
     def _init_table(self):
         pretty = CustomPrettyTable(self.field_names)
 
@@ -497,6 +992,26 @@ class ResultSet(ColumnGuesserMixin):
         return pretty
 
 
+class StreamingResultSet(ResultSet):
+    """
+    A ResultSet that doesn't keep the results in memory: only the rows needed for
+    the preview are stored, iterating over it fetches the rest in batches and
+    discards them, hence, it can only be iterated once
+    """
+
+    def __iter__(self):
+        return self.iter_rows(retain=False)
+
+    def _iter_batches(self, size, retain):
+        # exporting the results doesn't store them either
+        return self.iter_batches(size=size)
+
+    def _finish_transaction(self):
+        # the rows that haven't been fetched can't be stored
+        if self._transaction is not None:
+            self.close()
+
+
 def display_affected_rowcount(rowcount):
     if rowcount > 0:
         display.message_success(f"{rowcount} rows affected.")
@@ -548,6 +1063,10 @@ _COMMIT_BLACKLIST_DIALECTS = (
     "vertica",
 )
 
+# drivers that can't run other statements on the connection until its server-side
+# cursor is exhausted
+_SERVER_SIDE_CURSOR_BLOCKING_DIALECTS = ("mysql", "mariadb")
+
 
 def _commit(conn, config, manual_commit):
     """Issues a commit, if appropriate for current config and dialect"""
@@ -580,7 +1099,9 @@ def is_pytds(dialect):
 
 def handle_postgres_special(conn, statement):
     """Execute a PostgreSQL special statement using PGSpecial module."""
-    if not PGSpecial:
+    try:
+        from pgspecial.main import PGSpecial
+    except ModuleNotFoundError:
         raise exceptions.MissingPackageError("pgspecial not installed")
 
     pgspecial = PGSpecial()
@@ -612,6 +1133,94 @@ def set_autocommit(conn, config):
     return False
 
 
+def _use_server_side_cursor(conn, statement, config, stream, manual_commit):
+    """
+    Determines if a statement should be executed with a server-side cursor
+    (stream_results), so the driver fetches ``config.yield_per`` rows at a time
+    instead of buffering the whole result on the client. By default, they're used
+    if the driver supports them, except for MySQL, whose server-side cursors
+    (unbuffered cursors) block the connection until they're exhausted, which a
+    partially fetched preview never is, so only streamed results (``--stream``)
+    use them
+    """
+    if not _statement_is_select(statement):
+        return False
+
+    # we'd need to commit after executing the statement, which closes the cursor
+    if manual_commit and not _is_autocommit(conn):
+        return False
+
+    if config.stream_results is not None:
+        return config.stream_results
+
+    if not conn.session.dialect.supports_server_side_cursors:
+        return False
+
+    # the results fit in a single fetch
+    if config.autolimit and config.autolimit <= config.yield_per:
+        return False
+
+    return stream or not any(
+        dialect in str(conn.dialect)
+        for dialect in _SERVER_SIDE_CURSOR_BLOCKING_DIALECTS
+    )
+
+
+def _needs_transaction(conn):
+    """
+    Checks if a statement executed with a server-side cursor has to run in a
+    transaction: PostgreSQL's server-side cursors only exist within one, so
+    psycopg doesn't support them in autocommit mode
+    """
+    return is_postgres_or_redshift(conn.dialect) and _is_autocommit(conn)
+
+
+def _begin_transaction(conn):
+    """
+    Begins a transaction on a connection in autocommit mode, so a statement can be
+    executed with a server-side cursor (see _needs_transaction). It's committed
+    with _end_transaction once the rows are fetched
+    """
+    session = conn.session
+
+    # SQLAlchemy begins a transaction in autocommit mode too (committing it is a
+    # no-op), the isolation level can only be changed once it ends
+    if session.in_transaction():
+        session.commit()
+
+    session.execution_options(isolation_level=session.default_isolation_level)
+    return session.begin()
+
+
+def _end_transaction(conn, transaction):
+    """
+    Commits a transaction started with _begin_transaction (unless it was rolled
+    back) and sets the connection back to autocommit mode
+    """
+    if transaction.is_active:
+        transaction.commit()
+
+    conn.session.execution_options(isolation_level="AUTOCOMMIT")
+
+
+def finish_transaction(conn):
+    """
+    Fetches the rows of the connection's last result set if they're fetched in a
+    transaction (see _begin_transaction), so it's committed before running other
+    statements on the connection
+    """
+    resultset = ResultSet.LAST_BY_CONNECTION.get(conn)
+
+    if resultset is not None:
+        resultset._finish_transaction()
+
+
+def _is_autocommit(conn):
+    """Checks if the connection is in AUTOCOMMIT mode"""
+    options = conn.session.get_execution_options()
+    return options.get("isolation_level") == "AUTOCOMMIT"
+
+
 def select_df_type(resultset, config):
     """
     Converts the input resultset to either a Pandas DataFrame
@@ -626,7 +1235,7 @@ def select_df_type(resultset, config):
     # returning only last result, intentionally
 
 
-def run(conn, sql, config):
+def run(conn, sql, config, stream=False, cache=False, timeout=None, parameters=None):
     """Run a SQL query with the given connection
 
     Parameters
@@ -639,14 +1248,60 @@ def run(conn, sql, config):
 
     config
         Configuration object
+
+    stream : bool, default False
+        If True, returns a StreamingResultSet, which doesn't keep the results in
+        memory (autopandas and autopolars are ignored)
+
+    cache : bool, default False
+        If True and ``sql`` is a single SELECT statement, returns the cached results
+        (if any), otherwise, executes it and caches the results
+
+    timeout : float, default None
+        Maximum number of seconds each statement can run for, defaults to
+        ``config.statement_timeout``. Statements that exceed it are interrupted
+
+    parameters : dict, default None
+        Values of the ``:name`` placeholders in ``sql``, passed to the database as
+        bind parameters (statements are prepared once per connection, see
+        sql.params). Cannot be used with ``cache``
     """
     if not sql.strip():
         # returning only when sql is empty string
         return "Connected: %s" % conn.name
 
-    for statement in sqlparse.split(sql):
+    if timeout is None:
+        timeout = config.statement_timeout
+
+    statements = sqlparse.split(sql)
+    use_cache = cache and len(statements) == 1 and _statement_is_select(statements[0])
+
+    if use_cache:
+        key = cache_key(conn, statements[0], config)
+        cached = query_cache.get(key, ttl=config.cache_ttl)
+
+        if cached is not None:
+            display.message("Using cached results (run without --cache to re-execute)")
+            resultset = _cached_result_set(cached, statements[0], conn, config)
+            return select_df_type(resultset, config)
+
+    result = None
+    transaction = None
+    finish_transaction(conn)
+
+    for statement in statements:
         first_word = sql.strip().split()[0].lower()
         manual_commit = False
+        deadline = time.monotonic() + timeout if timeout else None
+
+        # only the last statement's results are returned
+        if result is not None:
+            _release_cursor(conn, result)
+
+        if transaction is not None:
+            result.close()
+            _end_transaction(conn, transaction)
+            transaction = None
 
         # attempting to run a transaction
         if first_word == "begin":
@@ -661,21 +1316,199 @@ def run(conn, sql, config):
             manual_commit = set_autocommit(conn, config)
             is_dbapi_connection = Connection.is_dbapi_connection(conn)
 
+            # the statement might modify the data (or the schema)
+            if not _statement_is_select(statement):
+                query_cache.invalidate(connection_key(conn))
+
+            use_server_side_cursor = not is_dbapi_connection and (
+                _use_server_side_cursor(conn, statement, config, stream, manual_commit)
+            )
+
+            values = None
+
+            if parameters is not None:
+                prepared = params.prepare(conn, statement)
+                statement, values = prepared.statement, prepared.bind(parameters)
             # if regular sqlalchemy, pass a text object
-            if not is_dbapi_connection:
+            elif not is_dbapi_connection:
                 statement = sqlalchemy.sql.text(statement)
 
-            result = conn.session.execute(statement)
-            _commit(conn=conn, config=config, manual_commit=manual_commit)
+            if use_server_side_cursor:
+                statement = statement.execution_options(
+                    stream_results=True, max_row_buffer=config.yield_per
+                )
+
+                if _needs_transaction(conn):
+                    transaction = _begin_transaction(conn)
+
+            try:
+                with Interruptible(conn, timeout=timeout, deadline=deadline):
+                    if values is None:
+                        result = conn.session.execute(statement)
+                    else:
+                        result = conn.session.execute(statement, values)
+            except BaseException:
+                if transaction is not None:
+                    transaction.rollback()
+                    _end_transaction(conn, transaction)
+
+                raise
+
+            if use_server_side_cursor:
+                # don't commit, it'd close the cursor (the connection is in
+                # autocommit mode or the statement runs in a transaction that's
+                # committed once the rows are fetched, see _needs_transaction)
+                result = result.yield_per(config.yield_per)
+            else:
+                _commit(conn=conn, config=config, manual_commit=manual_commit)
 
             if result and config.feedback:
                 if hasattr(result, "rowcount"):
                     display_affected_rowcount(result.rowcount)
 
-    resultset = ResultSet(result, config, statement, conn)
+    if stream:
+        return StreamingResultSet(
+            result,
+            config,
+            statement,
+            conn,
+            timeout=timeout,
+            deadline=deadline,
+            transaction=transaction,
+        )
+
+    resultset = ResultSet(
+        result,
+        config,
+        statement,
+        conn,
+        timeout=timeout,
+        deadline=deadline,
+        transaction=transaction,
+    )
+
+    if use_cache:
+        resultset.fetchall()
+        query_cache.put(
+            key,
+            keys=resultset.keys,
+            rows=resultset._results,
+            max_bytes=config.cache_max_bytes,
+        )
+
     return select_df_type(resultset, config)
 
 
+def run_to_file(conn, sql, config, path, timeout=None):
+    """Run a SQL query and write the results to a CSV, Parquet or Arrow IPC file
+    (the format and compression are determined by the extension). Shows the number
+    of rows written (and rows per second) and returns the number of rows
+
+    If ``sql`` is a single SELECT statement and the database supports it, the
+    results are written with the database's native ``COPY``: DuckDB (CSV and
+    Parquet) and PostgreSQL (CSV, requires psycopg2). Otherwise, they're fetched
+    and written in batches (see ``ResultSet.csv`` and ``ResultSet.to_parquet``)
+    """
+    format = export.format_from_path(path)
+    compression = export.compression_from_path(path)
+    statements = sqlparse.split(sql)
+    progress = export.Progress(path)
+
+    if timeout is None:
+        timeout = config.statement_timeout
+
+    n_rows = _copy_to_file(
+        conn, statements, path, format, compression, timeout, config.autolimit
+    )
+
+    if n_rows is None:
+        resultset = run(conn, sql, config, stream=True, timeout=timeout)
+
+        if not isinstance(resultset, ResultSet):
+            raise exceptions.ValueError(
+                "Cannot export results to a file since the query didn't return any"
+            )
+
+        # the result set isn't returned, so there's no need to store the rows
+        if format == "csv":
+            n_rows = resultset._csv_to_file(
+                path, compression=compression, progress=progress, retain=False
+            )
+        else:
+            n_rows = resultset._to_file(
+                path, format, _ARROW_BATCH_SIZE, progress=progress, retain=False
+            )
+
+    progress.done(n_rows)
+    return n_rows
+
+
+def _copy_to_file(conn, statements, path, format, compression, timeout, limit=None):
+    """
+    Writes the results of a SELECT statement with the database's native ``COPY``,
+    returns the number of rows written (or None if it's not supported). If
+    ``limit`` is passed (``SqlMagic.autolimit``), writes at most that many rows
+    """
+    if len(statements) != 1 or not _statement_is_select(statements[0]):
+        return None
+
+    query = statements[0]
+
+    if limit:
+        # the line breaks keep a trailing comment from commenting out the rest
+        query = query.strip().rstrip(";")
+        query = f"SELECT * FROM (\n{query}\n) AS jupysql_autolimit LIMIT {int(limit)}"
+    dialect = conn._get_curr_sqlglot_dialect()
+
+    if dialect == "duckdb" and format in {"csv", "parquet"}:
+        statement = export.copy_statement(query, path, format, compression)
+
+        if not Connection.is_dbapi_connection(conn):
+            statement = sqlalchemy.sql.text(statement)
+
+        with Interruptible(conn, timeout=timeout):
+            # duckdb returns the number of rows written
+            (n_rows,) = conn.session.execute(statement).fetchone()
+
+        return n_rows
+
+    if dialect == "postgres" and format == "csv":
+        dbapi_connection = conn._get_dbapi_connection()
+
+        if not export.is_psycopg2(dbapi_connection):
+            return None
+
+        try:
+            with export.open_text_file(path, compression) as file:
+                with Interruptible(conn, timeout=timeout):
+                    return export.copy_to_file_postgres(dbapi_connection, query, file)
+        except Exception:
+            # the statement ran outside of SQLAlchemy, so we need to end the failed
+            # transaction ourselves
+            conn.session.rollback()
+            raise
+
+    return None
+
+
+def _release_cursor(conn, cursor):
+    """Returns a cursor to the DBAPI session (see DBAPISession.release_cursor)"""
+    release_cursor = getattr(conn.session, "release_cursor", None)
+
+    if release_cursor is not None:
+        release_cursor(cursor)
+
+
+def _cached_result_set(cached, statement, conn, config):
+    """Returns a ResultSet with the cached rows"""
+    if not Connection.is_dbapi_connection(conn):
+        statement = sqlalchemy.sql.text(statement)
+
+    resultset = ResultSet(cached.cursor(), config, statement, conn)
+    resultset.fetchall()
+    return resultset
+
+
 def raw_run(conn, sql):
     return conn.session.execute(sqlalchemy.sql.text(sql))
 
@@ -698,29 +1531,76 @@ def _statement_is_select(statement):
     return statement_.startswith("select") or statement_.startswith("from")
 
 
+def _to_arrow_or_none(result_set):
+    """
+    Converts the result set to an Arrow table, returns None if the data cannot be
+    represented in Arrow (e.g., a column with mixed types) so the caller can fall
+    back to the regular conversion
+    """
+    check_installed(["pyarrow"], "autoarrow")
+    import pyarrow as pa
+
+    try:
+        return result_set._to_arrow()
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None
+
+
+def _concat_arrow_chunks(chunks):
+    """
+    Concatenates the Arrow arrays that make up a column. Types are inferred for
+    each batch, so we unify them (e.g., a batch with only NULLs has type null)
+    """
+    import pyarrow as pa
+
+    types = {chunk.type for chunk in chunks if chunk.type != pa.null()}
+
+    if not types:
+        return pa.chunked_array(chunks, type=pa.null())
+
+    if len(types) == 1:
+        (type_,) = types
+        return pa.chunked_array([chunk.cast(type_) for chunk in chunks], type=type_)
+
+    # types are different across batches (e.g., int and float), let Arrow infer a
+    # type that fits all the values
+    return pa.chunked_array(
+        [pa.array([value for chunk in chunks for value in chunk.to_pylist()])]
+    )
+
+
 def _convert_to_data_frame(
     result_set, converter_name, constructor, constructor_kwargs=None
 ):
     constructor_kwargs = constructor_kwargs or {}
     has_converter_method = hasattr(result_set.sqlaproxy, converter_name)
 
-    # native duckdb connection
-    if hasattr(result_set.sqlaproxy, converter_name):
+    # native duckdb connection (if the cursor was used for another statement, the
+    # results of statements that aren't a SELECT are built from the stored rows)
+    if has_converter_method and (
+        result_set._owns_cursor() or _statement_is_select(result_set.statement)
+    ):
         # we need to re-execute the statement because if we fetched some rows
         # already, .df() will return None. But only if it's a select statement
         # otherwise we might end up re-execute INSERT INTO or CREATE TABLE
         # statements
-        is_select = _statement_is_select(result_set.statement)
-
-        if is_select:
-            result_set.sqlaproxy.execute(result_set.statement)
+        if _statement_is_select(result_set.statement):
+            with result_set._native_cursor() as cursor:
+                return getattr(cursor, converter_name)()
 
         return getattr(result_set.sqlaproxy, converter_name)()
     else:
-        frame = constructor(
-            (tuple(row) for row in result_set),
-            **constructor_kwargs,
-        )
+        if converter_name == "df":
+            # pandas can take the columns directly, so we don't have to build a
+            # tuple for each row
+            result_set.fetchall()
+            frame = constructor(dict(enumerate(result_set._results.columns())))
+            frame.columns = constructor_kwargs["columns"]
+        else:
+            frame = constructor(
+                (tuple(row) for row in result_set),
+                **constructor_kwargs,
+            )
 
         # NOTE: in JupySQL 0.7.9, we were opening a raw new connection so people
         # using SQLALchemy still had the native performance to convert to data frames
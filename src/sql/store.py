@@ -1,6 +1,5 @@
 from typing import Iterator, Iterable
 from collections.abc import MutableMapping
-from jinja2 import Template
 from ploomber_core.exceptions import modify_exceptions
 import sql.connection
 import difflib
@@ -117,6 +116,8 @@ class SQLQuery:
         We use the ' (backtick symbol) to wrap the CTE alias if the dialect supports
         ` (backtick)
         """
+        from jinja2 import Template
+
         with_clause_template = Template(
             """WITH{% for name in with_ %} {{name}} AS ({{rts(saved[name]._query)}})\
 {{ "," if not loop.last }}{% endfor %}{{query}}"""
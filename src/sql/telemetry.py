@@ -1,4 +1,22 @@
-from ploomber_core.telemetry.telemetry import Telemetry
+"""
+Anonymous usage statistics. Events are put in a bounded queue and sent in batches
+from a background thread, so logging them doesn't slow down the decorated
+functions. When telemetry is disabled, ``log_call`` returns the function unchanged
+"""
+import atexit
+import datetime
+import inspect
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from ploomber_core.telemetry.telemetry import (
+    Telemetry as _Telemetry,
+    check_telemetry_enabled,
+    get_sanitized_argv,
+)
 
 try:
     from importlib.metadata import version
@@ -6,8 +24,186 @@ except ModuleNotFoundError:
     from importlib_metadata import version
 
 
+# maximum number of events waiting to be sent (new events are dropped when full)
+QUEUE_SIZE = 1000
+
+# maximum number of events sent at once
+BATCH_SIZE = 100
+
+# number of seconds to wait for more events before sending a batch
+FLUSH_INTERVAL = 2
+
+
+class Telemetry(_Telemetry):
+    """Telemetry client that sends events from a background thread
+
+    Notes
+    -----
+    Whether telemetry is enabled is checked once, when the client is created.
+    Functions decorated with ``log_call`` while it's disabled are returned as-is,
+    and the ones that take a ``payload`` get ``None``
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enabled = check_telemetry_enabled()
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+
+        # number of events that have been queued but not sent yet
+        self._pending = 0
+        self._sent = threading.Condition()
+
+    def log_call(self, action=None, payload=False, group=None):
+        """Log function calls
+
+        Parameters
+        ----------
+        action : str, default=None
+            The action taken by the user. If None, it'll use the function's name
+
+        payload : bool, default=False
+            If True, the function is called with a ``payload`` keyword argument (a
+            dictionary, or None if telemetry is disabled), values added to it are
+            logged
+
+        group : str, default=None
+            Prefix added to the action
+        """
+
+        def _log_call(func):
+            action_ = (
+                self.package_name if group is None else f"{self.package_name}-{group}"
+            )
+            name = action or getattr(func, "__name__", "function-without-name")
+            action_ = f"{action_}-{name}".replace("_", "-")
+
+            func._telemetry = dict(action=action_, payload=payload)
+
+            if not self.enabled:
+                return func
+
+            return self._wrap(func, action_, payload)
+
+        return _log_call
+
+    def _wrap(self, func, action, payload):
+        # coroutine functions are logged once they're awaited (calling them only
+        # creates the coroutine)
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with self._logging(action, payload, kwargs):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self._logging(action, payload, kwargs):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    @contextmanager
+    def _logging(self, action, payload, kwargs):
+        """Logs the success (or error) of the call running in the block"""
+        metadata = {}
+
+        if payload:
+            kwargs["payload"] = metadata
+
+        client_time = datetime.datetime.now()
+        started_at = time.perf_counter()
+
+        try:
+            yield
+        except Exception as e:
+            metadata["type"] = getattr(e, "type_", None)
+            metadata["exception"] = str(e)
+            self._put(f"{action}-error", client_time, started_at, metadata)
+            raise
+
+        self._put(f"{action}-success", client_time, started_at, metadata)
+
+    def _put(self, action, client_time, started_at, metadata):
+        event = dict(
+            action=action,
+            client_time=client_time,
+            total_runtime=str(
+                datetime.timedelta(seconds=time.perf_counter() - started_at)
+            ),
+            metadata=metadata,
+        )
+
+        with self._sent:
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                return
+
+            self._pending += 1
+
+        if self._worker is None:
+            self._start_worker()
+
+    def _start_worker(self):
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._send_batches, name="jupysql-telemetry", daemon=True
+                )
+                self._worker.start()
+
+    def _send_batches(self):
+        while True:
+            # wait for an event, then give others some time to arrive
+            events = [self._queue.get()]
+            self._flush_requested.wait(FLUSH_INTERVAL)
+
+            while len(events) < BATCH_SIZE:
+                try:
+                    events.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._send(events)
+
+    def _send(self, events):
+        try:
+            for event in events:
+                event["metadata"] = {"argv": get_sanitized_argv(), **event["metadata"]}
+
+                # telemetry must never break the user's session
+                try:
+                    self.log_api(**event)
+                except Exception:
+                    pass
+        finally:
+            with self._sent:
+                self._pending -= len(events)
+                self._sent.notify_all()
+
+    def flush(self, timeout=None):
+        """Sends the queued events, returns True if all of them were sent before
+        the timeout
+        """
+        self._flush_requested.set()
+
+        try:
+            with self._sent:
+                return self._sent.wait_for(lambda: self._pending == 0, timeout)
+        finally:
+            self._flush_requested.clear()
+
+
 telemetry = Telemetry(
     api_key="phc_P9SpSeypyPwxrMdFn2edOOEooQioF2axppyEeDwtMSP",
     package_name="jupysql",
     version=version("jupysql"),
 )
+
+atexit.register(telemetry.flush, timeout=FLUSH_INTERVAL)
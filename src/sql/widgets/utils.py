@@ -1,5 +1,4 @@
 import re
-from jinja2 import Template
 
 
 def load_file(file_path) -> str:
@@ -20,6 +19,8 @@ def load_js(*files) -> str:
         The JS files to load.
     """
 
+    from jinja2 import Template
+
     js = ""
 
     for file in files:
@@ -2,6 +2,7 @@ from traitlets.config import Config
 import os
 import urllib.request
 from pathlib import Path
+from unittest.mock import Mock
 
 import pytest
 from IPython.core.interactiveshell import InteractiveShell
@@ -47,9 +48,30 @@ def runsql(ip_session, statements):
 def clean_conns():
     Connection.current = None
     Connection.connections = dict()
+    Connection._engines = dict()
     yield
 
 
+@pytest.fixture
+def config():
+    config = Mock()
+    config.autocommit = True
+    config.feedback = False
+    config.autopandas = False
+    config.autopolars = False
+    config.autolimit = 0
+    config.displaylimit = 10
+    config.stream_results = None
+    config.yield_per = 1000
+    config.statement_timeout = None
+    config.result_memory_limit = None
+    config.result_sets_limit = None
+    config.result_sets_memory_limit = None
+    config.autoarrow = False
+    config.style = "DEFAULT"
+    return config
+
+
 class TestingShell(InteractiveShell):
     """
     A custom InteractiveShell that raises exceptions instead of silently suppressing
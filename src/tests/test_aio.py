@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+from IPython.core.error import UsageError
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import sql
+from sql import aio
+from sql.connection import AsyncConnection, Connection
+from sql.run import ResultSet
+
+
+@pytest.fixture(params=["sqlite+aiosqlite:///my.db", "sqlite+aiosqlite://"])
+def conn(request, tmp_empty, clean_conns, config):
+    conn = Connection.from_connect_str(request.param, alias="db")
+    asyncio.run(aexecute_all(conn, config))
+    yield conn
+    conn.close()
+
+
+async def aexecute_all(conn, config):
+    await sql.aexecute("CREATE TABLE numbers (x INT)", conn=conn, config=config)
+    await sql.aexecute(
+        "INSERT INTO numbers VALUES (1), (2), (3)", conn=conn, config=config
+    )
+
+
+def test_from_connect_str_async_driver(conn):
+    assert isinstance(conn, AsyncConnection)
+    assert conn.session is None
+    assert conn.async_engine.sync_engine is conn.engine
+    assert Connection._engines == {}
+
+
+def test_aexecute(conn, config):
+    result = asyncio.run(
+        sql.aexecute("SELECT * FROM numbers ORDER BY x", conn="db", config=config)
+    )
+
+    assert isinstance(result, ResultSet)
+    assert result._done_fetching()
+    assert list(result) == [(1,), (2,), (3,)]
+    assert result.DataFrame()["x"].tolist() == [1, 2, 3]
+
+
+def test_aexecute_doesnt_keep_results_alive(conn, config):
+    n_results = len(ResultSet.LAST_BY_CONNECTION)
+
+    for _ in range(10):
+        asyncio.run(sql.aexecute("SELECT * FROM numbers", conn="db", config=config))
+
+    assert len(ResultSet.LAST_BY_CONNECTION) == n_results
+
+
+def test_aexecute_concurrently(conn, config):
+    async def main():
+        return await asyncio.gather(
+            *(
+                sql.aexecute(f"SELECT SUM(x) * {i} FROM numbers", config=config)
+                for i in range(5)
+            )
+        )
+
+    results = asyncio.run(main())
+
+    assert [list(result) for result in results] == [[(6 * i,)] for i in range(5)]
+
+
+def test_aexecute_timeout(tmp_empty, clean_conns, config, monkeypatch):
+    conn = Connection.from_connect_str("sqlite+aiosqlite:///my.db")
+
+    async def sleep(conn, sql, config):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(aio, "_aexecute", sleep)
+
+    with pytest.raises(UsageError, match="ran for more than 0.1 seconds"):
+        asyncio.run(sql.aexecute("SELECT 1", conn=conn, config=config, timeout=0.1))
+
+
+def test_aexecute_sync_connection(clean_conns, config):
+    Connection(create_engine("sqlite://"), alias="sync")
+
+    with pytest.raises(UsageError, match="doesn't use an async driver"):
+        asyncio.run(sql.aexecute("SELECT 1", conn="sync", config=config))
+
+
+def test_aexecute_unknown_connection(conn, config):
+    with pytest.raises(UsageError, match="'missing' is not a valid connection"):
+        asyncio.run(sql.aexecute("SELECT 1", conn="missing", config=config))
+
+
+def test_set_async_engine(clean_conns):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    conn = Connection.set(engine, displaycon=False, alias="db")
+
+    assert isinstance(conn, AsyncConnection)
+    assert conn.engine is engine.sync_engine
+    conn.close()
+
+
+def test_sync_query_with_async_connection(ip_empty, tmp_empty):
+    ip_empty.run_cell("%sql sqlite+aiosqlite:///my.db --alias db")
+
+    with pytest.raises(UsageError, match=r"await sql.aexecute\(query, conn='db'\)"):
+        ip_empty.run_cell("%sql SELECT 1").raise_error()
+
+    with pytest.raises(UsageError, match="uses an async driver"):
+        Connection.current.execute("SELECT 1")
+
+
+def test_aexecute_autoawait(ip_empty, tmp_empty, monkeypatch):
+    # the config is taken from the session
+    monkeypatch.setattr(aio, "get_ipython", lambda: ip_empty)
+    ip_empty.run_cell("%sql sqlite+aiosqlite:///my.db --alias db")
+    ip_empty.run_cell("import sql")
+    ip_empty.run_cell(
+        "result = await sql.aexecute('SELECT 1', conn='db')"
+    ).raise_error()
+
+    assert list(ip_empty.user_ns["result"]) == [(1,)]
+
+
+def test_aexecute_without_config(conn, monkeypatch):
+    monkeypatch.setattr(aio, "get_ipython", lambda: None)
+
+    with pytest.raises(UsageError, match="load the extension with %load_ext sql"):
+        asyncio.run(sql.aexecute("SELECT 1", conn="db"))
@@ -0,0 +1,183 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+import pytest
+from IPython.core.error import UsageError
+from sqlalchemy import create_engine
+
+from sql import background
+from sql.background import BackgroundQuery, run_in_background
+from sql.connection import Connection
+from sql.run import ResultSet, run
+
+INFINITE_QUERY = """
+WITH RECURSIVE numbers(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM numbers)
+SELECT COUNT(*) FROM numbers
+"""
+
+
+@pytest.fixture
+def conn(tmp_empty):
+    conn = Connection(create_engine("sqlite:///my.db"))
+    conn.execute("CREATE TABLE numbers (x INT)")
+    conn.execute("INSERT INTO numbers VALUES (1), (2), (3)")
+    yield conn
+    Connection.close_all()
+
+
+@pytest.fixture
+def single_worker(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(background, "_executor", executor)
+    yield
+    executor.shutdown()
+
+
+def test_run_in_background(conn, config):
+    query = run_in_background(conn, "SELECT * FROM numbers", config)
+    result = query.result(timeout=10)
+
+    assert isinstance(query, BackgroundQuery)
+    assert isinstance(result, ResultSet)
+    assert result._done_fetching()
+    assert list(result) == [(1,), (2,), (3,)]
+    assert query.status == "finished"
+    assert query.done()
+    assert query.elapsed > 0
+    assert "<table>" in query._repr_html_()
+
+
+def test_failed_query(conn, config):
+    query = run_in_background(conn, "SELECT * FROM missing", config)
+
+    with pytest.raises(Exception, match="no such table"):
+        query.result(timeout=10)
+
+    assert query.status == "failed"
+    assert "no such table" in str(query.exception())
+    assert "failed" in repr(query)
+
+
+def test_waits_for_queries_on_the_same_connection(conn, config, single_worker):
+    with conn._lock:
+        running = run_in_background(conn, "SELECT * FROM numbers", config)
+        pending = run_in_background(conn, "SELECT * FROM numbers", config)
+
+        # the first one is waiting for the connection
+        with pytest.raises(TimeoutError):
+            running.result(timeout=0.1)
+
+        assert running.status == "running"
+        assert pending.status == "pending"
+        assert pending.cancel()
+
+    assert len(running.result(timeout=10)) == 3
+    assert pending.status == "cancelled"
+    assert pending.exception() is None
+
+
+def test_cancel_query_waiting_for_the_connection(conn, config, monkeypatch):
+    interrupt = Mock(return_value=True)
+    monkeypatch.setattr(conn, "interrupt", interrupt)
+
+    with conn._lock:
+        query = run_in_background(conn, "SELECT * FROM numbers", config)
+
+        while query.status != "running":
+            time.sleep(0.01)
+
+        assert query.cancel()
+
+        # the query holding the connection isn't interrupted
+        interrupt.assert_not_called()
+
+    with pytest.raises(UsageError, match="The query was cancelled"):
+        query.result(timeout=10)
+
+    assert query.status == "cancelled"
+
+
+def test_execute_waits_for_background_queries(conn, config):
+    events = []
+
+    def fetchall(self):
+        events.append("fetching")
+        time.sleep(0.2)
+        events.append("fetched")
+
+    with patch.object(ResultSet, "fetchall", fetchall):
+        query = run_in_background(conn, "SELECT * FROM numbers", config)
+
+        while "fetching" not in events:
+            time.sleep(0.01)
+
+        conn.execute("SELECT 1")
+        events.append("executed")
+
+    query.result(timeout=10)
+    assert events == ["fetching", "fetched", "executed"]
+
+
+def test_fetching_waits_for_background_queries(conn, config):
+    result = run(conn, "SELECT * FROM numbers", config)
+
+    with conn._lock:
+        thread = threading.Thread(target=result.fetchall)
+        thread.start()
+        thread.join(0.1)
+
+        assert thread.is_alive()
+
+    thread.join(10)
+    assert list(result) == [(1,), (2,), (3,)]
+
+
+def test_cancel_running_query(conn, config):
+    query = run_in_background(conn, INFINITE_QUERY, config)
+
+    while query.status != "running":
+        time.sleep(0.01)
+
+    # wait for the statement to start
+    time.sleep(0.1)
+
+    assert query.cancel()
+
+    with pytest.raises(UsageError, match="The query was cancelled"):
+        query.result(timeout=10)
+
+    assert query.status == "cancelled"
+
+
+def test_timeout(conn, config):
+    query = run_in_background(conn, INFINITE_QUERY, config, timeout=0.1)
+
+    with pytest.raises(UsageError, match="ran for more than 0.1 seconds"):
+        query.result(timeout=10)
+
+    assert query.status == "failed"
+
+
+def test_updates_display_when_done(conn, config, monkeypatch):
+    handle = Mock()
+    monkeypatch.setattr(background, "display", Mock(return_value=handle))
+    event = threading.Event()
+
+    with conn._lock:
+        query = run_in_background(conn, "SELECT * FROM numbers", config)
+        query._future.add_done_callback(lambda _: event.set())
+        query._ipython_display_()
+
+    event.wait(timeout=10)
+
+    handle.update.assert_called()
+    assert "<table>" in handle.update.call_args[0][0].data
+
+
+def test_thread_bound_connection(config):
+    conn = Connection(create_engine("sqlite://"))
+
+    with pytest.raises(UsageError, match="can only be used from the thread"):
+        run_in_background(conn, "SELECT 1", config)
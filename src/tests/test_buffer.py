@@ -0,0 +1,194 @@
+from array import array
+from pathlib import Path
+
+import pyarrow as pa
+import pytest
+
+from sql.buffer import ColumnarBuffer, ObjectColumn, TypedColumn, SpilledChunk
+
+
+@pytest.fixture
+def buffer():
+    buffer = ColumnarBuffer()
+    buffer.extend([(1, 1.5, "a"), (2, 2.5, "b")])
+    buffer.extend([(3, None, "c")])
+    buffer.extend([(4, 4.5, None), (5, 5.5, "e")])
+    return buffer
+
+
+def test_len(buffer):
+    assert len(buffer) == 5
+
+
+def test_iter(buffer):
+    assert list(buffer) == [
+        (1, 1.5, "a"),
+        (2, 2.5, "b"),
+        (3, None, "c"),
+        (4, 4.5, None),
+        (5, 5.5, "e"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "key, expected",
+    [
+        [0, (1, 1.5, "a")],
+        [2, (3, None, "c")],
+        [4, (5, 5.5, "e")],
+        [-1, (5, 5.5, "e")],
+        [slice(1, 4), [(2, 2.5, "b"), (3, None, "c"), (4, 4.5, None)]],
+        [slice(3, None), [(4, 4.5, None), (5, 5.5, "e")]],
+        [slice(None, 2), [(1, 1.5, "a"), (2, 2.5, "b")]],
+        [slice(None, None, 2), [(1, 1.5, "a"), (3, None, "c"), (5, 5.5, "e")]],
+        [slice(10, 20), []],
+    ],
+)
+def test_getitem(buffer, key, expected):
+    assert buffer[key] == expected
+
+
+def test_getitem_out_of_range(buffer):
+    with pytest.raises(IndexError):
+        buffer[5]
+
+
+def test_getitem_invalid_key(buffer):
+    with pytest.raises(TypeError):
+        buffer["a"]
+
+
+def test_eq(buffer):
+    assert buffer == list(buffer)
+    assert buffer != [(1, 1.5, "a")]
+    assert ColumnarBuffer() == []
+
+
+def test_stores_typed_columns():
+    buffer = ColumnarBuffer()
+    buffer.extend([(1, 1.5, "a", True), (None, 2.5, "b", False)])
+
+    ints, floats, strings, bools = buffer._chunks[0].columns
+
+    assert isinstance(ints, TypedColumn)
+    assert ints.values.typecode == "q"
+    assert ints.mask == bytearray([0, 1])
+    assert isinstance(floats, TypedColumn)
+    assert floats.values.typecode == "d"
+    assert floats.mask is None
+    assert isinstance(strings, ObjectColumn)
+    assert isinstance(bools, ObjectColumn)
+    assert list(buffer) == [(1, 1.5, "a", True), (None, 2.5, "b", False)]
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [1, "one"],
+        [1, 1.5],
+        [2**64, 1],
+    ],
+    ids=[
+        "mixed",
+        "int-and-float",
+        "overflow",
+    ],
+)
+def test_falls_back_to_objects(values):
+    buffer = ColumnarBuffer()
+    buffer.extend([(value,) for value in values])
+
+    assert isinstance(buffer._chunks[0].columns[0], ObjectColumn)
+    assert list(buffer) == [(value,) for value in values]
+
+
+def test_columns(buffer):
+    assert buffer.columns() == [
+        array("q", [1, 2, 3, 4, 5]),
+        [1.5, 2.5, None, 4.5, 5.5],
+        ["a", "b", "c", None, "e"],
+    ]
+
+
+def test_columns_empty():
+    assert ColumnarBuffer().columns() == []
+
+
+def test_iter_column_batches(buffer):
+    assert list(buffer.iter_column_batches(1))[:3] == [
+        [[1], [1.5], ["a"]],
+        [[2], [2.5], ["b"]],
+        [[3], [None], ["c"]],
+    ]
+    assert list(buffer.iter_column_batches(2)) == [
+        [[1, 2], [1.5, 2.5], ["a", "b"]],
+        [[3], [None], ["c"]],
+        [[4, 5], [4.5, 5.5], [None, "e"]],
+    ]
+
+
+def test_rows_without_columns():
+    buffer = ColumnarBuffer()
+    buffer.extend([(), ()])
+
+    assert list(buffer) == [(), ()]
+    assert buffer[1:] == [()]
+
+
+def test_nbytes():
+    buffer = ColumnarBuffer()
+    buffer.extend([(i, float(i)) for i in range(1000)])
+
+    assert buffer.nbytes == 16_000
+
+
+def test_spills_to_disk(tmp_empty):
+    buffer = ColumnarBuffer(memory_limit=20_000, spill_directory=tmp_empty)
+
+    for start in range(0, 5000, 1000):
+        buffer.extend([(i, f"row {i}", None) for i in range(start, start + 1000)])
+
+    spilled = [chunk for chunk in buffer._chunks if isinstance(chunk, SpilledChunk)]
+
+    assert buffer.nbytes <= 20_000
+    assert buffer.n_spilled == len(spilled) > 0
+    assert len(list(Path(tmp_empty).glob("*.arrow"))) == len(spilled)
+
+    assert len(buffer) == 5000
+    assert list(buffer) == [(i, f"row {i}", None) for i in range(5000)]
+    assert buffer[1234] == (1234, "row 1234", None)
+    assert buffer[998:1002] == [(i, f"row {i}", None) for i in range(998, 1002)]
+    assert list(buffer.column(0)) == list(range(5000))
+
+    table = pa.Table.from_batches(
+        [
+            pa.record_batch(batch, names=["x", "label", "empty"])
+            for batch in buffer.iter_arrow_batches(1000)
+        ]
+    )
+    assert table.column("x").to_pylist() == list(range(5000))
+
+    buffer.clear()
+
+    assert list(Path(tmp_empty).glob("*.arrow")) == []
+    assert list(buffer) == []
+
+
+def test_keeps_chunk_in_memory_if_it_cannot_be_spilled(tmp_empty):
+    buffer = ColumnarBuffer(memory_limit=1, spill_directory=tmp_empty)
+    buffer.extend([(1,), ("one",)])
+
+    assert buffer.n_spilled == 0
+    assert list(buffer) == [(1,), ("one",)]
+
+
+def test_deletes_spilled_files_when_garbage_collected(tmp_empty):
+    buffer = ColumnarBuffer(memory_limit=1, spill_directory=tmp_empty)
+    buffer.extend([(1,), (2,)])
+    list(buffer)
+
+    assert len(list(Path(tmp_empty).glob("*.arrow"))) == 1
+
+    del buffer
+
+    assert list(Path(tmp_empty).glob("*.arrow")) == []
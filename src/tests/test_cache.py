@@ -0,0 +1,96 @@
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from sql.cache import QueryCache, cache_key, normalize_statement
+
+
+@pytest.mark.parametrize(
+    "statement, expected",
+    [
+        ["select * from numbers", "SELECT * FROM numbers"],
+        ["SELECT  *\n  FROM numbers\n", "SELECT * FROM numbers"],
+        ["SELECT 1; SELECT 2", "SELECT 1;\nSELECT 2"],
+        ["this is not  sql", "this is not sql"],
+    ],
+)
+def test_normalize_statement(statement, expected):
+    assert normalize_statement(statement) == expected
+
+
+def test_cache_key():
+    conn = Mock()
+    conn.url = "sqlite://"
+    conn.alias = "db"
+    conn._get_curr_sqlglot_dialect.return_value = "sqlite"
+    config = Mock()
+    config.autolimit = 10
+
+    assert cache_key(conn, "select 1", config) == (("sqlite://", "db"), "SELECT 1", 10)
+
+
+def test_get_and_put():
+    cache = QueryCache()
+    cache.put(("conn", "SELECT 1"), keys=["x"], rows=[(1,), (2,)])
+
+    entry = cache.get(("conn", "SELECT 1"))
+    cursor = entry.cursor()
+
+    assert entry.keys == ["x"]
+    assert cursor.keys() == ["x"]
+    assert cursor.fetchmany(1) == [(1,)]
+    assert cursor.fetchall() == [(2,)]
+    assert cursor.fetchall() == []
+    assert cache.get(("conn", "SELECT 2")) is None
+
+
+def test_ttl(monkeypatch):
+    cache = QueryCache()
+    cache.put(("conn", "SELECT 1"), keys=["x"], rows=[(1,)])
+    now = time.monotonic()
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 5)
+    assert cache.get(("conn", "SELECT 1"), ttl=10) is not None
+    assert cache.get(("conn", "SELECT 1"), ttl=0) is not None
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert cache.get(("conn", "SELECT 1"), ttl=10) is None
+    assert ("conn", "SELECT 1") not in cache
+
+
+def test_evicts_least_recently_used():
+    cache = QueryCache()
+    rows = [(i,) for i in range(100)]
+
+    cache.put(("conn", "first"), keys=["x"], rows=rows, max_bytes=2000)
+    cache.put(("conn", "second"), keys=["x"], rows=rows, max_bytes=2000)
+    cache.get(("conn", "first"))
+    cache.put(("conn", "third"), keys=["x"], rows=rows, max_bytes=2000)
+
+    assert ("conn", "first") in cache
+    assert ("conn", "second") not in cache
+    assert ("conn", "third") in cache
+    assert cache.nbytes == 1600
+
+
+def test_does_not_cache_results_over_max_bytes():
+    cache = QueryCache()
+    cache.put(("conn", "SELECT 1"), keys=["x"], rows=[(i,) for i in range(100)])
+    cache.put(
+        ("conn", "SELECT 1"), keys=["x"], rows=[(i,) for i in range(100)], max_bytes=1
+    )
+
+    assert len(cache) == 0
+
+
+def test_invalidate():
+    cache = QueryCache()
+    cache.put(("first", "SELECT 1"), keys=["x"], rows=[(1,)])
+    cache.put(("first", "SELECT 2"), keys=["x"], rows=[(2,)])
+    cache.put(("second", "SELECT 1"), keys=["x"], rows=[(1,)])
+
+    cache.invalidate("first")
+
+    assert len(cache) == 1
+    assert ("second", "SELECT 1") in cache
@@ -1,9 +1,13 @@
+from collections import ChainMap
 from pathlib import Path
+from unittest.mock import Mock
 from IPython.core.error import UsageError
 
 import pytest
+from jinja2 import Template
 from sqlalchemy import create_engine
 
+from sql import command
 from sql.command import SQLCommand
 
 
@@ -171,6 +175,14 @@ def test_args(ip, sql_magic):
         "save": None,
         "with_": ["author_one"],
         "no_execute": False,
+        "stream": False,
+        "cache": False,
+        "background": False,
+        "timeout": None,
+        "parallel": None,
+        "on": None,
+        "params": False,
+        "output": None,
     }
 
 
@@ -229,6 +241,74 @@ def test_variable_substitution_double_curly_line_magic(ip, sql_magic):
     assert cmd.parsed["sql"] == "SELECT first_name FROM author LIMIT 5;"
 
 
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT 1",
+        "SELECT 1\n",
+        "SELECT 1\r\nFROM t\n\n",
+        "SELECT 1\rFROM t",
+        "SELECT {{x}}\n",
+        "SELECT 1 {# comment #}",
+        "{% for i in range(2) %}SELECT {{i + x}};{% endfor %}",
+    ],
+)
+def test_var_expand_same_as_jinja(ip, sql_magic, sql):
+    cmd = SQLCommand(sql_magic, ip.user_ns, line="", cell="")
+
+    assert cmd._var_expand(sql, {"x": 1}, sql_magic) == Template(sql).render(x=1)
+
+
+def test_var_expand_skips_jinja_and_caches_templates(ip, sql_magic, monkeypatch):
+    cmd = SQLCommand(sql_magic, ip.user_ns, line="", cell="")
+    command._compile_template.cache_clear()
+    compile_template = Mock(wraps=command._compile_template)
+    monkeypatch.setattr(command, "_compile_template", compile_template)
+
+    cmd._var_expand("SELECT 1", {}, sql_magic)
+    cmd._var_expand("SELECT {{x}}", {"x": 1}, sql_magic)
+    cmd._var_expand("SELECT {{x}}", {"x": 2}, sql_magic)
+    info = compile_template.cache_info()
+
+    assert compile_template.call_count == 2
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_var_expand_only_passes_used_variables(ip, sql_magic, monkeypatch):
+    cmd = SQLCommand(sql_magic, ip.user_ns, line="", cell="")
+    render, variables = Template.render, []
+
+    def render_and_record(self, **kwargs):
+        variables.append(kwargs)
+        return render(self, **kwargs)
+
+    monkeypatch.setattr(Template, "render", render_and_record)
+
+    sql = cmd._var_expand("SELECT {{x}}", {"x": 1, "y": 2}, sql_magic)
+
+    assert sql == "SELECT 1"
+    assert variables == [{"x": 1}]
+
+
+def test_var_expand_doesnt_modify_namespace(ip, sql_magic):
+    cmd = SQLCommand(sql_magic, ip.user_ns, line="", cell="")
+    user_ns = ChainMap({"x": 1}, {"x": 2, "y": 3})
+
+    sql = cmd._var_expand("{% set z = x + y %}SELECT {{z}}", user_ns, sql_magic)
+
+    assert sql == "SELECT 4"
+    assert user_ns == {"x": 1, "y": 3}
+
+
+def test_local_variables_take_precedence(ip, sql_magic):
+    ip.user_global_ns["x"] = 1
+    sql_magic.execute("sqlite://")
+
+    result = sql_magic.execute("SELECT {{x}}", local_ns={"x": 2})
+
+    assert list(result) == [(2,)]
+
+
 def test_with_contains_dash_show_warning_message(ip, sql_magic, capsys):
     with pytest.raises(UsageError) as error:
         ip.run_cell_magic(
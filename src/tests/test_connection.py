@@ -6,7 +6,7 @@ from sqlalchemy.engine import Engine
 from sqlalchemy.exc import ResourceClosedError
 
 import sql.connection
-from sql.connection import Connection, DBAPIConnection
+from sql.connection import Connection, DBAPIConnection, ResultSetRegistry
 from IPython.core.error import UsageError
 import sqlglot
 import sqlalchemy
@@ -17,6 +17,7 @@ import sqlite3
 def cleanup():
     yield
     Connection.connections = {}
+    Connection._engines = {}
 
 
 @pytest.fixture
@@ -284,6 +285,7 @@ def test_get_connections():
             "current": True,
             "alias": None,
             "key": "duckdb://",
+            "pool": "QueuePool: 1 checked out, 0 idle (size: 5, overflow: 0)",
             "connection": ANY,
         },
         {
@@ -291,6 +293,7 @@ def test_get_connections():
             "current": False,
             "alias": None,
             "key": "sqlite://",
+            "pool": "SingletonThreadPool",
             "connection": ANY,
         },
     ]
@@ -309,8 +312,16 @@ def test_connections_table():
     Connection(engine=create_engine("duckdb://"))
 
     connections = Connection.connections_table()
-    assert connections._headers == ["current", "url", "alias"]
-    assert connections._rows == [["*", "duckdb://", ""], ["", "sqlite://", ""]]
+    assert connections._headers == ["current", "url", "alias", "pool"]
+    assert connections._rows == [
+        [
+            "*",
+            "duckdb://",
+            "",
+            "QueuePool: 1 checked out, 0 idle (size: 5, overflow: 0)",
+        ],
+        ["", "sqlite://", "", "SingletonThreadPool"],
+    ]
 
 
 def test_properties(mock_postgres):
@@ -401,3 +412,262 @@ def test_new_connection_with_alias(ip_empty, old_alias, new_alias):
         assert connection
         assert connection.url == "duckdb://"
         assert connection == connection.current
+
+
+def _mock_result_set(nbytes=0):
+    result_set = Mock()
+    result_set.nbytes = nbytes
+    return result_set
+
+
+def test_result_set_registry_evicts_least_recently_used():
+    registry = ResultSetRegistry()
+    first, second, third = [_mock_result_set() for _ in range(3)]
+
+    for result_set in [first, second, third]:
+        registry.add(result_set)
+
+    registry.touch(first)
+    registry.evict(max_size=2)
+
+    assert list(registry) == [third, first]
+    second.close.assert_called_once_with()
+    first.close.assert_not_called()
+
+
+def test_result_set_registry_evicts_by_bytes():
+    registry = ResultSetRegistry()
+    first, second, third = [_mock_result_set(nbytes=100) for _ in range(3)]
+
+    for result_set in [first, second, third]:
+        registry.add(result_set)
+
+    registry.evict(max_bytes=250)
+
+    assert list(registry) == [second, third]
+    assert registry.nbytes == 200
+    first.close.assert_called_once_with()
+
+
+def test_result_set_registry_keeps_most_recent():
+    registry = ResultSetRegistry()
+    first, second = _mock_result_set(nbytes=100), _mock_result_set(nbytes=1000)
+    registry.add(first)
+    registry.add(second)
+
+    registry.evict(max_size=1, max_bytes=10)
+
+    assert list(registry) == [second]
+    second.close.assert_not_called()
+
+
+@pytest.mark.parametrize("max_size, max_bytes", [(None, None), (0, 0)])
+def test_result_set_registry_no_limit(max_size, max_bytes):
+    registry = ResultSetRegistry()
+    result_sets = [_mock_result_set(nbytes=100) for _ in range(3)]
+
+    for result_set in result_sets:
+        registry.add(result_set)
+
+    registry.evict(max_size=max_size, max_bytes=max_bytes)
+
+    assert list(registry) == result_sets
+
+
+def test_from_connect_str_shares_engine(cleanup, tmp_empty):
+    first = Connection.from_connect_str("sqlite:///my.db", alias="first")
+    second = Connection.from_connect_str("sqlite:///my.db", alias="second")
+    other = Connection.from_connect_str(
+        "sqlite:///my.db", connect_args={"timeout": 10}, alias="other"
+    )
+
+    assert first.engine is second.engine
+    assert other.engine is not first.engine
+    assert "shared by 2 connections" in first._pool_stats()
+
+
+def test_from_connect_str_doesnt_share_thread_bound_engine(cleanup):
+    first = Connection.from_connect_str("sqlite://", alias="first")
+    second = Connection.from_connect_str("sqlite://", alias="second")
+
+    assert first.engine is not second.engine
+
+
+def test_from_connect_str_pool_options(cleanup, tmp_empty):
+    conn = Connection.from_connect_str(
+        "sqlite:///my.db",
+        connect_args={"timeout": 10, "pool_size": 2},
+        pool_options={"pool_size": 3, "max_overflow": 0, "pool_pre_ping": True},
+    )
+
+    assert conn.connect_args == {"timeout": 10}
+    assert conn.engine.pool.size() == 2
+    assert conn.engine.pool._max_overflow == 0
+    assert conn.engine.pool._pre_ping
+
+
+def test_from_connect_str_invalid_pool_options(cleanup):
+    with pytest.raises(UsageError, match="max_overflow"):
+        Connection.from_connect_str("sqlite://", pool_options={"max_overflow": 1})
+
+
+def test_close_disposes_engine_once_unused(cleanup, tmp_empty, monkeypatch):
+    first = Connection.from_connect_str("sqlite:///my.db", alias="first")
+    Connection.from_connect_str("sqlite:///my.db", alias="second")
+    dispose = Mock()
+    monkeypatch.setattr(first.engine, "dispose", dispose)
+
+    Connection.close_connection_with_descriptor("first")
+    dispose.assert_not_called()
+
+    Connection.close_connection_with_descriptor("second")
+    dispose.assert_called_once_with()
+    assert Connection._engines == {}
+
+
+def test_transpile_query_cache(cleanup, monkeypatch):
+    conn = Connection(engine=create_engine("sqlite://"))
+    sql.connection._transpile.cache_clear()
+    parse_one = Mock(wraps=sqlglot.parse_one)
+    monkeypatch.setattr(sqlglot, "parse_one", parse_one)
+
+    first = conn._transpile_query("SELECT * FROM some_table LIMIT 3")
+    second = conn._transpile_query("SELECT * FROM some_table LIMIT 3")
+    info = sql.connection.transpile_cache_info()
+
+    assert first == second == "SELECT * FROM some_table LIMIT 3"
+    assert parse_one.call_count == 1
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_transpile_query_cache_by_dialect(cleanup):
+    sqlite = Connection(engine=create_engine("sqlite://"))
+    duckdb = Connection(engine=create_engine("duckdb://"))
+    sql.connection._transpile.cache_clear()
+
+    sqlite._transpile_query("SELECT x::INT FROM t")
+    duckdb._transpile_query("SELECT x::INT FROM t")
+
+    assert sql.connection.transpile_cache_info().misses == 2
+
+
+def test_transpile_query_invalid(cleanup):
+    conn = Connection(engine=create_engine("sqlite://"))
+
+    assert conn._transpile_query("SELECT * FROM (") == "SELECT * FROM ("
+
+
+def test_transpile_query_unknown_dialect(clean_conns):
+    conn = DBAPIConnection(sqlite3.connect(""))
+    sql.connection._transpile.cache_clear()
+
+    assert conn._transpile_query("SELECT  1") == "SELECT  1"
+    assert sql.connection.transpile_cache_info().currsize == 0
+
+
+def test_dialect_info_is_memoized(cleanup, monkeypatch):
+    conn = Connection(engine=create_engine("duckdb://"))
+    get_or_raise = Mock(wraps=sqlglot.Dialect.get_or_raise)
+    monkeypatch.setattr(sqlglot.Dialect, "get_or_raise", get_or_raise)
+
+    for _ in range(3):
+        assert conn._get_curr_sqlglot_dialect() == "duckdb"
+        assert conn._get_curr_sqlalchemy_connection_info()["dialect"] == "duckdb"
+        assert not conn.is_use_backtick_template()
+        assert set(conn.get_curr_identifiers()) == {"", '"'}
+
+    assert get_or_raise.call_count == 2
+
+
+def test_memoized_values_are_copied(cleanup):
+    conn = Connection(engine=create_engine("duckdb://"))
+
+    conn.get_curr_identifiers().append("`")
+    conn._get_curr_sqlalchemy_connection_info()["dialect"] = "changed"
+
+    assert "`" not in conn.get_curr_identifiers()
+    assert conn._get_curr_sqlalchemy_connection_info()["dialect"] == "duckdb"
+
+
+def test_memoized_values_are_recomputed_if_session_changes(cleanup):
+    conn = Connection(engine=create_engine("duckdb://"))
+    assert conn._get_curr_sqlglot_dialect() == "duckdb"
+
+    conn.session = create_engine("sqlite://").connect()
+
+    assert conn._get_curr_sqlglot_dialect() == "sqlite"
+
+
+def test_dbapi_session_reuses_cursor(clean_conns):
+    conn = DBAPIConnection(sqlite3.connect(""))
+
+    first = conn.session.execute("CREATE TABLE numbers (x INTEGER)")
+    second = conn.session.execute("INSERT INTO numbers VALUES (1), (2)")
+
+    assert first is second
+    assert conn.session.n_open_cursors == 1
+
+
+def test_dbapi_session_release_cursor(clean_conns):
+    conn = DBAPIConnection(sqlite3.connect(""))
+
+    first = conn.session.execute("SELECT 1")
+    second = conn.session.execute("SELECT 2")
+    assert first is not second
+    assert conn.session.n_open_cursors == 2
+
+    assert conn.session.release_cursor(first)
+    assert conn.session.is_idle(first, conn.session.execution_id(first))
+    assert conn.session.release_cursor(second)
+    assert conn.session.n_open_cursors == 1
+
+    # the idle cursor is used for the next statement
+    execution_id = conn.session.execution_id(first)
+    assert conn.session.execute("SELECT 3") is first
+    assert not conn.session.release_cursor(Mock())
+
+    # it's idle again, but it has the results of another statement
+    assert conn.session.release_cursor(first)
+    assert not conn.session.is_idle(first, execution_id)
+
+
+def test_dbapi_session_close_closes_cursors(clean_conns):
+    conn = DBAPIConnection(sqlite3.connect(""))
+    cursor = conn.session.execute("SELECT 1")
+
+    conn.session.close()
+
+    assert conn.session.n_open_cursors == 0
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        cursor.fetchall()
+
+
+def test_dbapi_session_releases_cursor_on_error(clean_conns):
+    conn = DBAPIConnection(sqlite3.connect(""))
+
+    with pytest.raises(sqlite3.OperationalError):
+        conn.session.execute("SELECT * FROM missing")
+
+    assert conn.session.n_open_cursors == 1
+    assert conn.session.execute("SELECT 1").fetchall() == [(1,)]
+
+
+def test_dbapi_session_temporary_tables_duckdb(clean_conns):
+    import duckdb
+
+    conn = DBAPIConnection(duckdb.connect())
+
+    cursor = conn.session.execute("CREATE TEMP TABLE numbers AS SELECT 1 AS x")
+    conn.session.release_cursor(cursor)
+    results = conn.session.execute("SELECT * FROM numbers")
+
+    assert results.fetchall() == [(1,)]
+
+
+def test_dbapi_connection_pool_stats(clean_conns):
+    conn = DBAPIConnection(sqlite3.connect(""))
+    assert conn._pool_stats() == "0 open cursors"
+
+    conn.session.execute("SELECT 1")
+    assert conn._pool_stats() == "1 open cursor"
@@ -0,0 +1,115 @@
+from io import StringIO
+from unittest.mock import Mock
+
+import pytest
+from IPython.core.error import UsageError
+
+from sql import export
+
+
+@pytest.mark.parametrize(
+    "path, format, compression",
+    [
+        ["data.csv", "csv", None],
+        ["data.csv.gz", "csv", "gzip"],
+        ["data.CSV.ZST", "csv", "zstd"],
+        ["data.parquet", "parquet", None],
+        ["data.pq", "parquet", None],
+        ["data.arrow", "arrow", None],
+        ["data.feather", "arrow", None],
+    ],
+)
+def test_format_from_path(path, format, compression):
+    assert export.format_from_path(path) == format
+    assert export.compression_from_path(path) == compression
+
+
+@pytest.mark.parametrize(
+    "path, message",
+    [
+        ["data.txt", "unsupported extension"],
+        ["data.gz", "unsupported extension"],
+        ["data.parquet.gz", "only CSV files can be compressed"],
+    ],
+)
+def test_format_from_path_error(path, message):
+    with pytest.raises(UsageError, match=message):
+        export.format_from_path(path)
+
+
+@pytest.mark.parametrize(
+    "args, expected",
+    [
+        [
+            ("SELECT * FROM t;", "t.parquet"),
+            "COPY (SELECT * FROM t) TO 't.parquet' (FORMAT PARQUET)",
+        ],
+        [
+            ("SELECT * FROM t", "t.csv", "csv"),
+            "COPY (SELECT * FROM t) TO 't.csv' (FORMAT CSV, HEADER)",
+        ],
+        [
+            ("SELECT * FROM t", "t.csv.zst", "csv", "zstd"),
+            "COPY (SELECT * FROM t) TO 't.csv.zst' "
+            "(FORMAT CSV, HEADER, COMPRESSION 'zstd')",
+        ],
+        [
+            ("SELECT * FROM t", "it's.csv", "csv"),
+            "COPY (SELECT * FROM t) TO 'it''s.csv' (FORMAT CSV, HEADER)",
+        ],
+    ],
+)
+def test_copy_statement(args, expected):
+    assert export.copy_statement(*args) == expected
+
+
+def test_copy_to_stdout_statement():
+    assert (
+        export.copy_to_stdout_statement("SELECT * FROM t;")
+        == "COPY (SELECT * FROM t) TO STDOUT WITH (FORMAT CSV, HEADER)"
+    )
+
+
+def test_write_csv():
+    file = StringIO()
+    progress = Mock()
+
+    n_rows = export.write_csv(
+        [[(1, "a")], [(2, "b"), (3, None)]], ["x", "y"], file, progress=progress
+    )
+
+    assert n_rows == 3
+    assert file.getvalue() == "x,y\r\n1,a\r\n2,b\r\n3,\r\n"
+    assert [call.args for call in progress.add.call_args_list] == [(1,), (2,)]
+
+
+def test_unsupported_compression(tmp_empty):
+    with pytest.raises(UsageError, match="Unsupported compression: 'bz2'"):
+        export.open_text_file("data.csv", "bz2")
+
+
+def test_progress(monkeypatch):
+    message = Mock()
+    monkeypatch.setattr(export.display, "UpdatableMessage", Mock(return_value=message))
+    progress = export.Progress("data.csv", interval=0)
+
+    progress.add(10)
+    progress.add(5)
+    progress.done()
+
+    assert progress.n_rows == 15
+    assert message.show.call_count == 3
+    assert "Writing data.csv: 10 rows" in message.show.call_args_list[0].args[0]
+    assert "Wrote 15 rows to data.csv" in message.show.call_args_list[-1].args[0]
+
+
+def test_progress_interval(monkeypatch):
+    message = Mock()
+    monkeypatch.setattr(export.display, "UpdatableMessage", Mock(return_value=message))
+    progress = export.Progress("data.csv", interval=60)
+
+    progress.add(10)
+    progress.done(20)
+
+    assert message.show.call_count == 1
+    assert "Wrote 20 rows to data.csv" in message.show.call_args.args[0]
@@ -0,0 +1,142 @@
+import threading
+
+import pandas as pd
+import pytest
+from IPython.core.error import UsageError
+from sqlalchemy import create_engine
+
+from sql import fanout
+from sql.connection import Connection
+from sql.fanout import FanOutResult, run_on
+from sql.run import ResultSet
+
+
+@pytest.fixture
+def shards(tmp_empty, clean_conns):
+    for i, alias in enumerate(["first", "second", "memory"]):
+        url = "sqlite://" if alias == "memory" else f"sqlite:///{alias}.db"
+        conn = Connection(create_engine(url), alias=alias)
+        conn.execute("CREATE TABLE numbers (x INT)")
+        conn.execute(f"INSERT INTO numbers VALUES ({i}), ({i + 10})")
+
+    yield
+    Connection.close_all()
+
+
+def test_run_on(shards, config):
+    result = run_on(["first", "second", "memory"], "SELECT * FROM numbers", config)
+
+    assert isinstance(result, FanOutResult)
+    assert isinstance(result.result, ResultSet)
+    assert result.result.keys == ["source", "x"]
+    assert list(result.result) == [
+        ("first", 0),
+        ("first", 10),
+        ("second", 1),
+        ("second", 11),
+        ("memory", 2),
+        ("memory", 12),
+    ]
+    assert list(result.timings) == ["first", "second", "memory"]
+    assert result.errors == {}
+    assert "second (" in repr(result)
+    assert "<table>" in result._repr_html_()
+
+
+def test_run_on_comma_separated(shards, config):
+    result = run_on("second, first, second", "SELECT SUM(x) FROM numbers", config)
+
+    assert list(result.result) == [("second", 12), ("first", 10)]
+
+
+def test_run_on_runs_concurrently(shards, config, monkeypatch):
+    barrier = threading.Barrier(2, timeout=10)
+    run = fanout.run
+
+    def wait_then_run(*args, **kwargs):
+        barrier.wait()
+        return run(*args, **kwargs)
+
+    monkeypatch.setattr(fanout, "run", wait_then_run)
+
+    result = run_on(["first", "second"], "SELECT COUNT(*) FROM numbers", config)
+
+    assert result.errors == {}
+
+
+def test_run_on_errors(shards, config):
+    Connection.connections["second"].execute("DROP TABLE numbers")
+    Connection.connections["memory"].execute("CREATE TABLE other (y INT)")
+
+    result = run_on(["first", "second", "memory"], "SELECT * FROM numbers", config)
+
+    assert list(result.result) == [
+        ("first", 0),
+        ("first", 10),
+        ("memory", 2),
+        ("memory", 12),
+    ]
+    assert list(result.errors) == ["second"]
+    assert "no such table" in str(result.errors["second"])
+    assert "second failed" in repr(result)
+
+
+def test_run_on_columns_dont_match(shards, config):
+    Connection.connections["second"].execute("ALTER TABLE numbers RENAME x TO y")
+
+    result = run_on(["first", "second"], "SELECT * FROM numbers", config)
+
+    assert list(result.result) == [("first", 0), ("first", 10)]
+    assert "The columns (y) don't match" in str(result.errors["second"])
+
+
+def test_run_on_fails_on_all_connections(shards, config):
+    with pytest.raises(UsageError, match="failed on all connections"):
+        run_on(["first", "second"], "SELECT * FROM missing", config)
+
+
+def test_run_on_missing_alias(shards, config):
+    with pytest.raises(UsageError, match="'third': connections not found"):
+        run_on(["first", "third"], "SELECT 1", config)
+
+
+def test_run_on_autopandas(shards, config):
+    config.autopandas = True
+
+    result = run_on(["first", "second"], "SELECT MAX(x) AS x FROM numbers", config)
+
+    assert isinstance(result.result, pd.DataFrame)
+    assert result.result.to_dict("list") == {
+        "source": ["first", "second"],
+        "x": [10, 11],
+    }
+
+
+def test_magic_on(ip_empty, tmp_empty):
+    ip_empty.run_cell("%sql sqlite:///first.db --alias first")
+    ip_empty.run_cell("%sql sqlite:///second.db --alias second")
+    ip_empty.run_cell("%sql CREATE TABLE numbers AS SELECT 1 AS x")
+
+    result = ip_empty.run_cell(
+        "%sql --on first,second SELECT name FROM sqlite_master"
+    ).result
+
+    assert list(result.result) == [("second", "numbers")]
+    assert list(result.timings) == ["first", "second"]
+
+
+def test_magic_on_background(ip_empty):
+    ip_empty.run_cell("%sql sqlite:// --alias first")
+
+    with pytest.raises(UsageError, match="--on cannot be used with --background"):
+        ip_empty.run_cell("%sql --on first --background SELECT 1").raise_error()
+
+
+def test_run_on_config_from_session(shards, ip_empty, monkeypatch):
+    monkeypatch.setattr(
+        fanout, "_get_config", lambda: ip_empty.magics_manager.registry["SqlMagic"]
+    )
+
+    result = run_on("first", "SELECT COUNT(*) FROM numbers")
+
+    assert list(result.result) == [("first", 2)]
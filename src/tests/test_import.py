@@ -0,0 +1,25 @@
+import json
+import subprocess
+import sys
+
+
+def test_import_doesnt_load_optional_dependencies():
+    script = "import json, sys; import sql; print(json.dumps(sorted(sys.modules)))"
+    out = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout
+    loaded = json.loads(out.splitlines()[-1])
+    modules = {name.split(".")[0] for name in loaded}
+
+    assert "sqlalchemy.ext.asyncio" not in loaded
+    assert not modules & {
+        "matplotlib",
+        "numpy",
+        "pandas",
+        "polars",
+        "pyarrow",
+        "sqlglot",
+        "jinja2",
+        "ipywidgets",
+        "pgspecial",
+    }
@@ -0,0 +1,202 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+
+from sql import interact
+from sql.connection import Connection
+from sql.interact import InteractiveQuery
+
+
+def shown(query):
+    return [output["data"]["text/plain"] for output in query.output.outputs]
+
+
+async def wait_for(condition, timeout=5):
+    started_at = time.monotonic()
+
+    while not condition():
+        if time.monotonic() - started_at > timeout:
+            raise TimeoutError("Timed out waiting for the condition")
+
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def executed():
+    return []
+
+
+@pytest.fixture
+def execute(executed):
+    def execute(x):
+        executed.append(x)
+        return x * 10
+
+    return execute
+
+
+def test_caches_outputs_by_value(clean_conns, executed, execute):
+    query = InteractiveQuery(execute)
+
+    for x in [1, 2, 1, 2]:
+        query.update(x=x)
+
+    assert executed == [1, 2]
+    assert shown(query) == ["20"]
+
+
+def test_evicts_least_recently_used(clean_conns, executed, execute):
+    query = InteractiveQuery(execute, cache_size=2)
+
+    for x in [1, 2, 1, 3, 1, 2]:
+        query.update(x=x)
+
+    assert executed == [1, 2, 3, 2]
+    assert list(query._cache) == [(("x", 1),), (("x", 2),)]
+
+
+def test_unhashable_values_are_not_cached(clean_conns):
+    executed = []
+    query = InteractiveQuery(lambda x: executed.append(x))
+
+    query.update(x=[1])
+    query.update(x=[1])
+
+    assert executed == [[1], [1]]
+
+
+def test_errors_are_shown_and_not_cached(clean_conns):
+    calls = []
+
+    def execute(x):
+        calls.append(x)
+        raise ValueError("something went wrong")
+
+    query = InteractiveQuery(execute)
+
+    query.update(x=1)
+    query.update(x=1)
+
+    assert calls == [1, 1]
+    assert query.output.outputs == (
+        {
+            "output_type": "stream",
+            "name": "stderr",
+            "text": "ValueError: something went wrong\n",
+        },
+    )
+
+
+def test_debounces_changes(clean_conns, executed, execute):
+    query = InteractiveQuery(execute, debounce=0.05)
+
+    async def main():
+        for x in range(10):
+            query.update(x=x)
+
+        await wait_for(lambda: shown(query))
+
+    asyncio.run(main())
+
+    assert executed == [9]
+    assert shown(query) == ["90"]
+
+
+def test_cached_values_are_shown_without_waiting(clean_conns, executed, execute):
+    query = InteractiveQuery(execute, debounce=10)
+    query._cache[(("x", 1),)] = interact._to_output(10)
+
+    async def main():
+        query.update(x=1)
+
+    asyncio.run(main())
+
+    assert executed == []
+    assert shown(query) == ["10"]
+
+
+def test_interrupts_superseded_queries(tmp_empty, clean_conns, monkeypatch):
+    Connection(create_engine("sqlite:///my.db"))
+    started, interrupted = threading.Event(), threading.Event()
+    monkeypatch.setattr(
+        Connection.current, "interrupt", lambda: interrupted.set() or True
+    )
+
+    def execute(x):
+        assert threading.current_thread() is not threading.main_thread()
+
+        if x == 1:
+            started.set()
+            assert interrupted.wait(5)
+            raise RuntimeError("interrupted")
+
+        return x
+
+    query = InteractiveQuery(execute, debounce=0.01)
+
+    async def main():
+        query.update(x=1)
+        await wait_for(started.is_set)
+        query.update(x=2)
+        await wait_for(lambda: shown(query))
+
+    asyncio.run(main())
+
+    assert interrupted.is_set()
+    assert shown(query) == ["2"]
+    assert list(query._cache) == [(("x", 2),)]
+
+
+def test_thread_bound_connections_run_in_the_main_thread(clean_conns):
+    Connection(create_engine("sqlite://"))
+    threads = []
+
+    def execute(x):
+        threads.append(threading.current_thread())
+        return x
+
+    query = InteractiveQuery(execute, debounce=0.01)
+
+    async def main():
+        query.update(x=1)
+        await wait_for(lambda: shown(query))
+
+    asyncio.run(main())
+
+    assert threads == [threading.main_thread()]
+
+
+def test_interact_magic(ip, monkeypatch):
+    displayed = []
+    monkeypatch.setattr(interact, "display", displayed.append)
+    ip.user_global_ns["limit"] = 1
+
+    ip.run_cell(
+        "%sql --interact limit SELECT * FROM author LIMIT {{limit}}"
+    ).raise_error()
+
+    controls, output = displayed[0].children
+    (result,) = output.outputs
+    assert "William" in result["data"]["text/plain"]
+    assert "Bertold" not in result["data"]["text/plain"]
+
+
+def test_interact_magic_uses_the_query_connection(ip, tmp_empty, monkeypatch):
+    displayed = []
+    monkeypatch.setattr(interact, "display", displayed.append)
+    ip.run_cell("%sql sqlite:///other.db --alias other").raise_error()
+    ip.run_cell("%sql CREATE TABLE numbers AS SELECT 42 AS x").raise_error()
+    ip.run_cell("%sql sqlite://").raise_error()
+    ip.user_global_ns["limit"] = 1
+
+    ip.run_cell(
+        "%%sql other --interact limit\nSELECT * FROM numbers LIMIT {{limit}}"
+    ).raise_error()
+
+    controls, output = displayed[0].children
+    query = controls.f.__self__
+    assert query.conn is Connection.connections["other"]
+    assert "42" in output.outputs[0]["data"]["text/plain"]
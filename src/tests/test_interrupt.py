@@ -0,0 +1,94 @@
+import os
+import signal
+import sqlite3
+import threading
+from unittest.mock import Mock
+
+import pytest
+from IPython.core.error import UsageError
+from sqlalchemy import create_engine
+
+from sql.connection import Connection, DBAPIConnection
+from sql.interrupt import Interruptible
+
+INFINITE_QUERY = """
+WITH RECURSIVE numbers(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM numbers)
+SELECT COUNT(*) FROM numbers
+"""
+
+
+@pytest.fixture
+def conn():
+    conn = Connection(create_engine("sqlite://"))
+    yield conn
+    conn.close()
+
+
+def test_timeout_sqlite(conn):
+    with pytest.raises(UsageError, match="ran for more than 0.1 seconds"):
+        with Interruptible(conn, timeout=0.1):
+            conn.execute(INFINITE_QUERY)
+
+    # the progress handler is removed and the connection can still be used
+    assert conn._get_dbapi_connection().execute("SELECT 1").fetchall() == [(1,)]
+    assert list(conn.execute("SELECT 1")) == [(1,)]
+
+
+def test_timeout_not_exceeded(conn):
+    with Interruptible(conn, timeout=10) as interruptible:
+        result = list(conn.execute("SELECT 1"))
+
+    assert result == [(1,)]
+    assert not interruptible.timed_out
+
+
+def test_timeout_interrupts_from_timer():
+    interrupted = threading.Event()
+    conn = Mock()
+    conn._get_dbapi_connection.return_value = object()
+    conn.interrupt.side_effect = interrupted.set
+
+    with pytest.raises(UsageError, match="ran for more than 0.1 seconds"):
+        with Interruptible(conn, timeout=0.1):
+            interrupted.wait(timeout=10)
+            raise ValueError("interrupted")
+
+    conn.interrupt.assert_called_once_with()
+
+
+def test_keyboard_interrupt(conn):
+    handler = signal.getsignal(signal.SIGINT)
+    timer = threading.Timer(0.1, os.kill, args=(os.getpid(), signal.SIGINT))
+    timer.start()
+
+    with pytest.raises(KeyboardInterrupt):
+        with Interruptible(conn):
+            conn.execute(INFINITE_QUERY)
+
+    timer.join()
+
+    assert signal.getsignal(signal.SIGINT) is handler
+    assert list(conn.execute("SELECT 1")) == [(1,)]
+
+
+def test_timeout_dbapi_connection(clean_conns):
+    conn = DBAPIConnection(sqlite3.connect(""))
+
+    with pytest.raises(UsageError, match="ran for more than 0.1 seconds"):
+        with Interruptible(conn, timeout=0.1):
+            conn.session.execute(INFINITE_QUERY)
+
+
+def test_interrupt_dbapi_connection(clean_conns):
+    connection = Mock(spec=sqlite3.Connection)
+    conn = DBAPIConnection(connection)
+
+    assert conn.interrupt()
+    connection.interrupt.assert_called_once_with()
+
+
+def test_interrupt_unsupported(clean_conns):
+    conn = DBAPIConnection(object())
+
+    assert conn._get_interrupt() is None
+    assert not conn.interrupt()
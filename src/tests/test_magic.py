@@ -1,3 +1,4 @@
+import gzip
 import logging
 import platform
 import sqlite3
@@ -7,16 +8,21 @@ import re
 import sys
 import tempfile
 from textwrap import dedent
-from unittest.mock import patch
+from unittest.mock import patch, Mock
 
 import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+import zstandard
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from IPython.core.error import UsageError
 from sql.connection import Connection
 from sql.magic import SqlMagic
-from sql.run import ResultSet
-from sql import magic
+from sql.run import ResultSet, StreamingResultSet
+import sql.cache
+import sql.run
+from sql.background import BackgroundQuery
 
 from conftest import runsql
 from sql.connection import PLOOMBER_DOCS_LINK_STR
@@ -205,10 +211,10 @@ def test_duplicate_column_names_accepted(ip):
 
 
 def test_persist_missing_pandas(ip, monkeypatch):
-    monkeypatch.setattr(magic, "DataFrame", None)
-
     ip.run_cell("results = %sql SELECT * FROM test;")
     ip.run_cell("results_dframe = results.DataFrame()")
+    monkeypatch.setitem(sys.modules, "pandas", None)
+
     result = ip.run_cell("%sql --persist sqlite:// results_dframe")
     assert "pip install pandas" in str(result.error_in_exec)
 
@@ -525,6 +531,32 @@ def test_connection_args_single_quotes(ip):
     assert "timeout" in result.result["sqlite:///:memory:"].connect_args
 
 
+def test_connection_args_pool_options(ip_empty, tmp_empty, clean_conns):
+    ip_empty.run_cell("%config SqlMagic.pool_options = {'pool_size': 2}")
+    ip_empty.run_cell(
+        """%sql --connection_arguments '{"max_overflow": 1}' sqlite:///my.db"""
+    )
+    ip_empty.run_cell(
+        """%sql --connection_arguments '{"max_overflow": 1}' sqlite:///my.db """
+        "--alias another"
+    )
+    table = ip_empty.run_cell("%sql --connections").result
+    conn = table["sqlite:///my.db"]
+
+    assert conn.connect_args == {}
+    assert conn.engine is table["another"].engine
+    assert conn.engine.pool.size() == 2
+    assert conn.engine.pool._max_overflow == 1
+    assert "shared by 2 connections" in str(table)
+
+
+def test_pool_options_invalid(ip, caplog):
+    with caplog.at_level(logging.ERROR):
+        ip.run_cell("%config SqlMagic.pool_options = {'size': 2}")
+
+    assert "size: invalid pool options" in caplog.text
+
+
 # TODO: support
 # @with_setup(_setup_author, _teardown_author)
 # def test_persist_with_connection_info():
@@ -574,6 +606,377 @@ def test_displaylimit(ip):
     assert "Shakespeare" not in repr(result)
 
 
+def test_stream(ip):
+    ip.run_line_magic("config", "SqlMagic.autopandas = True")
+    ip.run_line_magic("config", "SqlMagic.displaylimit = 2")
+    result = ip.run_cell("%sql --stream SELECT * FROM number_table;").result
+
+    assert isinstance(result, StreamingResultSet)
+    assert "Truncated to displaylimit of 2" in result._repr_html_()
+    assert [row for row in result] == [
+        (4, -2),
+        (-5, 0),
+        (2, 4),
+        (0, 2),
+        (-5, -1),
+        (-2, -3),
+        (-2, -3),
+        (-4, 2),
+        (2, -5),
+        (4, 3),
+    ]
+    assert result._results == [(4, -2), (-5, 0)]
+
+
+@pytest.fixture
+def query_cache():
+    sql.cache.query_cache.clear()
+    yield sql.cache.query_cache
+    sql.cache.query_cache.clear()
+
+
+def test_cache(ip, query_cache):
+    query = "SELECT * FROM test ORDER BY n"
+    first = ip.run_cell(f"%sql --cache {query}").result
+    # insert a row without going through %sql, so the cache isn't invalidated
+    Connection.current.session.execute(text("INSERT INTO test VALUES (3, 'baz')"))
+    second = ip.run_cell("%%sql --cache\nselect *  from test\norder by n").result
+    third = ip.run_cell(f"%sql {query}").result
+
+    assert len(query_cache) == 1
+    assert list(first) == list(second) == [(1, "foo"), (2, "bar")]
+    assert second.keys == ["n", "name"]
+    assert list(third) == [(1, "foo"), (2, "bar"), (3, "baz")]
+
+
+def test_cached_results_are_not_executed_again_on_duckdb(
+    ip_empty, query_cache, clean_conns
+):
+    ip_empty.run_cell("%sql duckdb://")
+    executed = []
+    event.listen(
+        Connection.current.engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: executed.append(statement),
+    )
+
+    ip_empty.run_cell("%sql --cache SELECT 1 AS x")
+    cached = ip_empty.run_cell("%sql --cache SELECT 1 AS x").result
+    ip_empty.run_cell("%sql SELECT 2 AS y")
+    executed.clear()
+
+    assert cached.DataFrame().to_dict() == {"x": {0: 1}}
+    assert list(cached) == [(1,)]
+    assert executed == []
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "INSERT INTO test VALUES (3, 'baz')",
+        "CREATE TABLE another (n INT)",
+    ],
+)
+def test_cache_is_invalidated(ip, query_cache, statement):
+    ip.run_cell("%sql --cache SELECT * FROM test")
+    ip.run_cell(f"%sql {statement}")
+
+    assert len(query_cache) == 0
+
+
+def test_cache_with_autopandas(ip, query_cache):
+    ip.run_line_magic("config", "SqlMagic.autopandas = True")
+    ip.run_cell("%sql --cache SELECT * FROM test")
+    df = ip.run_cell("%sql --cache SELECT * FROM test").result
+
+    assert list(df["name"]) == ["foo", "bar"]
+
+
+def test_cache_and_stream(ip):
+    out = ip.run_cell("%sql --cache --stream SELECT * FROM test")
+
+    assert isinstance(out.error_in_exec, UsageError)
+    assert "--stream and --cache cannot be used together" in str(out.error_in_exec)
+
+
+@pytest.fixture
+def ip_duckdb(ip_empty):
+    ip_empty.run_cell("%sql duckdb://")
+    ip_empty.run_cell("%sql CREATE TABLE numbers AS SELECT * FROM range(3) t(x)")
+    yield ip_empty
+    Connection.close_all()
+
+
+def test_background(ip_duckdb):
+    query = ip_duckdb.run_cell("%sql --background SELECT * FROM numbers").result
+
+    assert isinstance(query, BackgroundQuery)
+    assert list(query.result(timeout=10)) == [(0,), (1,), (2,)]
+
+
+def test_background_result_var(ip_duckdb):
+    ip_duckdb.run_cell("%%sql query << --background\nSELECT * FROM numbers")
+
+    query = ip_duckdb.user_global_ns["query"]
+
+    assert isinstance(query, BackgroundQuery)
+    assert list(query.result(timeout=10)) == [(0,), (1,), (2,)]
+
+
+def test_background_in_memory_sqlite(ip):
+    out = ip.run_cell("%sql --background SELECT * FROM test")
+
+    assert isinstance(out.error_in_exec, UsageError)
+
+
+def test_background_and_stream(ip):
+    out = ip.run_cell("%sql --background --stream SELECT * FROM test")
+
+    assert isinstance(out.error_in_exec, UsageError)
+    assert "--background and --stream cannot be used together" in str(out.error_in_exec)
+
+
+def test_output(ip, tmp_empty, capsys):
+    ip.run_cell("%sql --output numbers.parquet SELECT * FROM test")
+
+    assert pq.read_table("numbers.parquet").to_pydict() == {
+        "n": [1, 2],
+        "name": ["foo", "bar"],
+    }
+    assert "Wrote 2 rows to numbers.parquet" in capsys.readouterr().out
+
+
+def test_output_arrow_ipc(ip, tmp_empty):
+    ip.run_cell("%sql --output numbers.arrow SELECT * FROM test")
+
+    table = pa.ipc.open_file("numbers.arrow").read_all()
+    assert table.to_pydict() == {"n": [1, 2], "name": ["foo", "bar"]}
+
+
+def test_output_uses_copy_in_duckdb(ip_duckdb, tmp_empty, monkeypatch):
+    monkeypatch.setattr(
+        sql.run.ResultSet, "_to_file", Mock(side_effect=AssertionError("not COPY"))
+    )
+
+    ip_duckdb.run_cell("%sql --output numbers.parquet SELECT * FROM numbers")
+
+    assert pq.read_table("numbers.parquet").to_pydict() == {"x": [0, 1, 2]}
+
+
+@pytest.mark.parametrize(
+    "path, read",
+    [
+        ["numbers.parquet", lambda path: pq.read_table(path).to_pydict()["x"]],
+        ["numbers.csv", lambda path: Path(path).read_text().split()[1:]],
+    ],
+)
+def test_output_copy_uses_autolimit(ip_duckdb, tmp_empty, monkeypatch, path, read):
+    for method in ["_to_file", "_csv_to_file"]:
+        monkeypatch.setattr(
+            sql.run.ResultSet, method, Mock(side_effect=AssertionError("not COPY"))
+        )
+
+    ip_duckdb.run_cell("%config SqlMagic.autolimit = 2")
+    ip_duckdb.run_cell(
+        f"%sql --output {path} SELECT * FROM numbers; -- comment"
+    ).raise_error()
+
+    assert [int(x) for x in read(path)] == [0, 1]
+
+
+def test_output_csv(ip, tmp_empty, capsys):
+    ip.run_cell("%sql --output numbers.csv.gz SELECT * FROM test")
+
+    with gzip.open("numbers.csv.gz", "rt") as f:
+        assert f.read() == "n,name\n1,foo\n2,bar\n"
+
+    assert "Wrote 2 rows to numbers.csv.gz" in capsys.readouterr().out
+
+
+def test_output_csv_uses_copy_in_duckdb(ip_duckdb, tmp_empty, monkeypatch):
+    monkeypatch.setattr(
+        sql.run.ResultSet, "_csv_to_file", Mock(side_effect=AssertionError("not COPY"))
+    )
+
+    ip_duckdb.run_cell("%sql --output numbers.csv.zst SELECT * FROM numbers")
+
+    with zstandard.open("numbers.csv.zst", "rt") as f:
+        assert f.read() == "x\n0\n1\n2\n"
+
+
+def test_output_unsupported_extension(ip, tmp_empty):
+    out = ip.run_cell("%sql --output numbers.txt SELECT * FROM test")
+
+    assert isinstance(out.error_in_exec, UsageError)
+    assert "unsupported extension" in str(out.error_in_exec)
+
+
+INFINITE_QUERY = (
+    "WITH RECURSIVE numbers(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM numbers) "
+    "SELECT COUNT(*) FROM numbers"
+)
+
+
+def test_timeout(ip):
+    out = ip.run_cell(f"%sql --timeout 0.1 {INFINITE_QUERY}")
+
+    assert isinstance(out.error_in_exec, UsageError)
+    assert "ran for more than 0.1 seconds" in str(out.error_in_exec)
+    assert ip.run_cell("%sql SELECT * FROM test").result == [(1, "foo"), (2, "bar")]
+
+
+# returns the first rows right away, but the next one never (note that sqlite3
+# fetches one row ahead)
+SLOW_ROWS_QUERY = (
+    "WITH RECURSIVE numbers(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM numbers) "
+    "SELECT x FROM numbers WHERE x <= {n} OR x > 1000000000000 LIMIT 10"
+)
+
+
+def test_timeout_fetching_first_rows(ip):
+    out = ip.run_cell(f"%sql --timeout 0.1 {SLOW_ROWS_QUERY.format(n=1)}")
+
+    assert isinstance(out.error_in_exec, UsageError)
+    assert "ran for more than 0.1 seconds" in str(out.error_in_exec)
+
+
+def test_timeout_fetching_remaining_rows(ip):
+    ip.run_cell(
+        f"result = %sql --timeout 0.1 {SLOW_ROWS_QUERY.format(n=3)}"
+    ).raise_error()
+
+    # fetching the rest of the rows gets the whole timeout
+    with pytest.raises(UsageError, match="ran for more than 0.1 seconds"):
+        ip.user_ns["result"].fetchall()
+
+
+def test_statement_timeout(ip):
+    ip.run_cell("%config SqlMagic.statement_timeout = 0.1")
+    out = ip.run_cell(f"%sql {INFINITE_QUERY}")
+
+    assert isinstance(out.error_in_exec, UsageError)
+    assert "ran for more than 0.1 seconds" in str(out.error_in_exec)
+
+
+def test_statement_timeout_negative(ip, caplog):
+    with caplog.at_level(logging.ERROR):
+        ip.run_cell("%config SqlMagic.statement_timeout = -1")
+
+    assert "statement_timeout cannot be negative" in caplog.text
+
+
+def test_persist_duckdb(ip_duckdb):
+    ip_duckdb.run_cell("import pandas as pd")
+    ip_duckdb.run_cell("df = pd.DataFrame({'x': [1, 2], 'y': ['a', None]})")
+
+    ip_duckdb.run_cell("%sql --persist df --no-index")
+    ip_duckdb.run_cell("%sql --append df --no-index")
+    out = ip_duckdb.run_cell("%sql --persist df --no-index")
+    result = ip_duckdb.run_cell("%sql SELECT * FROM df").result
+
+    assert "already exists" in str(out.error_in_exec)
+    assert list(result) == [(1, "a"), (2, None), (1, "a"), (2, None)]
+
+
+@pytest.mark.parametrize(
+    "frame",
+    [
+        "pl.DataFrame({'x': [1, 2]})",
+        "pl.DataFrame({'x': [1, 2]}).lazy()",
+        "pa.table({'x': [1, 2]})",
+    ],
+)
+@pytest.mark.parametrize("url", ["sqlite://", "duckdb://"])
+def test_persist_arrow(ip_empty, clean_conns, frame, url):
+    ip_empty.run_cell(f"%sql {url}")
+    ip_empty.run_cell("import polars as pl, pyarrow as pa")
+    ip_empty.run_cell(f"df = {frame}")
+
+    ip_empty.run_cell("%sql --persist df")
+    ip_empty.run_cell("%sql --append df")
+    result = ip_empty.run_cell("%sql SELECT * FROM df").result
+
+    assert list(result) == [(1,), (2,), (1,), (2,)]
+
+
+@pytest.mark.parametrize("url", ["sqlite://", "duckdb://"])
+def test_persist_arrow_error(ip_empty, clean_conns, url):
+    ip_empty.run_cell(f"%sql {url}")
+    ip_empty.run_cell(
+        """
+import pyarrow as pa
+
+def batches():
+    raise pa.ArrowInvalid("Invalid batch")
+    yield
+
+df = pa.RecordBatchReader.from_batches(pa.schema([("x", pa.int64())]), batches())
+"""
+    )
+
+    out = ip_empty.run_cell("%sql --persist df")
+
+    assert "Invalid batch" in str(out.error_in_exec)
+    assert "already exists" not in str(out.error_in_exec)
+
+
+def test_persist_parallel(ip_empty, tmp_empty, clean_conns):
+    ip_empty.run_cell("%sql duckdb:///my.db")
+    ip_empty.run_cell("import pandas as pd")
+    ip_empty.run_cell("df = pd.DataFrame({'x': range(10)})")
+    ip_empty.run_cell("%config SqlMagic.persist_chunksize = 3")
+
+    ip_empty.run_cell("%sql --persist df --no-index --parallel 2")
+    ip_empty.run_cell("%sql --append df --no-index --parallel 2")
+    result = ip_empty.run_cell("%sql SELECT COUNT(*), SUM(x) FROM df").result
+
+    assert list(result) == [(20, 90)]
+
+
+@pytest.mark.parametrize(
+    "cell, message",
+    [
+        ("%sql --persist df --parallel 0", "--parallel must be a positive integer"),
+        ("%sql --persist df --parallel 2", "Use a database stored in a file instead"),
+    ],
+)
+def test_persist_parallel_error(ip, cell, message):
+    ip.run_cell("import pandas as pd")
+    ip.run_cell("df = pd.DataFrame({'x': range(3)})")
+
+    out = ip.run_cell(cell)
+
+    assert isinstance(out.error_in_exec, UsageError)
+    assert message in str(out.error_in_exec)
+
+
+@pytest.mark.parametrize("method", ["multi", "insert"])
+def test_persist_method(ip, method):
+    ip.run_cell(f"%config SqlMagic.persist_method = '{method}'")
+    ip.run_cell("%config SqlMagic.persist_chunksize = 1")
+    ip.run_cell("results = %sql SELECT * FROM test;")
+    ip.run_cell("results_dframe = results.DataFrame()")
+
+    ip.run_cell("%sql --persist sqlite:// results_dframe --no-index")
+    persisted = runsql(ip, "SELECT * FROM results_dframe")
+
+    assert persisted == [(1, "foo"), (2, "bar")]
+
+
+@pytest.mark.parametrize(
+    "option, value, message",
+    [
+        ("persist_method", "'copy'", "persist_method must be one of"),
+        ("persist_chunksize", "0", "persist_chunksize must be positive"),
+    ],
+)
+def test_persist_config_invalid(ip, caplog, option, value, message):
+    with caplog.at_level(logging.ERROR):
+        ip.run_cell(f"%config SqlMagic.{option} = {value}")
+
+    assert message in caplog.text
+
+
 @pytest.mark.parametrize("config_value, expected_length", [(3, 3), (6, 6)])
 def test_displaylimit_enabled_truncated_length(ip, config_value, expected_length):
     # Insert extra data to make number_table bigger (over 10 to see truncated string)
@@ -700,6 +1103,41 @@ def test_autopolars(ip):
     assert dframe["name"][0] == "foo"
 
 
+@pytest.mark.parametrize("autoconfig", ["autopandas", "autopolars"])
+def test_autoarrow(ip, autoconfig):
+    ip.run_line_magic("config", f"SqlMagic.{autoconfig} = True")
+    ip.run_line_magic("config", "SqlMagic.autoarrow = True")
+    dframe = runsql(ip, "SELECT * FROM test;")
+
+    assert list(dframe["n"]) == [1, 2]
+    assert list(dframe["name"]) == ["foo", "bar"]
+
+
+def test_autoarrow_infers_schema_from_all_rows(ip):
+    ip.run_line_magic("config", "SqlMagic.autopolars = True")
+    ip.run_line_magic("config", "SqlMagic.autoarrow = True")
+    sql = ["CREATE TABLE test_autoarrow_schema (n INT, name TEXT)"]
+    for i in range(100):
+        sql.append(f"INSERT INTO test_autoarrow_schema VALUES ({i}, NULL)")
+    sql.append("INSERT INTO test_autoarrow_schema VALUES (100, 'foo')")
+    runsql(ip, sql)
+
+    dframe = runsql(ip, "SELECT * FROM test_autoarrow_schema;")
+
+    assert dframe.schema == {"n": pl.Int64, "name": pl.Utf8}
+
+
+def test_result_memory_limit(ip, tmp_empty, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", tmp_empty)
+    ip.run_line_magic("config", "SqlMagic.result_memory_limit = 1")
+
+    result = runsql(ip, "SELECT * FROM test;")
+
+    assert result._results.n_spilled == 1
+    assert len(list(Path(tmp_empty).glob("*.arrow"))) == 1
+    assert list(result) == [(1, "foo"), (2, "bar")]
+
+
 def test_autopolars_infer_schema_length(ip):
     """Test for `SqlMagic.polars_dataframe_kwargs = {"infer_schema_length": None}`
     Without this config, polars will raise an exception when it cannot infer the
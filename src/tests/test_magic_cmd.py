@@ -10,9 +10,8 @@ from sql.store import store
 from sql.inspect import _is_numeric
 from sql.display import Table, Message
 
-
 VALID_COMMANDS_MESSAGE = (
-    "Valid commands are: tables, " "columns, test, profile, explore, snippets"
+    "Valid commands are: tables, " "columns, test, profile, explore, snippets, results"
 )
 
 
@@ -585,3 +584,25 @@ def test_delete_invalid_snippet(arg, ip_snippets):
         str(out.error_in_exec) == "No such saved snippet found "
         ": non_existent_snippet"
     )
+
+
+def test_results(ip_empty):
+    ip_empty.run_cell("%sql sqlite://")
+    ip_empty.run_cell("%sql CREATE TABLE numbers AS SELECT 1 AS n UNION SELECT 2")
+    ip_empty.run_cell("res = %sql SELECT * FROM numbers")
+    ip_empty.run_cell(
+        "%sql SELECT n, 'a very long string to make the query long' FROM numbers"
+    )
+
+    out = str(ip_empty.run_cell("%sqlcmd results").result)
+
+    assert "SELECT * FROM numbers" in out
+    assert "SELECT n, 'a very long string to make the query..." in out
+    assert out.index("a very long") < out.index("SELECT * FROM numbers")
+
+
+def test_results_empty(ip_empty):
+    out = ip_empty.run_cell("%sqlcmd results").result
+
+    assert isinstance(out, Message)
+    assert str(out) == "No result sets stored"
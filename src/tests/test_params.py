@@ -0,0 +1,146 @@
+import sqlite3
+
+import duckdb
+import pytest
+from IPython.core.error import UsageError
+from sqlalchemy import create_engine, event
+
+from sql import params
+from sql.connection import Connection, DBAPIConnection
+from sql.params import PreparedStatement, get_parameters, prepare
+
+
+def test_get_parameters():
+    sql = "SELECT * FROM t WHERE x BETWEEN :low AND :high"
+
+    parameters = get_parameters(sql, {"low": 1, "high": 10, "other": 2})
+
+    assert parameters == {"low": 1, "high": 10}
+
+
+def test_get_parameters_ignores_casts_and_strings_without_placeholders():
+    assert get_parameters("SELECT '1'::int, x FROM t", {}) == {}
+
+
+def test_get_parameters_missing_variables():
+    with pytest.raises(UsageError, match="Cannot bind 'low', 'high' since they are"):
+        get_parameters("SELECT * FROM t WHERE x BETWEEN :low AND :high", {})
+
+
+@pytest.mark.parametrize(
+    "paramstyle, statement, values",
+    [
+        ("qmark", "SELECT ? + ?, ?", (1, 2, 1)),
+        ("named", "SELECT :x + :y, :x", {"x": 1, "y": 2}),
+        ("pyformat", "SELECT %(x)s + %(y)s, %(x)s", {"x": 1, "y": 2}),
+    ],
+)
+def test_prepared_statement(paramstyle, statement, values):
+    prepared = PreparedStatement("SELECT :x + :y, :x", paramstyle)
+
+    assert prepared.statement == statement
+    assert prepared.bind({"x": 1, "y": 2, "z": 3}) == values
+
+
+def test_prepare_caches_statements_per_connection(clean_conns, monkeypatch):
+    monkeypatch.setattr(params, "STATEMENT_CACHE_SIZE", 2)
+    conn = Connection(create_engine("sqlite://"))
+    other = Connection(create_engine("sqlite://"))
+
+    first = prepare(conn, "SELECT :x")
+    prepare(conn, "SELECT :y")
+
+    assert prepare(conn, "SELECT :x") is first
+    assert prepare(other, "SELECT :x") is not first
+
+    # the least recently used statement is evicted
+    prepare(conn, "SELECT :z")
+    assert list(conn._prepared_statements) == ["SELECT :x", "SELECT :z"]
+
+
+@pytest.fixture
+def executed(ip_empty, clean_conns):
+    ip_empty.run_cell("%sql sqlite://")
+    executed = []
+
+    event.listen(
+        Connection.current.engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, parameters, context, executemany: (
+            executed.append((statement, parameters))
+        ),
+    )
+
+    return executed
+
+
+def test_params(ip_empty, executed):
+    for x in range(3):
+        ip_empty.user_global_ns["x"] = x
+        result = ip_empty.run_cell("%sql --params SELECT :x + 1 AS y").result
+        assert list(result) == [(x + 1,)]
+
+    assert executed == [("SELECT ? + 1 AS y", (x,)) for x in range(3)]
+    assert len(Connection.current._prepared_statements) == 1
+
+
+def test_params_values_are_not_rendered(ip_empty, executed):
+    ip_empty.user_global_ns["name"] = "O'Reilly"
+
+    result = ip_empty.run_cell("%sql --params SELECT :name AS name").result
+
+    assert list(result) == [("O'Reilly",)]
+    assert executed == [("SELECT ? AS name", ("O'Reilly",))]
+
+
+def test_params_local_variables(ip_empty, executed):
+    ip_empty.user_global_ns["x"] = 1
+    magic = ip_empty.magics_manager.registry["SqlMagic"]
+
+    result = magic.execute("--params SELECT :x", local_ns={"x": 2})
+
+    assert list(result) == [(2,)]
+
+
+def test_params_multiple_statements(ip_empty, clean_conns):
+    ip_empty.user_global_ns["x"] = 1
+    ip_empty.user_global_ns["y"] = 2
+    ip_empty.run_cell("%sql sqlite://")
+
+    result = ip_empty.run_cell(
+        "%%sql --params\nCREATE TABLE t AS SELECT :x AS x;\nSELECT x + :y FROM t"
+    ).result
+
+    assert list(result) == [(3,)]
+
+
+@pytest.mark.parametrize(
+    "connect", [lambda: sqlite3.connect(""), duckdb.connect], ids=["sqlite", "duckdb"]
+)
+def test_params_dbapi_connection(ip_empty, connect):
+    ip_empty.user_global_ns["conn"] = connect()
+    ip_empty.user_global_ns["low"] = 2
+    ip_empty.run_cell("%sql conn")
+    ip_empty.run_cell("%sql CREATE TABLE numbers (x INT)")
+    ip_empty.run_cell("%sql INSERT INTO numbers VALUES (1), (2), (3)")
+
+    result = ip_empty.run_cell(
+        "%sql --params SELECT x FROM numbers WHERE x >= :low ORDER BY x"
+    ).result
+
+    assert isinstance(Connection.current, DBAPIConnection)
+    assert list(result) == [(2,), (3,)]
+
+
+def test_params_missing_variable(ip_empty):
+    ip_empty.run_cell("%sql sqlite://")
+
+    with pytest.raises(UsageError, match="Cannot bind 'missing' since it is not"):
+        ip_empty.run_cell("%sql --params SELECT :missing").raise_error()
+
+
+def test_params_with_cache(ip_empty):
+    ip_empty.run_cell("%sql sqlite://")
+
+    with pytest.raises(UsageError, match="--params cannot be used with --on"):
+        ip_empty.run_cell("%sql --params --cache SELECT 1").raise_error()
@@ -9,6 +9,7 @@ from sql.parse import (
     parse,
     without_sql_comment,
     magic_args,
+    _parse_argstring,
 )
 
 try:
@@ -247,6 +248,14 @@ def complete_with_defaults(mapping):
         "connection_arguments": None,
         "file": None,
         "interact": None,
+        "stream": False,
+        "cache": False,
+        "background": False,
+        "timeout": None,
+        "parallel": None,
+        "on": None,
+        "params": False,
+        "output": None,
         "save": None,
         "with_": None,
         "no_execute": False,
@@ -278,3 +287,18 @@ def test_magic_args(ip, line, expected):
     args = magic_args(sql_line, line)
 
     assert args.__dict__ == complete_with_defaults(expected)
+
+
+def test_magic_args_are_cached(ip):
+    sql_line = ip.magics_manager.lsmagic()["line"]["sql"]
+    _parse_argstring.cache_clear()
+
+    first = magic_args(sql_line, "--alias db SELECT 1")
+    first.alias = "other"
+    first.line.append("modified")
+    second = magic_args(sql_line, "--alias db SELECT 1")
+    info = _parse_argstring.cache_info()
+
+    assert second.alias == "db"
+    assert second.line == ["SELECT", "1"]
+    assert (info.hits, info.misses) == (1, 1)
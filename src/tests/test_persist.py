@@ -0,0 +1,380 @@
+import sqlite3
+from datetime import date
+from unittest.mock import Mock, MagicMock
+
+import duckdb
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pytest
+import sqlalchemy
+from IPython.core.error import UsageError
+from sqlalchemy import create_engine
+
+from sql import persist
+from sql.connection import Connection, DBAPIConnection
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({"x": [1.0, None, 3.0], "y": ["a", "b", None]})
+
+
+@pytest.fixture(
+    params=[
+        "sqlite-sqlalchemy",
+        "duckdb-sqlalchemy",
+        "sqlite-native",
+        "duckdb-native",
+    ]
+)
+def conn(request, clean_conns):
+    database, kind = request.param.split("-")
+
+    if kind == "sqlalchemy":
+        conn = Connection(create_engine(f"{database}://"))
+    elif database == "sqlite":
+        conn = DBAPIConnection(sqlite3.connect(""))
+    else:
+        conn = DBAPIConnection(duckdb.connect())
+
+    yield conn
+    conn.close()
+
+
+def fetchall(conn, query):
+    if Connection.is_dbapi_connection(conn):
+        return conn.session.execute(query).fetchall()
+
+    return list(conn.execute(query))
+
+
+def test_persist_frame(conn, frame):
+    persist.persist_frame(conn, frame, "data")
+
+    assert fetchall(conn, "SELECT * FROM data") == [
+        (0, 1.0, "a"),
+        (1, None, "b"),
+        (2, 3.0, None),
+    ]
+
+
+def test_persist_frame_no_index(conn, frame):
+    persist.persist_frame(conn, frame, "data", index=False)
+
+    assert fetchall(conn, "SELECT * FROM data") == [
+        (1.0, "a"),
+        (None, "b"),
+        (3.0, None),
+    ]
+
+
+def test_persist_frame_series(conn):
+    persist.persist_frame(conn, pd.Series([1, 2], name="x"), "data", index=False)
+
+    assert fetchall(conn, "SELECT * FROM data") == [(1,), (2,)]
+
+
+def test_persist_frame_if_exists(conn, frame):
+    persist.persist_frame(conn, frame, "data", index=False)
+
+    with pytest.raises(ValueError, match="already exists"):
+        persist.persist_frame(conn, frame, "data", index=False)
+
+    persist.persist_frame(conn, frame, "data", if_exists="append", index=False)
+    assert fetchall(conn, "SELECT COUNT(*) FROM data") == [(6,)]
+
+    persist.persist_frame(conn, frame.head(1), "data", if_exists="replace")
+    assert fetchall(conn, "SELECT * FROM data") == [(0, 1.0, "a")]
+
+
+@pytest.mark.parametrize(
+    "make_frame", [pd.DataFrame, pl.DataFrame], ids=["pandas", "polars"]
+)
+def test_persist_frame_append_matches_columns_by_name(conn, make_frame):
+    persist.persist_frame(conn, make_frame({"a": [1], "b": [10]}), "data", index=False)
+    persist.persist_frame(
+        conn,
+        make_frame({"b": [20], "a": [2]}),
+        "data",
+        if_exists="append",
+        index=False,
+    )
+
+    assert fetchall(conn, "SELECT a, b FROM data") == [(1, 10), (2, 20)]
+
+
+@pytest.mark.parametrize("method", ["auto", "multi", "insert"])
+@pytest.mark.parametrize("chunksize", [None, 2])
+def test_persist_frame_methods(clean_conns, frame, method, chunksize):
+    conn = Connection(create_engine("sqlite://"))
+
+    persist.persist_frame(
+        conn, frame, "data", index=False, chunksize=chunksize, method=method
+    )
+
+    assert fetchall(conn, "SELECT * FROM data") == [
+        (1.0, "a"),
+        (None, "b"),
+        (3.0, None),
+    ]
+
+
+def test_persist_frame_invalid_method(clean_conns, frame):
+    conn = Connection(create_engine("sqlite://"))
+
+    with pytest.raises(UsageError, match="Invalid method: 'copy'"):
+        persist.persist_frame(conn, frame, "data", method="copy")
+
+
+def test_persist_frame_duckdb_unregisters_view(clean_conns, frame):
+    connection = duckdb.connect()
+    conn = DBAPIConnection(connection)
+
+    persist.persist_frame(conn, frame, "data")
+
+    tables = connection.execute("SELECT table_name FROM information_schema.tables")
+    assert tables.fetchall() == [("data",)]
+
+
+@pytest.fixture(
+    params=["polars", "polars-lazy", "arrow-table", "arrow-batch", "arrow-reader"]
+)
+def arrow_frame(request):
+    frame = pl.DataFrame({"x": [1, None, 3], "y": ["a", "b", None]})
+
+    if request.param == "polars":
+        return frame
+
+    if request.param == "polars-lazy":
+        return frame.lazy()
+
+    table = frame.to_arrow()
+
+    if request.param == "arrow-table":
+        return table
+
+    if request.param == "arrow-batch":
+        return table.to_batches()[0]
+
+    return table.to_reader(max_chunksize=2)
+
+
+def test_persist_arrow(conn, arrow_frame, monkeypatch):
+    # the data isn't converted to pandas (except for DBAPI connections other than
+    # duckdb, which pandas' to_sql supports)
+    if not isinstance(conn, DBAPIConnection) or conn.dialect == "duckdb":
+        monkeypatch.setattr(
+            persist, "_persist_pandas", Mock(side_effect=AssertionError("pandas"))
+        )
+
+    persist.persist_frame(conn, arrow_frame, "data", chunksize=2)
+
+    assert fetchall(conn, "SELECT * FROM data") == [(1, "a"), (None, "b"), (3, None)]
+
+
+def test_persist_arrow_if_exists(conn):
+    table = pa.table({"x": [1, 2]})
+    persist.persist_frame(conn, table, "data")
+
+    with pytest.raises(ValueError, match="already exists"):
+        persist.persist_frame(conn, table, "data")
+
+    persist.persist_frame(conn, table, "data", if_exists="append")
+    assert fetchall(conn, "SELECT COUNT(*) FROM data") == [(4,)]
+
+    persist.persist_frame(conn, pa.table({"y": ["a"]}), "data", if_exists="replace")
+    assert fetchall(conn, "SELECT * FROM data") == [("a",)]
+
+
+@pytest.mark.parametrize("method", ["auto", "multi", "insert"])
+def test_persist_arrow_types(clean_conns, method):
+    conn = Connection(create_engine("sqlite://"))
+    table = pa.table(
+        {
+            "int": [1, None],
+            "float": [1.5, None],
+            "bool": [True, None],
+            "str": pa.array(["a", None], type=pa.large_string()),
+            "date": pa.array([date(2023, 1, 1), None]),
+            "bytes": [b"a", None],
+        }
+    )
+
+    persist.persist_frame(conn, table, "data", chunksize=1, method=method)
+
+    assert fetchall(conn, "SELECT * FROM data") == [
+        (1, 1.5, 1, "a", "2023-01-01", b"a"),
+        (None, None, None, None, None, None),
+    ]
+
+
+def test_persist_arrow_empty(clean_conns):
+    conn = Connection(create_engine("sqlite://"))
+
+    persist.persist_frame(conn, pa.table({"x": pa.array([], pa.int64())}), "data")
+
+    assert fetchall(conn, "SELECT COUNT(*) FROM data") == [(0,)]
+
+
+def test_persist_arrow_adbc(clean_conns, monkeypatch):
+    connection = Mock(spec=["cursor", "commit"])
+    connection.cursor.return_value = MagicMock()
+    conn = DBAPIConnection(connection)
+    monkeypatch.setattr(persist, "_is_adbc", lambda conn: True)
+    table = pa.table({"x": [1, 2]})
+
+    persist.persist_frame(conn, pl.from_arrow(table), "data", if_exists="append")
+
+    cursor = connection.cursor.return_value.__enter__.return_value
+    cursor.adbc_ingest.assert_called_once_with("data", table, mode="create_append")
+    connection.commit.assert_called_once_with()
+
+
+@pytest.mark.parametrize(
+    "obj, expected",
+    [
+        (pl.DataFrame({"x": [1]}), True),
+        (pl.DataFrame({"x": [1]}).lazy(), True),
+        (pa.table({"x": [1]}), True),
+        (pa.table({"x": [1]}).to_reader(), True),
+        (pd.DataFrame({"x": [1]}), False),
+        ([1], False),
+    ],
+)
+def test_is_arrow_compatible(obj, expected):
+    assert persist.is_arrow_compatible(obj) is expected
+
+
+@pytest.mark.parametrize(
+    "dialect, method, expected",
+    [
+        ("sqlite", "auto", persist.executemany),
+        ("sqlite", "multi", "multi"),
+        ("sqlite", "insert", None),
+        ("mysql", "auto", None),
+    ],
+)
+def test_insert_method(dialect, method, expected):
+    conn = Mock(spec=Connection)
+    conn._get_curr_sqlglot_dialect.return_value = dialect
+
+    assert persist._insert_method(conn, method) is expected
+
+
+def test_copy_from_stdin():
+    table = Mock()
+    table.name = "data"
+    table.schema = None
+    conn = MagicMock()
+    cursor = conn.connection.cursor.return_value.__enter__.return_value
+    cursor.copy_expert.side_effect = lambda statement, file: file.read()
+
+    rows = [(1, "a"), (None, ""), (2.5, 'say "hi"\nbye')]
+
+    persist.copy_from_stdin(table, conn, ["x", "y"], iter(rows))
+
+    statement, file = cursor.copy_expert.call_args[0]
+    file.seek(0)
+
+    assert statement == 'COPY "data" ("x", "y") FROM STDIN WITH CSV'
+    # NULL is an unquoted empty field, empty strings are quoted
+    assert file.read() == '"1","a"\n,""\n"2.5","say ""hi""\nbye"\n'
+
+
+@pytest.fixture
+def conn_file(tmp_empty, clean_conns):
+    conn = Connection(create_engine("duckdb:///db.duckdb"))
+    yield conn
+    conn.close()
+
+
+def fetchall_new_connection(conn, query):
+    # the session might have an open transaction that doesn't see the changes
+    with conn.engine.connect() as connection:
+        return connection.exec_driver_sql(query).fetchall()
+
+
+def tables(conn):
+    return sorted(sqlalchemy.inspect(conn.engine).get_table_names())
+
+
+@pytest.mark.parametrize("chunksize", [None, 1, 2])
+def test_persist_frame_parallel(conn_file, frame, chunksize):
+    persist.persist_frame_parallel(
+        conn_file, frame, "data", chunksize=chunksize, n_jobs=3
+    )
+
+    assert tables(conn_file) == ["data"]
+    assert fetchall_new_connection(conn_file, "SELECT * FROM data ORDER BY 1") == [
+        (0, 1.0, "a"),
+        (1, None, "b"),
+        (2, 3.0, None),
+    ]
+
+
+def test_persist_frame_parallel_arrow(conn_file, arrow_frame):
+    persist.persist_frame_parallel(conn_file, arrow_frame, "data", chunksize=1)
+
+    rows = fetchall_new_connection(conn_file, "SELECT * FROM data")
+    assert sorted(rows, key=repr) == [(1, "a"), (3, None), (None, "b")]
+
+
+def test_persist_frame_parallel_if_exists(conn_file, frame):
+    persist.persist_frame_parallel(conn_file, frame, "data", index=False)
+
+    with pytest.raises(ValueError, match="already exists"):
+        persist.persist_frame_parallel(conn_file, frame, "data")
+
+    persist.persist_frame_parallel(
+        conn_file, frame, "data", if_exists="append", index=False, chunksize=1
+    )
+    assert fetchall_new_connection(conn_file, "SELECT COUNT(*) FROM data") == [(6,)]
+
+    persist.persist_frame_parallel(
+        conn_file, frame.head(1), "data", if_exists="replace", index=False
+    )
+    assert fetchall_new_connection(conn_file, "SELECT * FROM data") == [(1.0, "a")]
+    assert tables(conn_file) == ["data"]
+
+
+def test_persist_frame_parallel_error_keeps_table(conn_file, frame, monkeypatch):
+    persist.persist_frame_parallel(conn_file, frame, "data", index=False)
+
+    def insert_chunks(*args):
+        raise RuntimeError("failed to insert chunk")
+
+    monkeypatch.setattr(persist, "_insert_chunks", insert_chunks)
+
+    with pytest.raises(RuntimeError, match="failed to insert chunk"):
+        persist.persist_frame_parallel(
+            conn_file, frame, "data", if_exists="replace", chunksize=1
+        )
+
+    # the table is untouched and the staging table is dropped
+    assert tables(conn_file) == ["data"]
+    assert fetchall_new_connection(conn_file, "SELECT COUNT(*) FROM data") == [(3,)]
+
+
+@pytest.mark.parametrize(
+    "make_conn",
+    [
+        lambda: Connection(create_engine("sqlite://")),
+        lambda: Connection(create_engine("duckdb://")),
+        lambda: DBAPIConnection(sqlite3.connect("")),
+    ],
+)
+def test_persist_frame_parallel_unsupported_connection(clean_conns, frame, make_conn):
+    with pytest.raises(UsageError, match="--parallel"):
+        persist.persist_frame_parallel(make_conn(), frame, "data")
+
+
+def test_persist_frame_parallel_sqlite(tmp_empty, clean_conns):
+    # large enough for the writers to wait longer than the busy timeout
+    frame = pd.DataFrame({"x": range(1_000_000), "y": "some text"})
+    conn = Connection(create_engine("sqlite:///db.sqlite", connect_args={"timeout": 0}))
+
+    with pytest.raises(UsageError, match="only allows one connection to write"):
+        persist.persist_frame_parallel(conn, frame, "data", chunksize=1000, n_jobs=4)
+
+    assert tables(conn) == []
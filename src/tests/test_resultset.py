@@ -1,3 +1,4 @@
+import gzip
 from unittest.mock import Mock, call
 
 import duckdb
@@ -6,12 +7,17 @@ from pathlib import Path
 
 
 import pytest
+from IPython.core.error import UsageError
 import pandas as pd
 import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
 import sqlalchemy
+import zstandard
 
+from sql.buffer import ArrowChunk, Chunk
 from sql.connection import DBAPIConnection, Connection
-from sql.run import ResultSet
+from sql.run import ResultSet, StreamingResultSet
 from sql import run as run_module
 
 
@@ -20,6 +26,10 @@ def config():
     config = Mock()
     config.displaylimit = 5
     config.autolimit = 100
+    config.result_memory_limit = None
+    config.result_sets_limit = None
+    config.result_sets_memory_limit = None
+    config.autoarrow = False
     return config
 
 
@@ -44,6 +54,20 @@ def test_resultset_getitem(result_set):
     assert result_set[0:2] == [(0,), (1,)]
 
 
+def test_resultset_rows_can_be_accessed_by_name(ip_empty):
+    ip_empty.run_cell("%sql duckdb://")
+    result = ip_empty.run_cell("%sql SELECT 1 AS a, 'x' AS b, 2 AS \"count(*)\"").result
+
+    row = result[0]
+
+    assert row.a == 1
+    assert row.b == "x"
+    assert row._mapping == {"a": 1, "b": "x", "count(*)": 2}
+    assert row == (1, "x", 2)
+    assert [row.a for row in result] == [1]
+    assert result[:1][0].b == "x"
+
+
 def test_resultset_dict(result_set):
     assert result_set.dict() == {"x": (0, 1, 2)}
 
@@ -66,12 +90,242 @@ def test_resultset_polars_dataframe(result_set, monkeypatch):
     assert result_set.PolarsDataFrame().frame_equal(pl.DataFrame({"x": range(3)}))
 
 
+def test_resultset_to_arrow(result_set):
+    assert result_set.to_arrow().equals(pa.table({"x": [0, 1, 2]}))
+
+
+def test_resultset_to_arrow_in_batches(result_set):
+    table = result_set.to_arrow(batch_size=2)
+
+    assert table.column("x").num_chunks == 2
+    assert table.equals(pa.table({"x": [0, 1, 2]}))
+
+
+def test_resultset_to_arrow_fetches_rows_into_arrow(sqlite_sqlalchemy, config):
+    sqlite_sqlalchemy.execute("CREATE TABLE numbers (x INT, y TEXT)")
+    sqlite_sqlalchemy.execute(
+        "INSERT INTO numbers VALUES " + ", ".join(f"({i}, 'n{i}')" for i in range(10))
+    )
+    statement = "SELECT * FROM numbers"
+    results = sqlite_sqlalchemy.execute(statement)
+    rs = ResultSet(results, config, statement=statement, conn=sqlite_sqlalchemy)
+
+    table = rs.to_arrow(batch_size=4)
+
+    assert table.to_pydict() == {
+        "x": list(range(10)),
+        "y": [f"n{i}" for i in range(10)],
+    }
+    # the rows fetched by to_arrow are stored as the Arrow arrays
+    assert [type(chunk) for chunk in rs._results._chunks] == [
+        Chunk,
+        ArrowChunk,
+        ArrowChunk,
+    ]
+    assert len(rs) == 10
+    assert rs[9] == (9, "n9")
+    assert rs.to_arrow().equals(table.combine_chunks())
+
+
+def test_resultset_to_arrow_unifies_types_across_batches(sqlite_sqlalchemy, config):
+    sqlite_sqlalchemy.execute("CREATE TABLE a (x INT, y TEXT)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (NULL, NULL), (NULL, NULL)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (1, 'a'), (2, 'b')")
+    statement = "SELECT * FROM a"
+    results = sqlite_sqlalchemy.execute(statement)
+
+    rs = ResultSet(results, config, statement=statement, conn=sqlite_sqlalchemy)
+    table = rs.to_arrow(batch_size=2)
+
+    assert table.to_pydict() == {"x": [None, None, 1, 2], "y": [None, None, "a", "b"]}
+    assert table.schema == pa.schema([("x", pa.int64()), ("y", pa.string())])
+
+
+@pytest.mark.parametrize("autoarrow", [True, False])
+def test_autoarrow_dataframe(result, config, autoarrow, monkeypatch):
+    monkeypatch.setattr(run_module.Connection, "current", Mock())
+    config.autoarrow = autoarrow
+    rs = ResultSet(result, config, statement=None, conn=Mock())
+
+    assert rs.DataFrame().equals(pd.DataFrame({"x": range(3)}))
+
+
+@pytest.mark.parametrize("autoarrow", [True, False])
+def test_autoarrow_polars_dataframe(result, config, autoarrow):
+    config.autoarrow = autoarrow
+    rs = ResultSet(result, config, statement=None, conn=Mock())
+
+    assert rs.PolarsDataFrame().frame_equal(pl.DataFrame({"x": range(3)}))
+
+
+def test_autoarrow_falls_back_if_mixed_types(sqlite_sqlalchemy, config):
+    config.autoarrow = True
+    sqlite_sqlalchemy.execute("CREATE TABLE a (x)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (1), ('one')")
+    statement = "SELECT * FROM a"
+    results = sqlite_sqlalchemy.execute(statement)
+
+    rs = ResultSet(results, config, statement=statement, conn=sqlite_sqlalchemy)
+
+    assert rs.DataFrame().to_dict() == {"x": {0: 1, 1: "one"}}
+
+
+def test_autoarrow_falls_back_if_mixed_types_in_unfetched_rows(
+    sqlite_sqlalchemy, config
+):
+    config.autoarrow = True
+    sqlite_sqlalchemy.execute("CREATE TABLE a (x)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (1), (2), (3), ('four')")
+    statement = "SELECT * FROM a"
+    results = sqlite_sqlalchemy.execute(statement)
+
+    rs = ResultSet(results, config, statement=statement, conn=sqlite_sqlalchemy)
+
+    assert rs.DataFrame().to_dict() == {"x": {0: 1, 1: 2, 2: 3, 3: "four"}}
+    assert len(rs) == 4
+
+
 def test_resultset_csv(result_set, tmp_empty):
     result_set.csv("file.csv")
 
     assert Path("file.csv").read_text() == "x\n0\n1\n2\n"
 
 
+@pytest.mark.parametrize(
+    "method, read",
+    [
+        ["to_parquet", pq.read_table],
+        ["to_arrow_ipc", lambda path: pa.ipc.open_file(path).read_all()],
+    ],
+)
+def test_resultset_to_file(result_set, tmp_empty, method, read):
+    getattr(result_set, method)("results", batch_size=2)
+
+    assert read("results").equals(pa.table({"x": [0, 1, 2]}))
+
+
+def test_resultset_to_file_does_not_store_rows(sqlite_sqlalchemy, config, tmp_empty):
+    sqlite_sqlalchemy.execute("CREATE TABLE a (x INT)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (1), (2), (3), (4), (5)")
+    statement = "SELECT * FROM a"
+    results = sqlite_sqlalchemy.execute(statement)
+    rs = ResultSet(results, config, statement=statement, conn=sqlite_sqlalchemy)
+
+    rs.to_parquet("a.parquet", batch_size=2)
+
+    assert pq.read_table("a.parquet").to_pydict() == {"x": [1, 2, 3, 4, 5]}
+    assert len(rs._results) == 2
+
+
+def test_resultset_to_file_keeps_rows(sqlite_sqlalchemy, config, tmp_empty):
+    sqlite_sqlalchemy.execute("CREATE TABLE a (x INT)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (1), (2), (3), (4), (5)")
+    statement = "SELECT * FROM a"
+    results = sqlite_sqlalchemy.execute(statement)
+    rs = ResultSet(results, config, statement=statement, conn=sqlite_sqlalchemy)
+
+    rs.to_parquet("a.parquet", batch_size=2, retain=True)
+
+    assert pq.read_table("a.parquet").to_pydict() == {"x": [1, 2, 3, 4, 5]}
+    assert list(rs) == [(1,), (2,), (3,), (4,), (5,)]
+
+
+def test_resultset_to_file_unifies_types_across_batches(
+    sqlite_sqlalchemy, config, tmp_empty
+):
+    sqlite_sqlalchemy.execute("CREATE TABLE a (x INT, y TEXT)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (NULL, NULL), (NULL, NULL)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (1, 'a'), (2, NULL)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (NULL, 'c')")
+    statement = "SELECT * FROM a"
+    results = sqlite_sqlalchemy.execute(statement)
+
+    rs = ResultSet(results, config, statement=statement, conn=sqlite_sqlalchemy)
+    rs.to_parquet("a.parquet", batch_size=2)
+    table = pq.read_table("a.parquet")
+
+    assert table.to_pydict() == {
+        "x": [None, None, 1, 2, None],
+        "y": [None, None, "a", None, "c"],
+    }
+    assert table.schema == pa.schema([("x", pa.int64()), ("y", pa.string())])
+
+
+def test_resultset_to_file_removes_file_on_error(sqlite_sqlalchemy, config, tmp_empty):
+    sqlite_sqlalchemy.execute("CREATE TABLE a (x)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (1), (2), ('three')")
+    statement = "SELECT * FROM a"
+    results = sqlite_sqlalchemy.execute(statement)
+
+    rs = ResultSet(results, config, statement=statement, conn=sqlite_sqlalchemy)
+
+    with pytest.raises(pa.ArrowInvalid):
+        rs.to_parquet("a.parquet", batch_size=2)
+
+    assert not Path("a.parquet").exists()
+
+
+@pytest.mark.parametrize(
+    "filename, open_",
+    [
+        ["file.csv", open],
+        ["file.csv.gz", gzip.open],
+        ["file.csv.zst", zstandard.open],
+    ],
+)
+def test_resultset_csv_compression(result_set, tmp_empty, filename, open_):
+    result_set.csv(filename)
+
+    with open_(filename, "rt") as f:
+        assert f.read() == "x\n0\n1\n2\n"
+
+
+def test_resultset_csv_explicit_compression(result_set, tmp_empty):
+    result_set.csv("file.csv", compression="gzip")
+
+    with gzip.open("file.csv", "rt") as f:
+        assert f.read() == "x\n0\n1\n2\n"
+
+
+def test_resultset_csv_does_not_store_rows(sqlite_sqlalchemy, config, tmp_empty):
+    sqlite_sqlalchemy.execute("CREATE TABLE a (x INT, y TEXT)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (1, 'a'), (2, 'b,c'), (3, NULL)")
+    statement = "SELECT * FROM a"
+    results = sqlite_sqlalchemy.execute(statement)
+    rs = ResultSet(results, config, statement=statement, conn=sqlite_sqlalchemy)
+
+    rs.csv("a.csv", batch_size=1)
+
+    assert Path("a.csv").read_text() == 'x,y\n1,a\n2,"b,c"\n3,\n'
+    assert len(rs._results) == 2
+
+
+def test_resultset_csv_keeps_rows(sqlite_sqlalchemy, config, tmp_empty):
+    sqlite_sqlalchemy.execute("CREATE TABLE a (x INT)")
+    sqlite_sqlalchemy.execute("INSERT INTO a VALUES (1), (2), (3), (4), (5)")
+    statement = "SELECT * FROM a"
+    results = sqlite_sqlalchemy.execute(statement)
+    rs = ResultSet(results, config, statement=statement, conn=sqlite_sqlalchemy)
+
+    rs.csv("a.csv", batch_size=2, retain=True)
+
+    assert Path("a.csv").read_text() == "x\n1\n2\n3\n4\n5\n"
+    assert len(rs) == 5
+    assert list(rs) == [(1,), (2,), (3,), (4,), (5,)]
+    assert rs.DataFrame().to_dict() == {"x": {0: 1, 1: 2, 2: 3, 3: 4, 4: 5}}
+
+
+def test_resultset_csv_string_keeps_rows(result_set):
+    assert result_set.csv() == "x\r\n0\r\n1\r\n2\r\n"
+    assert list(result_set) == [(0,), (1,), (2,)]
+
+
+def test_resultset_csv_progress(result_set, tmp_empty, capsys):
+    result_set.csv("file.csv", progress=True)
+
+    assert "Wrote 3 rows to file.csv" in capsys.readouterr().out
+
+
 def test_resultset_str(result_set):
     assert str(result_set) == "+---+\n| x |\n+---+\n| 0 |\n| 1 |\n| 2 |\n+---+"
 
@@ -159,6 +413,10 @@ def mock_config():
     mock = Mock()
     mock.displaylimit = 100
     mock.autolimit = 100000
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
+    mock.autoarrow = False
     yield mock
 
 
@@ -277,9 +535,42 @@ def test_convert_to_dataframe_using_native_duckdb(
     assert d == expected_value
 
 
+@pytest.mark.parametrize("query", ["SELECT * FROM a", "FROM a"])
+def test_to_arrow_using_native_duckdb(ip_empty, query, mock_config):
+    session = duckdb.connect()
+
+    session.execute("CREATE TABLE a (x INT);")
+    session.execute("INSERT INTO a(x) VALUES (1),(2),(3),(4),(5);")
+    results = session.execute(query)
+
+    rs = ResultSet(results, mock_config, statement=query, conn=DBAPIConnection(session))
+    # force fetching
+    list(rs)
+
+    assert rs.to_arrow().to_pydict() == {"x": [1, 2, 3, 4, 5]}
+
+
+def test_to_parquet_using_native_duckdb(ip_empty, mock_config, tmp_empty):
+    session = duckdb.connect()
+    session.execute("CREATE TABLE a (x INT);")
+    session.execute("INSERT INTO a(x) VALUES (1),(2),(3),(4),(5);")
+    results = session.execute("SELECT * FROM a")
+
+    rs = ResultSet(
+        results, mock_config, statement="SELECT * FROM a", conn=DBAPIConnection(session)
+    )
+    list(rs)
+    rs.to_parquet("a.parquet")
+
+    assert pq.read_table("a.parquet").to_pydict() == {"x": [1, 2, 3, 4, 5]}
+
+
 def test_done_fetching_if_reached_autolimit(results):
     mock = Mock()
     mock.autolimit = 2
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
     mock.displaylimit = 100
 
     rs = ResultSet(results, mock, statement=None, conn=Mock())
@@ -290,6 +581,9 @@ def test_done_fetching_if_reached_autolimit(results):
 def test_done_fetching_if_reached_autolimit_2(results):
     mock = Mock()
     mock.autolimit = 4
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
     mock.displaylimit = 100
 
     rs = ResultSet(results, mock, statement=None, conn=Mock())
@@ -305,6 +599,9 @@ def test_no_displaylimit(results, method, autolimit):
     mock = Mock()
     mock.displaylimit = 0
     mock.autolimit = autolimit
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     rs = ResultSet(results, mock, statement=None, conn=Mock())
     getattr(rs, method)()
@@ -323,6 +620,9 @@ def test_no_fetching_if_one_result():
     mock = Mock()
     mock.displaylimit = 100
     mock.autolimit = 1000_000
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     results = session.execute(text("SELECT * FROM a"))
     results.fetchmany = Mock(wraps=results.fetchmany)
@@ -348,6 +648,9 @@ def test_resultset_fetches_minimum_number_of_rows(results):
     mock = Mock()
     mock.displaylimit = 3
     mock.autolimit = 1000_000
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     ResultSet(results, mock, statement=None, conn=Mock())
 
@@ -361,6 +664,9 @@ def test_resultset_fetches_minimum_number_of_rows_for_repr(results, method):
     mock = Mock()
     mock.displaylimit = 3
     mock.autolimit = 1000_000
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     rs = ResultSet(results, mock, statement=None, conn=Mock())
     getattr(rs, method)()
@@ -374,6 +680,9 @@ def test_fetches_remaining_rows(results):
     mock = Mock()
     mock.displaylimit = 1
     mock.autolimit = 1000_000
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     rs = ResultSet(results, mock, statement=None, conn=Mock())
 
@@ -424,6 +733,9 @@ def test_resultset_fetches_required_rows_repr(results, method, repr_expected):
     mock = Mock()
     mock.displaylimit = 3
     mock.autolimit = 1000_000
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     rs = ResultSet(results, mock, statement=None, conn=Mock())
     repr_returned = getattr(rs, method)()
@@ -439,6 +751,9 @@ def test_resultset_autolimit_one(results):
     mock = Mock()
     mock.displaylimit = 10
     mock.autolimit = 1
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     rs = ResultSet(results, mock, statement=None, conn=Mock())
     repr(rs)
@@ -455,6 +770,9 @@ def test_display_limit_respected_even_when_feched_all(results):
     mock = Mock()
     mock.displaylimit = 2
     mock.autolimit = 0
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     rs = ResultSet(results, mock, statement=None, conn=Mock())
     elements = list(rs)
@@ -480,6 +798,9 @@ def test_displaylimit_message(displaylimit, message, results):
     mock = Mock()
     mock.displaylimit = displaylimit
     mock.autolimit = 0
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     rs = ResultSet(results, mock, statement=None, conn=Mock())
 
@@ -491,6 +812,9 @@ def test_no_displaylimit_message(results, displaylimit):
     mock = Mock()
     mock.displaylimit = displaylimit
     mock.autolimit = 0
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     rs = ResultSet(results, mock, statement=None, conn=Mock())
 
@@ -507,6 +831,9 @@ def test_refreshes_sqlaproxy_for_sqlalchemy_duckdb():
     mock = Mock()
     mock.displaylimit = 10
     mock.autolimit = 0
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     statement = text("SELECT * FROM numbers")
     first_set = ResultSet(
@@ -535,6 +862,9 @@ def test_doesnt_refresh_sqlaproxy_for_if_not_sqlalchemy_and_duckdb():
     mock = Mock()
     mock.displaylimit = 10
     mock.autolimit = 0
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     statement = "SELECT * FROM numbers"
     first_set = ResultSet(
@@ -565,6 +895,9 @@ def test_doesnt_refresh_sqlaproxy_if_different_connection():
     mock = Mock()
     mock.displaylimit = 10
     mock.autolimit = 0
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
 
     statement = "SELECT * FROM numbers"
     first_set = ResultSet(
@@ -582,3 +915,258 @@ def test_doesnt_refresh_sqlaproxy_if_different_connection():
     list(first_set)
 
     assert id(first_set._sqlaproxy) == original_id
+
+
+def test_iter_batches(results):
+    mock = Mock()
+    mock.displaylimit = 1
+    mock.autolimit = 0
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
+
+    rs = ResultSet(results, mock, statement=None, conn=Mock())
+
+    assert list(rs.iter_batches(size=2)) == [[(1,), (2,)], [(3,), (4,)], [(5,)]]
+    results.fetchall.assert_not_called()
+    assert results.fetchmany.call_args_list == [
+        call(size=2),
+        call(size=2),
+        call(size=2),
+    ]
+    # only the first rows (fetched in __init__) are stored
+    assert rs._results == [(1,), (2,)]
+
+
+def test_iter_batches_respects_autolimit(results):
+    mock = Mock()
+    mock.displaylimit = 1
+    mock.autolimit = 3
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
+
+    rs = ResultSet(results, mock, statement=None, conn=Mock())
+
+    assert list(rs.iter_batches(size=1)) == [[(1,)], [(2,)], [(3,)]]
+
+
+@pytest.mark.parametrize("retain", [True, False])
+def test_iter_rows(results, retain):
+    mock = Mock()
+    mock.displaylimit = 1
+    mock.autolimit = 0
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
+
+    rs = ResultSet(results, mock, statement=None, conn=Mock())
+
+    assert list(rs.iter_rows(retain=retain, size=2)) == [(1,), (2,), (3,), (4,), (5,)]
+    results.fetchall.assert_not_called()
+
+    if retain:
+        assert list(rs) == [(1,), (2,), (3,), (4,), (5,)]
+    else:
+        assert rs._results == [(1,), (2,)]
+
+
+@pytest.mark.parametrize(
+    "operation",
+    [
+        list,
+        len,
+        lambda rs: rs.dict(),
+        lambda rs: list(rs.iter_batches()),
+        lambda rs: list(rs.iter_rows()),
+    ],
+)
+def test_error_if_accessing_results_after_streaming(results, operation):
+    mock = Mock()
+    mock.displaylimit = 1
+    mock.autolimit = 0
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
+
+    rs = ResultSet(results, mock, statement=None, conn=Mock())
+    list(rs.iter_rows(retain=False))
+
+    with pytest.raises(UsageError) as excinfo:
+        operation(rs)
+
+    assert "results were already consumed" in str(excinfo.value)
+
+
+def test_streaming_resultset(results):
+    mock = Mock()
+    mock.displaylimit = 2
+    mock.autolimit = 0
+    mock.result_memory_limit = None
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
+
+    rs = StreamingResultSet(results, mock, statement=None, conn=Mock())
+
+    assert [row for row in rs] == [(1,), (2,), (3,), (4,), (5,)]
+    assert str(rs) == "+---+\n| x |\n+---+\n| 1 |\n| 2 |\n+---+"
+    assert rs._results == [(1,), (2,)]
+    results.fetchall.assert_not_called()
+
+
+def test_spills_results_to_disk_if_over_memory_limit(tmp_empty, monkeypatch):
+    monkeypatch.setattr(run_module, "_ARROW_BATCH_SIZE", 100)
+    conn = Connection(create_engine("sqlite://"))
+    conn.execute(
+        "CREATE TABLE numbers AS WITH RECURSIVE r(x) AS "
+        "(SELECT 1 UNION ALL SELECT x + 1 FROM r WHERE x < 1000) "
+        "SELECT x, 'row ' || x AS label FROM r"
+    )
+
+    mock = Mock()
+    mock.displaylimit = 10
+    mock.autolimit = 0
+    mock.result_memory_limit = 10_000
+    mock.result_sets_limit = None
+    mock.result_sets_memory_limit = None
+    mock.autoarrow = True
+
+    statement = "SELECT * FROM numbers"
+    rs = ResultSet(conn.execute(statement), mock, statement=statement, conn=conn)
+    rows = list(rs)
+
+    assert rs._results.n_spilled > 0
+    assert rs._results.nbytes <= 10_000
+    assert len(rows) == 1000
+    assert rows[0] == (1, "row 1")
+    assert rows[-1] == (1000, "row 1000")
+    assert rs[500] == (501, "row 501")
+    assert rs.to_arrow().num_rows == 1000
+    assert rs.DataFrame()["x"].sum() == 500_500
+
+
+def test_close(config):
+    conn = Connection(create_engine("sqlite://"))
+    statement = "SELECT 1 AS x UNION SELECT 2"
+    rs = ResultSet(conn.execute(statement), config, statement=statement, conn=conn)
+
+    rs.close()
+
+    assert rs._results == []
+    assert list(conn._result_sets) == []
+
+    with pytest.raises(UsageError) as excinfo:
+        list(rs)
+
+    assert "The result set was closed" in str(excinfo.value)
+
+
+def test_evicts_least_recently_used_result_sets(config):
+    config.result_sets_limit = 2
+    conn = Connection(create_engine("sqlite://"))
+
+    def run(statement):
+        return ResultSet(
+            conn.execute(statement), config, statement=statement, conn=conn
+        )
+
+    first = run("SELECT 1")
+    second = run("SELECT 2")
+    list(first)
+    third = run("SELECT 3")
+
+    assert list(conn._result_sets) == [first, third]
+    assert second._closed
+    assert list(first) == [(1,)]
+
+    with pytest.raises(UsageError):
+        second[0]
+
+
+def test_evicts_result_sets_over_memory_limit(config):
+    config.result_sets_memory_limit = 10_000
+    conn = Connection(create_engine("sqlite://"))
+    statement = (
+        "WITH RECURSIVE r(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM r WHERE x < 1000)"
+        " SELECT x FROM r"
+    )
+
+    first = ResultSet(conn.execute(statement), config, statement=statement, conn=conn)
+    list(first)
+    second = ResultSet(conn.execute(statement), config, statement=statement, conn=conn)
+
+    assert not first._closed
+    assert first.nbytes == 8000
+
+    list(second)
+
+    assert first._closed
+    assert list(conn._result_sets) == [second]
+
+
+def test_result_sets_are_not_evicted_by_default(ip_empty):
+    ip_empty.run_cell("%sql sqlite://")
+    first = ip_empty.run_cell("%sql SELECT 1 AS x").result
+
+    for i in range(150):
+        ip_empty.run_cell(f"%sql SELECT {i}")
+
+    assert not first._closed
+    assert list(first) == [(1,)]
+
+
+def test_releases_dbapi_cursor_once_fetched(config):
+    conn = DBAPIConnection(duckdb.connect())
+
+    def run(statement):
+        return ResultSet(
+            conn.session.execute(statement), config, statement=statement, conn=conn
+        )
+
+    first = run("SELECT * FROM range(3)")
+    second = run("SELECT * FROM range(10)")
+    assert conn.session.n_open_cursors == 2
+
+    list(first)
+    assert conn.session.n_open_cursors == 2
+    assert first._owns_cursor()
+
+    # the idle cursor is reused, but the data frame can still be built
+    third = run("SELECT 1")
+    assert third.sqlaproxy is first.sqlaproxy
+    assert first.DataFrame()["range"].tolist() == [0, 1, 2]
+
+    second.close()
+    assert conn.session.n_open_cursors == 1
+
+
+def test_released_cursor_reused_by_another_result_set(ip_empty):
+    ip_empty.run_cell("import duckdb")
+    ip_empty.run_cell("conn = duckdb.connect()")
+    ip_empty.run_cell("%sql conn")
+    ip_empty.run_cell("a = %sql CREATE TABLE a AS SELECT 1 AS x")
+    ip_empty.run_cell("b = %sql SELECT 42 AS answer")
+    ip_empty.run_cell("str(b)")
+
+    a, b = ip_empty.user_ns["a"], ip_empty.user_ns["b"]
+
+    # b used (and released) the cursor a was released to
+    assert a.sqlaproxy is b.sqlaproxy
+    assert not a._owns_cursor()
+    assert b._owns_cursor()
+    assert a.DataFrame().to_dict() == {"Count": {0: 1}}
+    assert b.DataFrame().to_dict() == {"answer": {0: 42}}
+
+
+def test_evicted_result_set_closes_dbapi_cursor(config):
+    config.result_sets_limit = 1
+    conn = DBAPIConnection(duckdb.connect())
+
+    statement = "SELECT * FROM range(10)"
+    first = ResultSet(
+        conn.session.execute(statement), config, statement=statement, conn=conn
+    )
+    ResultSet(conn.session.execute(statement), config, statement=statement, conn=conn)
+
+    assert first._closed
+    assert conn.session.n_open_cursors == 1
@@ -4,6 +4,7 @@ from unittest.mock import Mock
 import pandas
 import polars
 import pytest
+from sqlalchemy import create_engine, event
 
 import warnings
 
@@ -11,6 +12,7 @@ from IPython.core.error import UsageError
 from sql.connection import Connection
 from sql.run import (
     run,
+    _use_server_side_cursor,
     handle_postgres_special,
     is_postgres_or_redshift,
     select_df_type,
@@ -34,6 +36,10 @@ def mock_config():
         autocommit = True
         feedback = True
         polars_dataframe_kwargs = {}
+        autolimit = 0
+        stream_results = None
+        yield_per = 1000
+        statement_timeout = None
 
     return Config
 
@@ -63,6 +69,8 @@ def config_polars(mock_config):
 @pytest.fixture
 def mock_resultset():
     class ResultSet:
+        LAST_BY_CONNECTION = {}
+
         def __init__(self, *args, **kwargs):
             ...
 
@@ -181,3 +189,206 @@ def test_commit_is_called(
     run(mock_conns, "\\", mock_config)
 
     mock__commit.assert_called()
+
+
+@pytest.fixture
+def stream_config(mock_config):
+    class Config(mock_config):
+        autopandas = False
+        autopolars = False
+        displaylimit = 1
+        result_memory_limit = None
+        result_sets_limit = None
+        result_sets_memory_limit = None
+        style = "DEFAULT"
+        feedback = False
+        autoarrow = False
+
+    return Config
+
+
+@pytest.fixture
+def sqlite_conn(stream_config):
+    conn = Connection(create_engine("sqlite://"))
+    run(
+        conn,
+        "CREATE TABLE numbers AS SELECT 1 AS n UNION SELECT 2 UNION SELECT 3",
+        stream_config,
+    )
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def track_cursor(sqlite_conn):
+    """Record the stream_results option and the fetch sizes of each statement"""
+    executed = []
+
+    @event.listens_for(sqlite_conn.engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        executed.append(context.execution_options.get("stream_results", False))
+
+    return executed
+
+
+def test_run_uses_server_side_cursor(sqlite_conn, stream_config, track_cursor):
+    stream_config.stream_results = True
+
+    result = run(sqlite_conn, "SELECT * FROM numbers", stream_config, stream=True)
+
+    assert track_cursor == [True]
+    assert result._sqlaproxy._yield_per == 1000
+    assert list(result) == [(1,), (2,), (3,)]
+
+
+@pytest.mark.parametrize(
+    "sql, config, stream, expected",
+    [
+        # sqlite doesn't support server-side cursors
+        ["SELECT * FROM numbers", {}, False, False],
+        ["SELECT * FROM numbers", {}, True, False],
+        ["SELECT * FROM numbers", {"stream_results": True}, False, True],
+        ["SELECT * FROM numbers", {"stream_results": False}, True, False],
+        ["CREATE TABLE other AS SELECT 1", {}, True, False],
+        ["CREATE TABLE other AS SELECT 1", {"stream_results": True}, False, False],
+    ],
+)
+def test_run_server_side_cursor_config(
+    sqlite_conn, stream_config, track_cursor, sql, config, stream, expected
+):
+    for key, value in config.items():
+        setattr(stream_config, key, value)
+
+    run(sqlite_conn, sql, stream_config, stream=stream)
+
+    assert track_cursor == [expected]
+
+
+def test_run_server_side_cursor_with_stream(sqlite_conn, stream_config, track_cursor):
+    stream_config.stream_results = True
+    stream_config.autopandas = True
+
+    run(sqlite_conn, "SELECT * FROM numbers", stream_config, stream=True)
+
+    assert track_cursor == [True]
+
+
+@pytest.mark.parametrize("stream_results", [None, True])
+@pytest.mark.parametrize(
+    "dialect, autocommit, manual_commit, expected",
+    [
+        ["postgresql", True, False, True],
+        ["postgresql", False, False, True],
+        ["mysql", True, False, True],
+        ["mysql", True, True, True],
+        ["mysql", False, True, False],
+    ],
+)
+def test_use_server_side_cursor(
+    stream_config, dialect, autocommit, manual_commit, expected, stream_results
+):
+    stream_config.stream_results = stream_results
+    conn = Mock()
+    conn.dialect = dialect
+    conn.session.get_execution_options.return_value = (
+        {"isolation_level": "AUTOCOMMIT"} if autocommit else {}
+    )
+
+    assert (
+        _use_server_side_cursor(
+            conn, "SELECT * FROM t", stream_config, True, manual_commit
+        )
+        is expected
+    )
+
+
+@pytest.mark.parametrize(
+    "dialect, supported, stream, autolimit, expected",
+    [
+        ["postgresql", True, False, 0, True],
+        ["postgresql", True, True, 0, True],
+        ["postgresql+pg8000", False, True, 0, False],
+        ["postgresql", True, False, 10, False],
+        ["postgresql", True, False, 10_000, True],
+        ["mysql+pymysql", True, False, 0, False],
+        ["mysql+pymysql", True, True, 0, True],
+        ["mariadb+mariadbconnector", True, False, 0, False],
+    ],
+)
+def test_use_server_side_cursor_default(
+    stream_config, dialect, supported, stream, autolimit, expected
+):
+    stream_config.autolimit = autolimit
+    conn = Mock()
+    conn.dialect = dialect
+    conn.session.dialect.supports_server_side_cursors = supported
+    conn.session.get_execution_options.return_value = {"isolation_level": "AUTOCOMMIT"}
+
+    assert (
+        _use_server_side_cursor(conn, "SELECT * FROM t", stream_config, stream, False)
+        is expected
+    )
+
+
+@pytest.fixture
+def transaction_config(monkeypatch, stream_config):
+    # pretend the server-side cursors need a transaction (like PostgreSQL's)
+    monkeypatch.setattr("sql.run._needs_transaction", lambda conn: True)
+    stream_config.stream_results = True
+    return stream_config
+
+
+def _autocommit(conn):
+    return conn.session.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+
+
+def test_run_server_side_cursor_in_transaction(sqlite_conn, transaction_config):
+    result = run(sqlite_conn, "SELECT * FROM numbers", transaction_config)
+
+    assert not _autocommit(sqlite_conn)
+
+    result.fetchall()
+
+    assert list(result) == [(1,), (2,), (3,)]
+    assert _autocommit(sqlite_conn)
+
+
+def test_run_commits_transaction_before_next_statement(sqlite_conn, transaction_config):
+    result = run(sqlite_conn, "SELECT * FROM numbers", transaction_config)
+    run(sqlite_conn, "CREATE TABLE other AS SELECT 1", transaction_config)
+
+    assert list(result) == [(1,), (2,), (3,)]
+    assert _autocommit(sqlite_conn)
+
+
+def test_run_commits_transaction_between_statements(sqlite_conn, transaction_config):
+    result = run(
+        sqlite_conn,
+        "SELECT * FROM numbers; SELECT n * 10 FROM numbers",
+        transaction_config,
+    )
+
+    assert not _autocommit(sqlite_conn)
+
+    result.fetchall()
+
+    assert list(result) == [(10,), (20,), (30,)]
+    assert _autocommit(sqlite_conn)
+
+
+def test_run_closes_streamed_result_in_transaction(sqlite_conn, transaction_config):
+    result = run(sqlite_conn, "SELECT * FROM numbers", transaction_config, stream=True)
+    run(sqlite_conn, "CREATE TABLE other AS SELECT 1", transaction_config)
+
+    with pytest.raises(UsageError) as excinfo:
+        list(result)
+
+    assert "The result set was closed" in str(excinfo.value)
+    assert _autocommit(sqlite_conn)
+
+
+def test_run_rolls_back_transaction_on_error(sqlite_conn, transaction_config):
+    with pytest.raises(Exception):
+        run(sqlite_conn, "SELECT * FROM missing", transaction_config)
+
+    assert _autocommit(sqlite_conn)
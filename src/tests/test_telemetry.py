@@ -1,10 +1,14 @@
+import asyncio
 from pathlib import Path
 from unittest.mock import ANY, Mock
 import pytest
 import urllib.request
-from sql.telemetry import telemetry
+from sql import telemetry as telemetry_module
+from sql.telemetry import Telemetry, telemetry
 from sql import plot
 from sql.connection import Connection
+from sql.magic import SqlMagic
+from sql.run import ResultSet
 from sqlalchemy import create_engine
 
 # Ref: https://pytest.org/en/7.2.x/how-to/tmp_path.html#
@@ -48,7 +52,21 @@ def simple_db_conn():
 def mock_log_api(monkeypatch):
     mock_log_api = Mock()
     monkeypatch.setattr(telemetry, "log_api", mock_log_api)
+
+    # telemetry is disabled when running the tests so the functions aren't
+    # decorated, decorate the ones we test
+    if not telemetry.enabled:
+        for owner, name in [
+            (plot, "boxplot"),
+            (plot, "histogram"),
+            (ResultSet, "DataFrame"),
+            (SqlMagic, "_execute"),
+        ]:
+            func = getattr(owner, name)
+            monkeypatch.setattr(owner, name, telemetry._wrap(func, **func._telemetry))
+
     yield mock_log_api
+    telemetry.flush()
 
 
 excepted_duckdb_connection_info = {
@@ -69,8 +87,10 @@ def test_boxplot_telemetry_execution(
 ):
     ip.run_cell("%sql duckdb://")
     plot.boxplot(simple_file_path_iris, "petal width", conn=simple_db_conn, orient="h")
+    telemetry.flush()
     mock_log_api.assert_called_with(
         action="jupysql-boxplot-success",
+        client_time=ANY,
         total_runtime=ANY,
         metadata={
             "argv": ANY,
@@ -85,8 +105,10 @@ def test_histogram_telemetry_execution(
     ip.run_cell("%sql duckdb://")
     plot.histogram(simple_file_path_iris, "petal width", bins=50, conn=simple_db_conn)
 
+    telemetry.flush()
     mock_log_api.assert_called_with(
         action="jupysql-histogram-success",
+        client_time=ANY,
         total_runtime=ANY,
         metadata={
             "argv": ANY,
@@ -102,8 +124,10 @@ def test_data_frame_telemetry_execution(mock_log_api, ip, simple_file_path_iris)
         "result = %sql SELECT * FROM read_csv_auto('" + simple_file_path_iris + "')"
     )
     ip.run_cell("result.DataFrame()")
+    telemetry.flush()
     mock_log_api.assert_called_with(
         action="jupysql-data-frame-success",
+        client_time=ANY,
         total_runtime=ANY,
         metadata={
             "argv": ANY,
@@ -126,16 +150,22 @@ def test_sqlcmd_snippets_query_telemetry_execution(
     )
     ip.run_cell("%sqlcmd snippets class_setosa")
 
+    telemetry.flush()
     mock_log_api.assert_called_with(
-        action="jupysql-execute-success", total_runtime=ANY, metadata=ANY
+        action="jupysql-execute-success",
+        client_time=ANY,
+        total_runtime=ANY,
+        metadata=ANY,
     )
 
 
 def test_execute_telemetry_execution(mock_log_api, ip):
     ip.run_cell("%sql duckdb://")
 
+    telemetry.flush()
     mock_log_api.assert_called_with(
         action="jupysql-execute-success",
+        client_time=ANY,
         total_runtime=ANY,
         metadata={
             "argv": ANY,
@@ -147,8 +177,10 @@ def test_execute_telemetry_execution(mock_log_api, ip):
 def test_switch_connection_with_correct_telemetry_connection_info(mock_log_api, ip):
     ip.run_cell("%sql duckdb://")
 
+    telemetry.flush()
     mock_log_api.assert_called_with(
         action="jupysql-execute-success",
+        client_time=ANY,
         total_runtime=ANY,
         metadata={
             "argv": ANY,
@@ -158,11 +190,120 @@ def test_switch_connection_with_correct_telemetry_connection_info(mock_log_api,
 
     ip.run_cell("%sql sqlite://")
 
+    telemetry.flush()
     mock_log_api.assert_called_with(
         action="jupysql-execute-success",
+        client_time=ANY,
         total_runtime=ANY,
         metadata={
             "argv": ANY,
             "connection_info": excepted_sqlite_connection_info,
         },
     )
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(telemetry_module, "check_telemetry_enabled", lambda: True)
+    client = Telemetry(api_key="key", package_name="jupysql", version="0.0.0")
+    client.log_api = Mock()
+    return client
+
+
+def test_log_call_disabled_returns_the_function(monkeypatch):
+    monkeypatch.setattr(telemetry_module, "check_telemetry_enabled", lambda: False)
+    client = Telemetry(api_key="key", package_name="jupysql", version="0.0.0")
+
+    def add(x, y, *, payload=None):
+        return x + y, payload
+
+    assert client.log_call("add", payload=True)(add) is add
+    assert add(1, 2) == (3, None)
+    assert add._telemetry == {"action": "jupysql-add", "payload": True}
+
+
+def test_log_call_sends_events_from_a_thread(client):
+    @client.log_call(payload=True)
+    def add(x, y, *, payload):
+        payload["sum"] = x + y
+        return x + y
+
+    assert add(1, 2) == 3
+    assert client.flush(timeout=5)
+    client.log_api.assert_called_once_with(
+        action="jupysql-add-success",
+        client_time=ANY,
+        total_runtime=ANY,
+        metadata={"argv": ANY, "sum": 3},
+    )
+    assert client._worker.name == "jupysql-telemetry"
+
+
+def test_log_call_error(client):
+    @client.log_call("divide", group="math")
+    def divide(x, y):
+        return x / y
+
+    with pytest.raises(ZeroDivisionError):
+        divide(1, 0)
+
+    assert client.flush(timeout=5)
+    client.log_api.assert_called_once_with(
+        action="jupysql-math-divide-error",
+        client_time=ANY,
+        total_runtime=ANY,
+        metadata={"argv": ANY, "type": None, "exception": "division by zero"},
+    )
+
+
+def test_log_call_coroutine_function(client):
+    @client.log_call("divide")
+    async def divide(x, y):
+        await asyncio.sleep(0)
+        return x / y
+
+    assert asyncio.run(divide(4, 2)) == 2
+
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(divide(1, 0))
+
+    assert client.flush(timeout=5)
+    actions = [call.kwargs["action"] for call in client.log_api.call_args_list]
+    assert actions == ["jupysql-divide-success", "jupysql-divide-error"]
+
+
+def test_events_are_sent_in_batches(client, monkeypatch):
+    monkeypatch.setattr(telemetry_module, "BATCH_SIZE", 3)
+    client._send = Mock(wraps=client._send)
+    function = client.log_call("function")(lambda: None)
+
+    for _ in range(5):
+        function()
+
+    assert client.flush(timeout=5)
+    assert [len(call.args[0]) for call in client._send.call_args_list] == [3, 2]
+    assert client.log_api.call_count == 5
+
+
+def test_events_are_dropped_when_the_queue_is_full(client):
+    client._queue = telemetry_module.queue.Queue(maxsize=2)
+    # don't start the thread until the queue is full
+    client._start_worker = Mock()
+    function = client.log_call("function")(lambda: None)
+
+    for _ in range(3):
+        function()
+
+    del client._start_worker
+    client._start_worker()
+
+    assert client.flush(timeout=5)
+    assert client.log_api.call_count == 2
+
+
+def test_errors_sending_events_are_ignored(client):
+    client.log_api.side_effect = ConnectionError("no internet")
+    function = client.log_call("function")(lambda: 42)
+
+    assert function() == 42
+    assert client.flush(timeout=5)